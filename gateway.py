@@ -0,0 +1,11 @@
+#!/usr/bin/env python3
+"""
+Punto de entrada de la pasarela MCP.
+
+Claude Desktop lo lanza con la ruta absoluta del script, por lo que la carpeta
+del proyecto queda en sys.path y el paquete ``src`` se puede importar.
+"""
+from src.gateway.server import main
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,346 @@
+// Intermediario local de tokens de acceso de Google.
+//
+// Los MCPs de Gmail y Google Calendar usan el mismo GOOGLE_REFRESH_TOKEN. Sin
+// intermediario, cada servidor canjea el refresh token al arrancar y cada vez
+// que caduca el token de acceso. Este proceso guarda un token de acceso por
+// refresh token, lo renueva antes de que caduque y lo entrega a los servidores
+// por un socket local (una tubería con nombre en Windows).
+//
+// Las peticiones llevan el client secret y el refresh token, así que el socket
+// vive en un directorio 0700 del usuario ($XDG_RUNTIME_DIR o ~/.cache) y se
+// crea con permisos 0600. En Windows, Node no permite dar a la tubería un
+// descriptor de seguridad propio: su nombre es aleatorio en cada arranque y se
+// publica en un fichero de %LOCALAPPDATA%, que solo lee el usuario, de modo que
+// nadie puede crearla antes que el intermediario ni abrir otra instancia.
+//
+// Lo lanza google_token_preload.js la primera vez que un servidor necesita un
+// token, y termina solo tras GOOGLE_TOKEN_BROKER_IDLE_TTL segundos sin
+// peticiones (0 = no terminar). Protocolo: una línea JSON por conexión con
+// {client_id, client_secret, refresh_token, stale}, y una línea JSON de
+// respuesta con {access_token, expiry_date, token_type, scope} o {error}.
+// `stale` es el token que el servidor ya tenía: si coincide con el guardado,
+// Google lo ha rechazado y se canjea uno nuevo.
+
+const crypto = require('crypto');
+const fs = require('fs');
+const http = require('http');
+const https = require('https');
+const net = require('net');
+const os = require('os');
+const path = require('path');
+
+const DEFAULT_TOKEN_URI = 'https://oauth2.googleapis.com/token';
+
+const SOCKET_NAME = 'broker.sock';
+const PIPE_FILE = 'pipe';
+
+function brokerDir(env = process.env) {
+    if (process.platform === 'win32') {
+        return path.join(env.LOCALAPPDATA || os.homedir(), 'mcp-google-token-broker');
+    }
+    if (env.XDG_RUNTIME_DIR) {
+        return path.join(env.XDG_RUNTIME_DIR, 'mcp-google-token-broker');
+    }
+    return path.join(os.homedir(), '.cache', 'mcp-google-token-broker');
+}
+
+function loadOptions(env = process.env) {
+    const dir = brokerDir(env);
+    const defaultPath = process.platform === 'win32' ? null : path.join(dir, SOCKET_NAME);
+    return {
+        dir,
+        // En Windows, sin GOOGLE_TOKEN_BROKER_SOCKET, la tubería se lee de `dir` (ver brokerAddress)
+        socketPath: env.GOOGLE_TOKEN_BROKER_SOCKET || defaultPath,
+        tokenUri: env.GOOGLE_TOKEN_URI || DEFAULT_TOKEN_URI,
+        // Margen con el que se renueva el token antes de que caduque. Debe
+        // superar los 5 minutos con los que google-auth-library da un token
+        // por caducado, para que nunca reciba uno que vaya a pedir de nuevo.
+        refreshMargin: Number(env.GOOGLE_TOKEN_REFRESH_MARGIN || 600) * 1000,
+        idleTtl: Number(env.GOOGLE_TOKEN_BROKER_IDLE_TTL || 3600) * 1000
+    };
+}
+
+function postForm(uri, form) {
+    return new Promise((resolve, reject) => {
+        const body = new URLSearchParams(form).toString();
+        const url = new URL(uri);
+        const transport = url.protocol === 'http:' ? http : https;
+        const request = transport.request(url, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/x-www-form-urlencoded',
+                'Content-Length': Buffer.byteLength(body)
+            },
+            timeout: 30000
+        }, (response) => {
+            let data = '';
+            response.setEncoding('utf8');
+            response.on('data', (chunk) => { data += chunk; });
+            response.on('end', () => {
+                let payload;
+                try {
+                    payload = JSON.parse(data);
+                } catch (error) {
+                    reject(new Error(`Respuesta no válida del servidor de tokens (HTTP ${response.statusCode})`));
+                    return;
+                }
+                if (response.statusCode >= 400 || payload.error) {
+                    reject(new Error(`${payload.error || 'HTTP ' + response.statusCode}: ${payload.error_description || ''}`.trim()));
+                    return;
+                }
+                resolve(payload);
+            });
+        });
+        request.on('timeout', () => request.destroy(new Error('Tiempo de espera agotado con el servidor de tokens')));
+        request.on('error', reject);
+        request.end(body);
+    });
+}
+
+class TokenBroker {
+    constructor(options) {
+        this.options = options;
+        this.entries = new Map();
+        this.exchanges = 0;
+        this.lastUsed = Date.now();
+    }
+
+    key(request) {
+        return crypto.createHash('sha256').update(`${request.client_id}\n${request.refresh_token}`).digest('hex');
+    }
+
+    isFresh(entry, now = Date.now()) {
+        return entry.token && entry.token.expiry_date - now > this.options.refreshMargin;
+    }
+
+    async getToken(request) {
+        if (!request.client_id || !request.refresh_token) {
+            throw new Error('Faltan client_id o refresh_token');
+        }
+        this.lastUsed = Date.now();
+        const key = this.key(request);
+        let entry = this.entries.get(key);
+        if (!entry) {
+            entry = { token: null, pending: null, timer: null, lastUsed: 0 };
+            this.entries.set(key, entry);
+        }
+        entry.request = request;
+        entry.lastUsed = this.lastUsed;
+
+        const rejected = request.stale && entry.token && entry.token.access_token === request.stale;
+        if (this.isFresh(entry) && !rejected) {
+            return entry.token;
+        }
+        return this.refresh(entry);
+    }
+
+    refresh(entry) {
+        // Las peticiones simultáneas esperan al mismo canje
+        if (!entry.pending) {
+            entry.pending = this.exchange(entry).finally(() => { entry.pending = null; });
+        }
+        return entry.pending;
+    }
+
+    async exchange(entry) {
+        const { client_id, client_secret, refresh_token } = entry.request;
+        this.exchanges += 1;
+        const payload = await postForm(this.options.tokenUri, {
+            grant_type: 'refresh_token', client_id, client_secret: client_secret || '', refresh_token
+        });
+        entry.token = {
+            access_token: payload.access_token,
+            expiry_date: Date.now() + Number(payload.expires_in || 3600) * 1000,
+            token_type: payload.token_type || 'Bearer',
+            scope: payload.scope
+        };
+        if (payload.id_token) {
+            entry.token.id_token = payload.id_token;
+        }
+        this.schedule(entry);
+        return entry.token;
+    }
+
+    schedule(entry) {
+        // Renovar por adelantado mientras algún servidor siga usando el token
+        clearTimeout(entry.timer);
+        const delay = Math.max(entry.token.expiry_date - Date.now() - this.options.refreshMargin, 1000);
+        entry.timer = setTimeout(() => {
+            if (this.options.idleTtl <= 0 || Date.now() - entry.lastUsed < this.options.idleTtl) {
+                this.refresh(entry).catch(() => {});
+            }
+        }, delay);
+        entry.timer.unref();
+    }
+
+    handle(socket) {
+        let buffer = '';
+        socket.setEncoding('utf8');
+        socket.on('error', () => {});
+        socket.on('data', async (chunk) => {
+            if (buffer === null) {
+                return;
+            }
+            buffer += chunk;
+            const end = buffer.indexOf('\n');
+            if (end < 0) {
+                return;
+            }
+            const line = buffer.slice(0, end);
+            buffer = null;
+            let reply;
+            try {
+                const request = JSON.parse(line);
+                reply = request.op === 'stats'
+                    ? { exchanges: this.exchanges, tokens: this.entries.size }
+                    : await this.getToken(request);
+            } catch (error) {
+                reply = { error: error.message };
+            }
+            socket.end(JSON.stringify(reply) + '\n');
+        });
+    }
+}
+
+function ensurePrivateDir(dir) {
+    fs.mkdirSync(dir, { recursive: true, mode: 0o700 });
+    if (process.platform === 'win32') {
+        return;
+    }
+    const stat = fs.lstatSync(dir);
+    if (!stat.isDirectory() || stat.uid !== process.getuid()) {
+        throw new Error(`${dir} no es un directorio del usuario`);
+    }
+    if (stat.mode & 0o077) {
+        fs.chmodSync(dir, 0o700);
+    }
+}
+
+function checkPrivateSocket(socketPath) {
+    // Antes de enviar credenciales: el socket y su directorio son del usuario y nadie más accede
+    if (process.platform === 'win32') {
+        return;
+    }
+    const uid = process.getuid();
+    const dir = fs.lstatSync(path.dirname(socketPath));
+    if (!dir.isDirectory() || dir.uid !== uid || (dir.mode & 0o077)) {
+        throw new Error(`El directorio de ${socketPath} no es privado del usuario`);
+    }
+    const socket = fs.lstatSync(socketPath);
+    if (!socket.isSocket() || socket.uid !== uid || (socket.mode & 0o077)) {
+        throw new Error(`${socketPath} no es un socket privado del usuario`);
+    }
+}
+
+function readPipeName(options) {
+    return fs.readFileSync(path.join(options.dir, PIPE_FILE), 'utf8').trim();
+}
+
+function brokerAddress(options) {
+    // Lanza ENOENT si el intermediario aún no ha publicado su socket o su tubería
+    if (!options.socketPath) {
+        return readPipeName(options);
+    }
+    checkPrivateSocket(options.socketPath);
+    return options.socketPath;
+}
+
+function listen(server, socketPath) {
+    return new Promise((resolve, reject) => {
+        server.once('error', reject);
+        // El socket se crea ya con permisos 0600; no hay un momento en que otros puedan abrirlo
+        const umask = process.platform === 'win32' ? null : process.umask(0o177);
+        try {
+            server.listen(socketPath, () => {
+                server.removeListener('error', reject);
+                resolve();
+            });
+        } finally {
+            if (umask !== null) {
+                process.umask(umask);
+            }
+        }
+    });
+}
+
+function isAlive(socketPath) {
+    return new Promise((resolve) => {
+        const socket = net.connect(socketPath, () => { socket.destroy(); resolve(true); });
+        socket.on('error', () => resolve(false));
+    });
+}
+
+async function listenOnSocket(server, socketPath) {
+    if (process.platform !== 'win32') {
+        ensurePrivateDir(path.dirname(socketPath));
+    }
+    try {
+        await listen(server, socketPath);
+    } catch (error) {
+        if (error.code !== 'EADDRINUSE') {
+            throw error;
+        }
+        // Otro servidor ya lanzó el intermediario; si no responde, el socket es de uno que terminó mal
+        if (await isAlive(socketPath) || process.platform === 'win32') {
+            return false;
+        }
+        checkPrivateSocket(socketPath);
+        fs.unlinkSync(socketPath);
+        await listen(server, socketPath);
+    }
+    return true;
+}
+
+async function listenOnPipe(server, options) {
+    ensurePrivateDir(options.dir);
+    let current = null;
+    try {
+        current = readPipeName(options);
+    } catch (error) {
+        // Aún no hay intermediario publicado
+    }
+    if (current && await isAlive(current)) {
+        return false;
+    }
+    const pipeName = `\\\\.\\pipe\\mcp-google-token-broker-${crypto.randomBytes(16).toString('hex')}`;
+    await listen(server, pipeName);
+    const pipeFile = path.join(options.dir, PIPE_FILE);
+    fs.writeFileSync(`${pipeFile}.${process.pid}`, pipeName);
+    fs.renameSync(`${pipeFile}.${process.pid}`, pipeFile);
+    return true;
+}
+
+async function startBroker(options = loadOptions()) {
+    const broker = new TokenBroker(options);
+    const server = net.createServer((socket) => broker.handle(socket));
+    const listening = options.socketPath
+        ? await listenOnSocket(server, options.socketPath)
+        : await listenOnPipe(server, options);
+    if (!listening) {
+        return null;
+    }
+
+    if (options.idleTtl > 0) {
+        const idleCheck = setInterval(() => {
+            if (Date.now() - broker.lastUsed >= options.idleTtl) {
+                clearInterval(idleCheck);
+                server.close();
+            }
+        }, Math.min(options.idleTtl, 60000));
+        server.on('close', () => clearInterval(idleCheck));
+    }
+    return { broker, server };
+}
+
+module.exports = { brokerAddress, checkPrivateSocket, ensurePrivateDir, loadOptions, startBroker, TokenBroker };
+
+if (require.main === module) {
+    startBroker().then((started) => {
+        if (!started) {
+            console.error('El intermediario de tokens de Google ya está en marcha');
+        }
+    }).catch((error) => {
+        console.error('Error iniciando el intermediario de tokens de Google:', error.message);
+        process.exit(1);
+    });
+}
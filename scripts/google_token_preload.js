@@ -0,0 +1,129 @@
+// Precarga para los MCPs de Google: obtiene los tokens de acceso del
+// intermediario local (google_token_broker.js) en lugar de canjear el refresh
+// token cada servidor por su cuenta.
+//
+// Se carga con NODE_OPTIONS="--require .../google_token_preload.js", que
+// setup.py añade a la configuración de Gmail y Google Calendar. Sustituye
+// OAuth2Client.refreshTokenNoCache de google-auth-library (la usan googleapis
+// y @googleapis/*) al cargarse el módulo. Si el intermediario no está en
+// marcha lo lanza; si no responde o el canje falla, se usa el canje original.
+// Antes de enviar las credenciales comprueba que el socket y su directorio son
+// del usuario y privados; si no, no se envía nada y se canjea directamente.
+// No escribe nada en stdout, que es el canal del protocolo MCP.
+
+const Module = require('module');
+const net = require('net');
+const { spawn } = require('child_process');
+const { brokerAddress, loadOptions } = require('./google_token_broker');
+
+const BROKER_SCRIPT = require.resolve('./google_token_broker');
+const CONNECT_ATTEMPTS = 20;
+const REQUEST_TIMEOUT = 35000;
+
+const options = loadOptions();
+const patchedClasses = new WeakSet();
+let brokerLaunched = false;
+
+function sleep(ms) {
+    return new Promise((resolve) => setTimeout(resolve, ms));
+}
+
+function launchBroker() {
+    if (brokerLaunched) {
+        return;
+    }
+    brokerLaunched = true;
+    const env = { ...process.env };
+    delete env.NODE_OPTIONS;
+    const child = spawn(process.execPath, [BROKER_SCRIPT], {
+        detached: true, stdio: 'ignore', windowsHide: true, env
+    });
+    child.on('error', () => {});
+    child.unref();
+}
+
+function sendRequest(request) {
+    return new Promise((resolve, reject) => {
+        let address;
+        try {
+            address = brokerAddress(options);
+        } catch (error) {
+            reject(error);
+            return;
+        }
+        let data = '';
+        const socket = net.connect(address, () => {
+            socket.write(JSON.stringify(request) + '\n');
+        });
+        socket.setEncoding('utf8');
+        socket.setTimeout(REQUEST_TIMEOUT, () => socket.destroy(new Error('El intermediario de tokens no respondió')));
+        socket.on('data', (chunk) => { data += chunk; });
+        socket.on('error', reject);
+        socket.on('end', () => {
+            try {
+                resolve(JSON.parse(data));
+            } catch (error) {
+                reject(new Error('Respuesta no válida del intermediario de tokens'));
+            }
+        });
+    });
+}
+
+async function requestToken(request) {
+    for (let attempt = 0; ; attempt++) {
+        try {
+            return await sendRequest(request);
+        } catch (error) {
+            const notRunning = ['ENOENT', 'ECONNREFUSED'].includes(error.code);
+            if (!notRunning || attempt >= CONNECT_ATTEMPTS) {
+                throw error;
+            }
+            launchBroker();
+            await sleep(Math.min(25 * (attempt + 1), 250));
+        }
+    }
+}
+
+function patchOAuth2Client(OAuth2Client) {
+    const proto = OAuth2Client.prototype;
+    if (patchedClasses.has(OAuth2Client) || typeof proto.refreshTokenNoCache !== 'function') {
+        return;
+    }
+    patchedClasses.add(OAuth2Client);
+    const original = proto.refreshTokenNoCache;
+
+    proto.refreshTokenNoCache = async function (refreshToken) {
+        if (!refreshToken || !this._clientId) {
+            return original.apply(this, arguments);
+        }
+        try {
+            const reply = await requestToken({
+                client_id: this._clientId,
+                client_secret: this._clientSecret,
+                refresh_token: refreshToken,
+                stale: this.credentials && this.credentials.access_token
+            });
+            if (reply.error || !reply.access_token) {
+                throw new Error(reply.error || 'respuesta sin token');
+            }
+            const tokens = { ...reply, refresh_token: refreshToken };
+            if (typeof this.emit === 'function') {
+                this.emit('tokens', tokens);
+            }
+            return { tokens, res: null };
+        } catch (error) {
+            console.error(`[google-token-broker] ${error.message}; se canjea el token directamente`);
+            return original.apply(this, arguments);
+        }
+    };
+}
+
+const originalLoad = Module._load;
+Module._load = function () {
+    const exported = originalLoad.apply(this, arguments);
+    // googleapis la carga por nombre y los módulos ES por ruta: se reconoce por lo que exporta
+    if (exported && typeof exported.OAuth2Client === 'function') {
+        patchOAuth2Client(exported.OAuth2Client);
+    }
+    return exported;
+};
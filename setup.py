@@ -1,56 +1,156 @@
 #!/usr/bin/env python3
+import argparse
 import asyncio
+import contextlib
 import os
 import sys
-import subprocess
+from src import batch
+from src.bench import cold_start, load, startup
+from src.core.dependencies import probe_dependencies
+from src.mcps.linkedin_extract import batch_extractor
 from src.mcp_manager import MCPManager
 
-def check_dependencies():
+async def check_dependencies():
     """Verifica que todas las dependencias necesarias estén instaladas."""
-    required_commands = {
-        'git': 'git --version',
-        'node': 'node --version',
-        'npm': 'npm --version',
-        'python': 'python --version'
-    }
+    versions = await probe_dependencies()
     missing = []
-    
-    for cmd, check_cmd in required_commands.items():
-        try:
-            # Intentar ejecutar el comando completo
-            result = subprocess.run(check_cmd.split(), 
-                                 stdout=subprocess.PIPE, 
-                                 stderr=subprocess.PIPE,
-                                 shell=True,
-                                 check=True)
-            # Si llegamos aquí, el comando existe
-            print(f"{cmd} encontrado: {result.stdout.decode().strip()}")
-        except (subprocess.CalledProcessError, FileNotFoundError):
+
+    for cmd, version in versions.items():
+        if version is None:
             missing.append(cmd)
+        else:
+            print(f"{cmd} encontrado: {version}")
             
     if missing:
         print("\nError: Las siguientes dependencias no están instaladas:")
         for cmd in missing:
             print(f"- {cmd}")
         print("\nPor favor, ejecuta el script de instalación de dependencias:")
-        print(".\scripts\install_dependencies.ps1")
+        print(".\\scripts\\install_dependencies.ps1")
         return False
     return True
 
-async def main():
+def parse_args():
+    parser = argparse.ArgumentParser(description="Instala y configura los MCPs para Claude Desktop.")
+    parser.add_argument('--refresh-mirrors', action='store_true',
+                        help="Crea o actualiza los espejos locales de los repositorios y termina")
+    parser.add_argument('--offline', action='store_true',
+                        help="Aprovisiona sin conexión usando solo los espejos locales")
+    parser.add_argument('--gateway', action='store_true',
+                        help="Genera una configuración con una única pasarela MCP que agrupa todos los servidores")
+    parser.add_argument('--local-servers', action='store_true',
+                        help="Instala los servidores npx/uvx en un prefijo local con versiones fijadas")
+    parser.add_argument('--bench-cold-start', type=int, nargs='?', const=3, metavar='N',
+                        help="Compara el arranque en frío con npx/uvx y con la instalación local (N ejecuciones)")
+    parser.add_argument('--bench-startup', type=int, nargs='?', const=5, metavar='N',
+                        help="Mide el arranque de cada servidor (N ejecuciones) y lo compara con la línea base")
+    parser.add_argument('--bench-only', metavar='SERVIDORES',
+                        help="Servidores a medir, separados por comas (stub-reference funciona sin red)")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="Guarda el resultado de --bench-startup como nueva línea base")
+    parser.add_argument('--load-test', metavar='ESCENARIOS',
+                        help="Ejecuta las pruebas de carga del archivo de escenarios (p. ej. config/load_scenarios.json)")
+    parser.add_argument('--load-report', metavar='RUTA',
+                        help="Archivo JSON donde guardar el informe de --load-test")
+    parser.add_argument('--linkedin-batch', metavar='URLS',
+                        help="Extrae con Apify los perfiles y empresas de LinkedIn del archivo (una URL por línea o lista JSON)")
+    parser.add_argument('--linkedin-output', metavar='RUTA',
+                        help="Archivo JSON donde exportar los resultados de --linkedin-batch")
+    parser.add_argument('--linkedin-refresh', action='store_true',
+                        help="Vuelve a extraer también las URLs que ya están en el almacén")
+    parser.add_argument('--watch', action='store_true',
+                        help="Regenera claude_desktop_config.json al cambiar los archivos de config/")
+    parser.add_argument('--batch', action='store_true',
+                        help="Aprovisiona sin preguntas y escribe el resultado en JSON")
+    parser.add_argument('--answers', metavar='RUTA',
+                        help="Archivo de respuestas del modo por lotes con los perfiles a aprovisionar (implica --batch)")
+    parser.add_argument('--base-path', action='append', metavar='RUTA',
+                        help="Aprovisiona un perfil con esta ruta base; se puede repetir (modo por lotes)")
+    parser.add_argument('--parallel', type=int, metavar='N',
+                        help="Perfiles que se aprovisionan a la vez en el modo por lotes (por defecto, todos)")
+    parser.add_argument('--install-npx', action='store_true',
+                        help="Instala el paquete NPX de brave-search sin preguntar (modo por lotes)")
+    parser.add_argument('--results', metavar='RUTA', default='-',
+                        help="Archivo donde guardar el resultado JSON del modo por lotes (por defecto, la salida estándar)")
+    return parser.parse_args()
+
+async def run_batch(args):
+    """Modo por lotes: la salida de la configuración va a stderr y el resultado JSON a stdout o a --results."""
+    try:
+        answers = batch.load_answers(args.answers) if args.answers else {}
+        profiles = batch.build_profiles(answers, args.base_path, {
+            "gateway": True if args.gateway else None,
+            "offline": True if args.offline else None,
+            "local_servers": True if args.local_servers else None,
+        })
+    except Exception as e:
+        print(f"Error leyendo las respuestas del modo por lotes: {str(e)}", file=sys.stderr)
+        return 2
+
+    with contextlib.redirect_stdout(sys.stderr):
+        results = await batch.run_batch(profiles, args.parallel or answers.get('parallel'),
+                                        install_npx=args.install_npx or bool(answers.get('install_npx', False)))
+    batch.write_results(results, args.results)
+    return 0 if results['ok'] else 1
+
+async def main(args):
+    if args.batch or args.answers:
+        return await run_batch(args)
+
     try:
         # Verificar dependencias
-        if not check_dependencies():
+        if not await check_dependencies():
             return 1
             
         # Ruta al archivo de configuración
         config_path = "config/repositories.json"
         
         # Crear instancia del MCPManager
-        manager = MCPManager(config_path)
+        manager = MCPManager(config_path, offline=True if args.offline else None,
+                             gateway_mode=True if args.gateway else None,
+                             local_servers=True if args.local_servers or args.bench_cold_start else None)
+
+        if args.refresh_mirrors:
+            return 0 if await manager.refresh_mirrors() else 1
+
+        if args.bench_cold_start:
+            await cold_start.run_comparison(manager.get_temporary_server_configs(use_local=False),
+                                            manager.get_temporary_server_configs(use_local=True),
+                                            args.bench_cold_start,
+                                            manager.settings.get_float('SERVER_STARTUP_TIMEOUT', 30))
+            return 0
+
+        if args.bench_startup:
+            only = args.bench_only.split(',') if args.bench_only else None
+            baseline_path = (manager.properties.get('BENCH_BASELINE_PATH')
+                             or os.path.join(manager.base_path, '.bench', 'startup-baseline.json'))
+            ok = await startup.run_benchmark(manager.get_server_configs(manager.get_installed_mcps()),
+                                             args.bench_startup, only,
+                                             manager.settings.get_float('SERVER_STARTUP_TIMEOUT', 30),
+                                             baseline_path, args.save_baseline)
+            return 0 if ok else 1
+
+        if args.load_test:
+            report_path = args.load_report or os.path.join(manager.base_path, '.bench', 'load-report.json')
+            ok = await load.run_load_test(args.load_test, manager.get_server_configs(manager.get_installed_mcps()),
+                                          report_path)
+            return 0 if ok else 1
+
+        if args.linkedin_batch:
+            db_path = (manager.properties.get('LINKEDIN_BATCH_DB')
+                       or os.path.join(manager.base_path, '.linkedin', 'extractions.sqlite'))
+            ok = await batch_extractor.extract_file(args.linkedin_batch, manager.env_vars.get('APIFY_TOKEN', ''),
+                                                    db_path, manager.properties, args.linkedin_output,
+                                                    args.linkedin_refresh)
+            return 0 if ok else 1
+
+        if args.watch:
+            await manager.watch()
+            return 0
+
         
         # Configurar todos los MCPs
-        await manager.setup_all_mcps()
+        await batch.provision(manager)
         
     except Exception as e:
         print(f"Error durante la configuración: {str(e)}")
@@ -58,5 +158,9 @@ async def main():
     return 0
 
 if __name__ == "__main__":
-    exit_code = asyncio.run(main())
+    try:
+        exit_code = asyncio.run(main(parse_args()))
+    except KeyboardInterrupt:
+        # --watch se detiene con Ctrl+C
+        exit_code = 0
     exit(exit_code) 
\ No newline at end of file
@@ -0,0 +1,161 @@
+"""
+Modo por lotes de setup.py: aprovisionamiento desatendido de varios perfiles.
+
+Un perfil es una ejecución completa de la configuración (clonación,
+instalación, compilación y claude_desktop_config.json) con su propia ruta
+base y sus propios valores de default.properties. Los perfiles se aprovisionan
+en paralelo, sin preguntas, y el resultado de cada uno se devuelve como JSON.
+
+Formato del archivo de respuestas (las rutas relativas lo son al directorio
+desde el que se ejecuta setup.py)::
+
+    {
+      "install_npx": false,
+      "parallel": 2,
+      "defaults": {"config": "config/repositories.json", "gateway": false,
+                   "properties": {"GIT_CLONE_DEPTH": "1"}},
+      "profiles": [
+        {"name": "equipo-01", "base_path": "D:/mcps/equipo-01",
+         "properties": {"WINDOWS_CLAUDE_CONFIG_PATH": "D:/perfiles/equipo-01/Claude"}},
+        {"name": "imagen-ci", "base_path": "/opt/mcps", "offline": true}
+      ]
+    }
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from .core.dependencies import probe_dependencies
+from .core.pipeline import DEFAULT_POOL_SIZES, NETWORK
+from .gateway.server import prepare_catalog
+from .mcp_manager import MCPManager
+
+# Valores por defecto de cada perfil; None deja decidir a default.properties
+DEFAULT_PROFILE = {
+    "config": "config/repositories.json",
+    "base_path": None,
+    "gateway": None,
+    "offline": None,
+    "local_servers": None,
+    "force": False,
+    "properties": {},
+}
+
+
+def load_answers(path: str) -> Dict[str, Any]:
+    """Lee el archivo de respuestas del modo por lotes."""
+    with open(path, 'r', encoding='utf-8') as f:
+        answers = json.load(f)
+    if not isinstance(answers, dict):
+        raise ValueError(f"{path} debe contener un objeto JSON")
+    return answers
+
+
+def build_profiles(answers: Dict[str, Any], base_paths: Optional[List[str]] = None,
+                   overrides: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Perfiles a aprovisionar, completados con los valores por defecto.
+
+    ``base_paths`` añade un perfil por ruta base; ``overrides`` (las opciones
+    de la línea de comandos) se aplica a todos los perfiles. Sin perfiles se
+    aprovisiona uno solo con la configuración de default.properties.
+    """
+    defaults = dict(DEFAULT_PROFILE, **answers.get('defaults', {}))
+    entries = list(answers.get('profiles', [])) + [{"base_path": path} for path in base_paths or []]
+    profiles = []
+    for index, entry in enumerate(entries or [{}]):
+        profile = dict(defaults, **entry)
+        profile.update({key: value for key, value in (overrides or {}).items() if value is not None})
+        profile['properties'] = {**defaults.get('properties', {}), **entry.get('properties', {})}
+        profile.setdefault('name', profile['base_path'] or f"perfil-{index + 1}")
+        profiles.append(profile)
+
+    names = [profile['name'] for profile in profiles]
+    duplicated = sorted({name for name in names if names.count(name) > 1})
+    if duplicated:
+        raise ValueError(f"Perfiles repetidos: {', '.join(duplicated)}")
+    return profiles
+
+
+def _property_overrides(profile: Dict[str, Any]) -> Dict[str, str]:
+    """Propiedades del perfil; la ruta base y la traza quedan separadas por perfil."""
+    overrides = {key: str(value) for key, value in profile['properties'].items()}
+    if profile['base_path']:
+        overrides['REPOSITORIES_BASE_PATH'] = profile['base_path']
+        overrides.setdefault('TRACE_PATH', os.path.join(os.path.abspath(profile['base_path']), '.setup-trace.json'))
+    return overrides
+
+
+async def provision(manager: MCPManager, force: bool = False) -> Dict[str, Any]:
+    """Aprovisiona con ``manager`` y, en modo pasarela, cataloga las herramientas de sus servidores.
+
+    Returns:
+        Dict[str, Any]: Resumen de ``MCPManager.setup_all_mcps``.
+    """
+    result = await manager.setup_all_mcps(force=force)
+    if manager.gateway_mode and result['ok']:
+        servers_path, catalog_path = manager.get_gateway_paths()
+        network_workers = manager.settings.get_float('NETWORK_WORKERS', DEFAULT_POOL_SIZES[NETWORK])
+        await prepare_catalog(servers_path, catalog_path, manager.settings.get_float('SERVER_STARTUP_TIMEOUT', 30),
+                              int(network_workers))
+    return result
+
+
+async def run_profile(profile: Dict[str, Any], install_npx: bool) -> Dict[str, Any]:
+    """Aprovisiona un perfil; un error queda en el resultado en lugar de interrumpir el lote."""
+    start = time.perf_counter()
+    print(f"\n=== Perfil {profile['name']} ===")
+    try:
+        manager = MCPManager(profile['config'], offline=profile['offline'], gateway_mode=profile['gateway'],
+                             local_servers=profile['local_servers'],
+                             property_overrides=_property_overrides(profile), install_npx=install_npx)
+        result = {"name": profile['name'], **await provision(manager, force=bool(profile['force']))}
+    except Exception as e:
+        print(f"Error aprovisionando el perfil {profile['name']}: {str(e)}")
+        result = {"name": profile['name'], "base_path": profile['base_path'], "ok": False, "error": str(e)}
+    result['duration'] = round(time.perf_counter() - start, 3)
+    return result
+
+
+async def run_batch(profiles: List[Dict[str, Any]], parallel: Optional[int] = None,
+                    install_npx: bool = False) -> Dict[str, Any]:
+    """Comprueba las dependencias y aprovisiona los perfiles, ``parallel`` a la vez como máximo."""
+    start = time.perf_counter()
+    dependencies = await probe_dependencies()
+    for command, version in dependencies.items():
+        print(f"{command}: {version or 'no encontrado'}")
+    missing = [command for command, version in dependencies.items() if version is None]
+    results: Dict[str, Any] = {"ok": False, "dependencies": dependencies, "missing": missing, "profiles": []}
+    if missing:
+        print(f"Faltan dependencias: {', '.join(missing)}")
+        results['duration'] = round(time.perf_counter() - start, 3)
+        return results
+
+    semaphore = asyncio.Semaphore(max(1, parallel or len(profiles)))
+
+    async def limited(profile: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            return await run_profile(profile, install_npx)
+
+    results['profiles'] = await asyncio.gather(*(limited(profile) for profile in profiles))
+    results['ok'] = all(profile['ok'] for profile in results['profiles'])
+    results['duration'] = round(time.perf_counter() - start, 3)
+    return results
+
+
+def write_results(results: Dict[str, Any], path: str = '-'):
+    """Escribe el resultado en ``path``, o en la salida estándar si es ``-``."""
+    text = json.dumps(results, indent=2, ensure_ascii=False, default=str)
+    if path == '-':
+        sys.stdout.write(text + "\n")
+        sys.stdout.flush()
+        return
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text + "\n")
+    os.replace(tmp_path, path)
@@ -0,0 +1,3 @@
+"""
+Mediciones de rendimiento de los servidores MCP.
+"""
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Sustituto local de la API de Apify para probar la extracción por lotes de LinkedIn.
+
+Atiende ``POST /v2/acts/<actor>/run-sync-get-dataset-items`` y responde con un
+resultado inventado por cada URL de la entrada, tras ``--latency`` segundos.
+Se ejecuta por ruta, sin importar el paquete ``src``:
+
+    python src/bench/apify_stub.py --port 8765 --latency 0.5
+
+y se usa con ``APIFY_API_URL=http://127.0.0.1:8765``. Con ``--missing-rate``
+una fracción de las URLs no devuelve resultado y con ``--error-rate`` una
+fracción de las ejecuciones responde con un error 502. ``GET /stats`` retorna
+las ejecuciones y URLs recibidas.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Sustituto local de la API de Apify")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.5, help="Segundos de cada ejecución")
+    parser.add_argument('--missing-rate', type=float, default=0.0, help="Fracción de URLs sin resultado")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fracción de ejecuciones que fallan")
+    return parser.parse_args()
+
+
+class StubState:
+    def __init__(self, args):
+        self.args = args
+        self.lock = threading.Lock()
+        self.runs = 0
+        self.urls = 0
+        self.active = 0
+        self.max_active = 0
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path != "/stats":
+                self._send(404, {"error": {"message": "No encontrado"}})
+                return
+            with state.lock:
+                self._send(200, {"runs": state.runs, "urls": state.urls, "max_active": state.max_active})
+
+        def do_POST(self):
+            parts = self.path.split("?")[0].strip("/").split("/")
+            if len(parts) != 4 or parts[:2] != ["v2", "acts"] or parts[3] != "run-sync-get-dataset-items":
+                self._send(404, {"error": {"message": "No encontrado"}})
+                return
+            if not self.headers.get("Authorization", "").startswith("Bearer "):
+                self._send(401, {"error": {"message": "Falta el token"}})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            run_input = json.loads(self.rfile.read(length) or b"{}")
+            urls = [url for value in run_input.values() if isinstance(value, list) for url in value]
+
+            with state.lock:
+                state.runs += 1
+                state.urls += len(urls)
+                state.active += 1
+                state.max_active = max(state.max_active, state.active)
+            try:
+                time.sleep(state.args.latency)
+                if random.random() < state.args.error_rate:
+                    self._send(502, {"error": {"message": "Fallo simulado"}})
+                    return
+                items = [{"linkedinUrl": url, "fullName": f"Perfil {index}", "actor": parts[2]}
+                         for index, url in enumerate(urls) if random.random() >= state.args.missing_rate]
+                self._send(201, items)
+            finally:
+                with state.lock:
+                    state.active -= 1
+
+    return Handler
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(StubState(args)))
+    print(f"Apify simulado en http://{args.host}:{args.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
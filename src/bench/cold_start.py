@@ -0,0 +1,89 @@
+"""
+Comparación del arranque en frío de los servidores antes y después de instalarlos localmente.
+
+Cada medición lanza el servidor, espera la respuesta a ``initialize`` y lo
+cierra. Las mediciones se hacen de una en una para que los servidores no
+compitan por la CPU ni por la red.
+"""
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+
+from ..core.mcp_client import MCPStdioClient
+
+
+async def time_cold_start(name: str, config: Dict[str, Any], timeout: float = 60) -> Optional[float]:
+    """Segundos desde que se lanza el proceso hasta la respuesta a ``initialize``, o None si falla."""
+    client = MCPStdioClient(config['command'], config.get('args', []), cwd=config.get('cwd'),
+                            env=config.get('env'), name=name)
+    start = time.perf_counter()
+    try:
+        await client.start()
+        await client.initialize(timeout=timeout)
+        return time.perf_counter() - start
+    except Exception:
+        return None
+    finally:
+        await client.close(grace=0.5)
+
+
+async def measure(name: str, config: Dict[str, Any], runs: int, timeout: float) -> List[float]:
+    samples = []
+    for _ in range(runs):
+        elapsed = await time_cold_start(name, config, timeout)
+        if elapsed is not None:
+            samples.append(elapsed)
+    return samples
+
+
+async def compare_cold_starts(before: Dict[str, Dict[str, Any]], after: Dict[str, Dict[str, Any]],
+                              runs: int = 3, timeout: float = 60) -> Dict[str, Dict[str, Optional[float]]]:
+    """Mide la mediana del arranque en frío de cada servidor con las dos configuraciones.
+
+    Returns:
+        Dict: Por servidor, la mediana en segundos antes y después (None si no arrancó).
+    """
+    results = {}
+    for name in before:
+        if name not in after:
+            continue
+        print(f"[{name}] Midiendo arranque en frío ({runs} ejecuciones por configuración)...")
+        samples_before = await measure(name, before[name], runs, timeout)
+        samples_after = await measure(name, after[name], runs, timeout)
+        results[name] = {
+            "before": statistics.median(samples_before) if samples_before else None,
+            "after": statistics.median(samples_after) if samples_after else None,
+        }
+    return results
+
+
+async def run_comparison(before: Dict[str, Dict[str, Any]], after: Dict[str, Dict[str, Any]],
+                         runs: int = 3, timeout: float = 60) -> Dict[str, Dict[str, Optional[float]]]:
+    """Compara el arranque con npx/uvx (``before``) y con la instalación local (``after``) y muestra la tabla.
+
+    Solo se miden los servidores cuya configuración cambia con la
+    instalación local; el resto no están instalados localmente.
+    """
+    after = {name: config for name, config in after.items() if before.get(name) != config}
+    if not after:
+        print("No hay servidores instalados localmente; ejecuta python setup.py --local-servers primero")
+        return {}
+    results = await compare_cold_starts(before, after, runs, timeout)
+    print("\n" + format_comparison(results))
+    return results
+
+
+def format_comparison(results: Dict[str, Dict[str, Optional[float]]]) -> str:
+    """Tabla con la mediana antes/después y la mejora de cada servidor."""
+    lines = ["=== Arranque en frío (mediana) ===",
+             f"  {'servidor':<14} {'npx/uvx':>10} {'local':>10} {'mejora':>8}"]
+    for name, result in results.items():
+        before, after = result["before"], result["after"]
+        speedup = f"{before / after:.1f}x" if before and after else "-"
+        lines.append(f"  {name:<14} {_seconds(before):>10} {_seconds(after):>10} {speedup:>8}")
+    lines.append("================================")
+    return "\n".join(lines)
+
+
+def _seconds(value: Optional[float]) -> str:
+    return "falló" if value is None else f"{value:.2f}s"
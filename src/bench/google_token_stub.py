@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Sustituto local del servidor de tokens OAuth de Google para probar el intermediario de tokens.
+
+Atiende ``POST /token`` con ``grant_type=refresh_token`` y responde con un
+token de acceso inventado, válido ``--expires-in`` segundos, tras
+``--latency`` segundos. Se ejecuta por ruta, sin importar el paquete ``src``:
+
+    python src/bench/google_token_stub.py --port 8766 --latency 0.3
+
+y se usa con ``GOOGLE_TOKEN_URI=http://127.0.0.1:8766/token``. Los refresh
+tokens de ``--revoked`` responden ``invalid_grant``. ``GET /stats`` retorna
+los canjes recibidos por refresh token.
+"""
+import argparse
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Sustituto local del servidor de tokens de Google")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--latency', type=float, default=0.3, help="Segundos de cada canje")
+    parser.add_argument('--expires-in', type=int, default=3599, help="Validez de los tokens emitidos")
+    parser.add_argument('--revoked', action='append', default=[], help="Refresh token revocado (se puede repetir)")
+    return parser.parse_args()
+
+
+class StubState:
+    def __init__(self, args):
+        self.args = args
+        self.lock = threading.Lock()
+        self.exchanges = Counter()
+        self.issued = 0
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path != "/stats":
+                self._send(404, {"error": "not_found"})
+                return
+            with state.lock:
+                self._send(200, {"exchanges": sum(state.exchanges.values()),
+                                 "by_refresh_token": dict(state.exchanges)})
+
+        def do_POST(self):
+            if self.path.split("?")[0] != "/token":
+                self._send(404, {"error": "not_found"})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            form = {key: values[0] for key, values in parse_qs(self.rfile.read(length).decode()).items()}
+            refresh_token = form.get("refresh_token", "")
+            if form.get("grant_type") != "refresh_token" or not form.get("client_id") or not refresh_token:
+                self._send(400, {"error": "invalid_request", "error_description": "Faltan parámetros"})
+                return
+
+            with state.lock:
+                state.exchanges[refresh_token] += 1
+                state.issued += 1
+                issued = state.issued
+            time.sleep(state.args.latency)
+            if refresh_token in state.args.revoked:
+                self._send(400, {"error": "invalid_grant", "error_description": "Token has been expired or revoked."})
+                return
+            self._send(200, {
+                "access_token": f"ya29.stub-{issued}",
+                "expires_in": state.args.expires_in,
+                "token_type": "Bearer",
+                "scope": "https://www.googleapis.com/auth/calendar https://www.googleapis.com/auth/gmail.modify",
+            })
+
+    return Handler
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(StubState(args)))
+    print(f"Servidor de tokens de Google simulado en http://{args.host}:{args.port}/token", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,415 @@
+"""
+Pruebas de carga de llamadas a herramientas contra servidores MCP.
+
+Un escenario lanza un servidor con su configuración de ``mcpServers`` (la que
+genera ``get_config()`` de cada handler) y reproduce una secuencia de
+``tools/call`` con varios agentes virtuales a la vez. Cada agente recorre la
+secuencia en orden y vuelve a empezar; el ritmo total se limita a ``rate``
+llamadas por segundo repartiendo los turnos entre todos los agentes. Se
+registran histogramas de latencia por herramienta, errores por tipo y, a
+intervalos regulares, el uso de CPU y la memoria residente del servidor.
+
+Con ``stub`` el servidor real se sustituye por ``stub_server.py`` con las
+mismas herramientas, de modo que se puede medir sin credenciales ni acceso a
+las APIs de Trello, Gmail, etc. Formato del archivo de escenarios::
+
+    {
+      "defaults": {"concurrency": 4, "rate": 20, "duration": 30},
+      "scenarios": [
+        {"name": "trello-lectura", "server": "trello",
+         "stub": {"latency": 0.08, "jitter": 0.04, "error_rate": 0.01},
+         "sequence": [{"tool": "get_lists"},
+                      {"tool": "get_cards_by_list_id", "arguments": {"listId": "1"}}]}
+      ]
+    }
+"""
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from ..core.mcp_client import MCPError, MCPStdioClient
+from ..core.process_metrics import format_bytes, get_tree_cpu_time, get_tree_rss
+from .stats import format_ms, percentile
+
+# Límites superiores (en segundos) de los intervalos del histograma de latencia
+HISTOGRAM_BOUNDS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 30)
+# Valores por defecto de cada escenario
+DEFAULT_SCENARIO = {
+    "concurrency": 4,
+    "rate": 0,
+    "duration": 30,
+    "iterations": None,
+    "timeout": 30,
+    "sample_interval": 1.0,
+    "max_error_rate": None,
+}
+
+# Tipos de error de una llamada
+TOOL_ERROR = "isError"
+RPC_ERROR = "rpc"
+TIMEOUT_ERROR = "timeout"
+CONNECTION_ERROR = "conexión"
+
+
+class LatencyHistogram:
+    """Histograma de latencias con intervalos logarítmicos y los valores exactos para los percentiles."""
+
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        self.values: List[float] = []
+
+    def record(self, seconds: float):
+        index = next((i for i, bound in enumerate(HISTOGRAM_BOUNDS) if seconds <= bound), len(HISTOGRAM_BOUNDS))
+        self.counts[index] += 1
+        self.values.append(seconds)
+
+    def merge(self, other: 'LatencyHistogram'):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.values.extend(other.values)
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        return {
+            "p50": percentile(self.values, 50),
+            "p90": percentile(self.values, 90),
+            "p99": percentile(self.values, 99),
+            "max": max(self.values) if self.values else None,
+        }
+
+    def buckets(self) -> List[Dict[str, Any]]:
+        """Intervalos no vacíos con su límite superior (None para el último) y el número de llamadas."""
+        bounds = list(HISTOGRAM_BOUNDS) + [None]
+        return [{"le": bound, "count": count} for bound, count in zip(bounds, self.counts) if count]
+
+    def format(self, width: int = 40) -> List[str]:
+        """Barras de texto del histograma."""
+        total = max(self.counts) if any(self.counts) else 0
+        lines = []
+        for bucket in self.buckets():
+            label = f"≤ {format_ms(bucket['le'])}" if bucket['le'] is not None else f"> {format_ms(HISTOGRAM_BOUNDS[-1])}"
+            bar = "#" * max(1, math.ceil(bucket['count'] / total * width))
+            lines.append(f"    {label:>9} {bucket['count']:>7}  {bar}")
+        return lines
+
+
+@dataclass
+class ToolStats:
+    """Llamadas, errores y latencias de una herramienta."""
+    calls: int = 0
+    errors: Dict[str, int] = field(default_factory=dict)
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+
+@dataclass
+class ResourceSample:
+    """Muestra periódica del servidor y de las llamadas completadas en el intervalo."""
+    elapsed: float
+    calls: int
+    errors: int
+    cpu_percent: Optional[float]
+    rss: Optional[int]
+
+
+class Pacer:
+    """Reparte turnos entre los agentes para no superar ``rate`` llamadas por segundo (0 = sin límite)."""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate and rate > 0 else 0
+        self.next_slot = time.monotonic()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+def stub_server_config(tools: List[str], options: Dict[str, Any], name: str = "stub") -> Dict[str, Any]:
+    """Configuración de ``stub_server.py`` con las herramientas de un escenario."""
+    stub_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stub_server.py')
+    args = [stub_path, "--name", name, "--tools", ",".join(tools)]
+    for key in ("startup_delay", "latency", "jitter", "error_rate"):
+        if options.get(key) is not None:
+            args += [f"--{key.replace('_', '-')}", str(options[key])]
+    return {"command": sys.executable, "args": args}
+
+
+def load_scenarios(path: str) -> List[Dict[str, Any]]:
+    """Lee el archivo de escenarios y completa cada uno con los valores por defecto."""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    defaults = dict(DEFAULT_SCENARIO, **data.get('defaults', {}))
+    scenarios = []
+    for index, scenario in enumerate(data.get('scenarios', [])):
+        scenario = dict(defaults, **scenario)
+        scenario.setdefault('name', scenario.get('server') or f"escenario-{index + 1}")
+        if not scenario.get('sequence'):
+            raise ValueError(f"El escenario {scenario['name']} no tiene secuencia de llamadas")
+        scenarios.append(scenario)
+    return scenarios
+
+
+class LoadRun:
+    """Ejecución de un escenario contra un servidor ya configurado."""
+
+    def __init__(self, name: str, config: Dict[str, Any], scenario: Dict[str, Any]):
+        self.name = name
+        self.config = config
+        self.scenario = scenario
+        self.tools: Dict[str, ToolStats] = {}
+        self.samples: List[ResourceSample] = []
+        self._interval_calls = 0
+        self._interval_errors = 0
+
+    def _record(self, tool: str, latency: float, error: Optional[str]):
+        stats = self.tools.setdefault(tool, ToolStats())
+        stats.calls += 1
+        stats.latency.record(latency)
+        self._interval_calls += 1
+        if error:
+            stats.errors[error] = stats.errors.get(error, 0) + 1
+            self._interval_errors += 1
+
+    async def _call(self, client: MCPStdioClient, step: Dict[str, Any]):
+        error = None
+        start = time.perf_counter()
+        try:
+            result = await client.request("tools/call",
+                                          {"name": step['tool'], "arguments": step.get('arguments', {})},
+                                          timeout=self.scenario['timeout'])
+            if result.get('isError'):
+                error = TOOL_ERROR
+        except MCPError:
+            error = RPC_ERROR
+        except asyncio.TimeoutError:
+            error = TIMEOUT_ERROR
+        except (ConnectionError, OSError):
+            error = CONNECTION_ERROR
+        self._record(step['tool'], time.perf_counter() - start, error)
+
+    async def _agent(self, client: MCPStdioClient, pacer: Pacer, deadline: Optional[float]):
+        sequence = self.scenario['sequence']
+        iterations = self.scenario.get('iterations')
+        done = 0
+        while iterations is None or done < iterations:
+            for step in sequence:
+                if deadline is not None and time.monotonic() >= deadline:
+                    return
+                if not client.alive:
+                    return
+                await pacer.wait()
+                await self._call(client, step)
+            done += 1
+
+    async def _sample(self, pid: int, start: float, stop: asyncio.Event):
+        interval = self.scenario['sample_interval']
+        previous_cpu = await asyncio.to_thread(get_tree_cpu_time, pid)
+        previous_time = time.monotonic()
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            now = time.monotonic()
+            cpu, rss = await asyncio.gather(asyncio.to_thread(get_tree_cpu_time, pid),
+                                            asyncio.to_thread(get_tree_rss, pid))
+            cpu_percent = None
+            if cpu is not None and previous_cpu is not None and now > previous_time:
+                cpu_percent = max(0.0, (cpu - previous_cpu) / (now - previous_time) * 100)
+            self.samples.append(ResourceSample(now - start, self._interval_calls, self._interval_errors,
+                                               cpu_percent, rss))
+            self._interval_calls = self._interval_errors = 0
+            previous_cpu, previous_time = cpu, now
+
+    async def run(self) -> Dict[str, Any]:
+        """Lanza el servidor, ejecuta la carga y retorna el resultado (con ``error`` si no arrancó)."""
+        client = MCPStdioClient(self.config['command'], self.config.get('args', []), cwd=self.config.get('cwd'),
+                                env=self.config.get('env'), name=self.name)
+        try:
+            await client.start()
+            await client.initialize(timeout=self.scenario['timeout'])
+        except Exception as e:
+            tail = client.stderr_tail
+            await client.close(grace=0.5)
+            return {"error": f"No se pudo iniciar: {str(e) or type(e).__name__}" + (f"\n{tail}" if tail else "")}
+
+        concurrency = max(1, int(self.scenario['concurrency']))
+        duration = self.scenario.get('duration')
+        pacer = Pacer(self.scenario.get('rate') or 0)
+        stop = asyncio.Event()
+        start = time.monotonic()
+        deadline = start + duration if duration else None
+        sampler = asyncio.create_task(self._sample(client.pid, start, stop))
+        try:
+            await asyncio.gather(*(self._agent(client, pacer, deadline) for _ in range(concurrency)))
+        finally:
+            elapsed = time.monotonic() - start
+            stop.set()
+            await sampler
+            await client.close(grace=0.5)
+        return self.result(elapsed)
+
+    def result(self, elapsed: float) -> Dict[str, Any]:
+        total = LatencyHistogram()
+        errors: Dict[str, int] = {}
+        for stats in self.tools.values():
+            total.merge(stats.latency)
+            for kind, count in stats.errors.items():
+                errors[kind] = errors.get(kind, 0) + count
+        calls = sum(stats.calls for stats in self.tools.values())
+        error_count = sum(errors.values())
+        cpu_values = [s.cpu_percent for s in self.samples if s.cpu_percent is not None]
+        rss_values = [s.rss for s in self.samples if s.rss]
+        return {
+            "server": self.name,
+            "concurrency": self.scenario['concurrency'],
+            "target_rate": self.scenario.get('rate') or None,
+            "elapsed": elapsed,
+            "calls": calls,
+            "throughput": calls / elapsed if elapsed > 0 else 0.0,
+            "errors": errors,
+            "error_rate": error_count / calls if calls else 0.0,
+            "latency": total.summary(),
+            "histogram": total.buckets(),
+            "tools": {
+                tool: {"calls": stats.calls, "errors": stats.errors, "latency": stats.latency.summary()}
+                for tool, stats in self.tools.items()
+            },
+            "cpu_percent": {"avg": sum(cpu_values) / len(cpu_values) if cpu_values else None,
+                            "max": max(cpu_values) if cpu_values else None},
+            "peak_rss": max(rss_values) if rss_values else None,
+            "timeline": [vars(sample) for sample in self.samples],
+            "_histogram": total,
+        }
+
+
+async def run_scenarios(scenarios: List[Dict[str, Any]],
+                        servers: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Ejecuta los escenarios de uno en uno para que no compitan por la CPU.
+
+    Args:
+        scenarios: Escenarios ya completados por ``load_scenarios``.
+        servers: Configuración ``mcpServers`` de los servidores disponibles.
+    """
+    results = {}
+    for scenario in scenarios:
+        name = scenario['name']
+        tools = list(dict.fromkeys(step['tool'] for step in scenario['sequence']))
+        stub = scenario.get('stub')
+        if stub:
+            config = stub_server_config(tools, stub if isinstance(stub, dict) else {}, name=scenario.get('server', name))
+        else:
+            config = servers.get(scenario.get('server'))
+            if not config or not config.get('command'):
+                print(f"[{name}] Servidor no configurado: {scenario.get('server')}")
+                results[name] = {"error": f"Servidor no configurado: {scenario.get('server')}"}
+                continue
+            config = dict(config)
+        if scenario.get('env'):
+            # Permite apuntar el servidor real a una API local de pruebas
+            config['env'] = dict(config.get('env') or {}, **scenario['env'])
+
+        limit = f"{scenario['rate']} llamadas/s" if scenario.get('rate') else "sin límite de ritmo"
+        print(f"[{name}] {scenario['concurrency']} agentes, {limit}"
+              + (f", {scenario['duration']}s" if scenario.get('duration') else "")
+              + (" (servidor de prueba)" if stub else ""))
+        results[name] = await LoadRun(scenario.get('server', name), config, scenario).run()
+        if 'error' in results[name]:
+            print(f"[{name}] {results[name]['error']}")
+    return results
+
+
+def check_thresholds(scenarios: List[Dict[str, Any]], results: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Escenarios que no arrancaron o cuya tasa de errores supera su ``max_error_rate``."""
+    failures = []
+    for scenario in scenarios:
+        result = results.get(scenario['name'], {})
+        if 'error' in result:
+            failures.append(f"{scenario['name']}: {result['error'].splitlines()[0]}")
+        elif scenario.get('max_error_rate') is not None and result['error_rate'] > scenario['max_error_rate']:
+            failures.append(f"{scenario['name']}: {result['error_rate']:.1%} de errores "
+                            f"(máximo {scenario['max_error_rate']:.1%})")
+    return failures
+
+
+def _format_percent(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.0f}%"
+
+
+def format_results(results: Dict[str, Dict[str, Any]]) -> str:
+    """Resumen por escenario: rendimiento, latencias, errores, histograma y recursos del servidor."""
+    lines = ["=== Prueba de carga de servidores MCP ==="]
+    for name, result in results.items():
+        lines.append(f"\n[{name}]")
+        if 'error' in result:
+            lines.append(f"  {result['error']}")
+            continue
+        latency = result['latency']
+        errors = ", ".join(f"{kind}: {count}" for kind, count in result['errors'].items()) or "ninguno"
+        lines.append(f"  {result['calls']} llamadas en {result['elapsed']:.1f}s "
+                     f"({result['throughput']:.1f}/s), errores {result['error_rate']:.1%} ({errors})")
+        lines.append("  latencia p50/p90/p99/máx: "
+                     + "/".join(format_ms(latency[key]) for key in ("p50", "p90", "p99", "max")))
+        cpu_avg, cpu_max = (_format_percent(result['cpu_percent'][key]) for key in ("avg", "max"))
+        lines.append(f"  servidor: CPU media {cpu_avg}, máx {cpu_max}, pico RSS {format_bytes(result['peak_rss'])}")
+        lines.append("  histograma:")
+        lines.extend(result['_histogram'].format())
+        if len(result['tools']) > 1:
+            width = max(len(tool) for tool in result['tools'])
+            lines.append("  por herramienta:")
+            for tool, stats in result['tools'].items():
+                tool_latency = stats['latency']
+                lines.append(f"    {tool:<{width}}  {stats['calls']:>6} llamadas  "
+                             f"{sum(stats['errors'].values()):>4} errores  p50 {format_ms(tool_latency['p50'])}"
+                             f"  p99 {format_ms(tool_latency['p99'])}")
+    lines.append("=========================================")
+    return "\n".join(lines)
+
+
+def save_report(results: Dict[str, Dict[str, Any]], path: str):
+    """Guarda el informe completo (incluida la evolución de CPU y memoria) en JSON."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    report = {name: {key: value for key, value in result.items() if not key.startswith('_')}
+              for name, result in results.items()}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "scenarios": report}, f, indent=2,
+                  ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+async def run_load_test(scenarios_path: str, servers: Dict[str, Dict[str, Any]], report_path: str) -> bool:
+    """Ejecuta los escenarios de ``scenarios_path`` contra ``servers`` y guarda el informe en ``report_path``.
+
+    Los escenarios sin ``stub`` lanzan el servidor con la misma
+    configuración que se escribe para Claude Desktop. El informe incluye la
+    evolución de CPU y memoria de cada escenario.
+
+    Returns:
+        bool: False si algún escenario no arrancó o superó su tasa de errores máxima.
+    """
+    try:
+        scenarios = load_scenarios(scenarios_path)
+    except Exception as e:
+        print(f"Error leyendo los escenarios {scenarios_path}: {str(e)}")
+        return False
+
+    results = await run_scenarios(scenarios, servers)
+    print("\n" + format_results(results))
+
+    save_report(results, report_path)
+    print(f"Informe guardado en {report_path}")
+
+    failures = check_thresholds(scenarios, results)
+    for failure in failures:
+        print(f"- {failure}")
+    return not failures
@@ -0,0 +1,203 @@
+"""
+Medición de la latencia de arranque de los servidores MCP.
+
+Cada ejecución lanza el servidor y toma tres tiempos desde ese instante: el
+proceso creado, la respuesta a ``initialize`` y la respuesta a ``tools/list``,
+que es cuando el servidor ya es utilizable. Mientras tanto se muestrea la
+memoria residente del árbol de procesos para obtener el pico. Los resultados
+se pueden guardar como línea base y comparar con ejecuciones posteriores.
+
+El servidor de prueba ``stub_server.py`` se mide siempre como referencia:
+no necesita red y permite distinguir una máquina lenta de un servidor lento.
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from ..core.mcp_client import MCPStdioClient
+from ..core.process_metrics import format_bytes, get_tree_rss
+from .stats import format_ms, summarize
+
+REFERENCE_SERVER = "stub-reference"
+# Intervalo de muestreo de la memoria durante el arranque
+RSS_SAMPLE_INTERVAL = 0.05
+# Una fase es una regresión si su p50 crece más de este porcentaje y de este mínimo absoluto
+REGRESSION_TOLERANCE = 0.25
+REGRESSION_MIN_DELTA = 0.05
+
+
+@dataclass
+class StartupSample:
+    """Tiempos (en segundos desde el lanzamiento) y memoria de un arranque."""
+    spawn: float
+    initialize: float
+    tools_list: float
+    peak_rss: Optional[int]
+
+
+def reference_server_config() -> Dict[str, Any]:
+    """Configuración del servidor de prueba que se usa como referencia."""
+    stub_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stub_server.py')
+    return {"command": sys.executable, "args": [stub_path, "--name", REFERENCE_SERVER, "--tools", "echo"]}
+
+
+async def _sample_rss(pid: int, peak: List[int], stop: asyncio.Event):
+    while not stop.is_set():
+        rss = await asyncio.to_thread(get_tree_rss, pid)
+        if rss:
+            peak[0] = max(peak[0], rss)
+        try:
+            await asyncio.wait_for(stop.wait(), RSS_SAMPLE_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def measure_startup(name: str, config: Dict[str, Any], timeout: float = 60) -> Optional[StartupSample]:
+    """Lanza el servidor una vez y mide su arranque; None si no llega a responder."""
+    client = MCPStdioClient(config['command'], config.get('args', []), cwd=config.get('cwd'),
+                            env=config.get('env'), name=name)
+    peak = [0]
+    stop = asyncio.Event()
+    sampler = None
+    start = time.perf_counter()
+    try:
+        await client.start()
+        spawn = time.perf_counter() - start
+        sampler = asyncio.create_task(_sample_rss(client.pid, peak, stop))
+        await client.initialize(timeout=timeout)
+        initialize = time.perf_counter() - start
+        await client.request("tools/list", timeout=timeout)
+        tools_list = time.perf_counter() - start
+        return StartupSample(spawn, initialize, tools_list, peak[0] or None)
+    except Exception:
+        return None
+    finally:
+        stop.set()
+        if sampler:
+            await sampler
+        await client.close(grace=0.5)
+
+
+async def benchmark_startup(servers: Dict[str, Dict[str, Any]], runs: int = 5,
+                            timeout: float = 60) -> Dict[str, Dict[str, Any]]:
+    """Mide ``runs`` arranques de cada servidor, de uno en uno para que no compitan entre sí.
+
+    Returns:
+        Dict: Por servidor, p50/p95/máximo de cada fase, pico de memoria y fallos.
+    """
+    results = {}
+    for name, config in servers.items():
+        if not config.get('command'):
+            continue
+        print(f"[{name}] Midiendo arranque ({runs} ejecuciones)...")
+        samples = []
+        for _ in range(runs):
+            sample = await measure_startup(name, config, timeout)
+            if sample:
+                samples.append(sample)
+        rss_values = [s.peak_rss for s in samples if s.peak_rss]
+        results[name] = {
+            "runs": runs,
+            "failures": runs - len(samples),
+            "spawn": summarize([s.spawn for s in samples]),
+            "initialize": summarize([s.initialize for s in samples]),
+            "tools_list": summarize([s.tools_list for s in samples]),
+            "peak_rss": max(rss_values) if rss_values else None,
+        }
+    return results
+
+
+def format_results(results: Dict[str, Dict[str, Any]]) -> str:
+    """Tabla de tiempos hasta initialize y hasta tools/list, con el pico de memoria."""
+    width = max([len(name) for name in results] + [8])
+    lines = ["=== Arranque de servidores MCP ===",
+             f"  {'servidor':<{width}}  {'initialize p50/p95/máx':>24}  {'tools/list p50/p95/máx':>24}  "
+             f"{'pico RSS':>9}  fallos"]
+    for name, result in results.items():
+        phases = []
+        for phase in ("initialize", "tools_list"):
+            summary = result[phase]
+            phases.append("/".join(format_ms(summary[key]) for key in ("p50", "p95", "max")))
+        lines.append(f"  {name:<{width}}  {phases[0]:>24}  {phases[1]:>24}  "
+                     f"{format_bytes(result['peak_rss']):>9}  {result['failures']}/{result['runs']}")
+    lines.append("================================")
+    return "\n".join(lines)
+
+
+def save_baseline(results: Dict[str, Dict[str, Any]], path: str):
+    """Guarda los resultados como línea base."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "servers": results}, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_baseline(path: str) -> Optional[Dict[str, Dict[str, Any]]]:
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('servers')
+    except Exception as e:
+        print(f"Error leyendo la línea base {path}: {str(e)}")
+        return None
+
+
+def find_regressions(results: Dict[str, Dict[str, Any]],
+                     baseline: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Fases cuyo p50 empeoró respecto a la línea base, o servidores que ahora fallan."""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if result['failures'] > previous.get('failures', 0):
+            regressions.append(f"{name}: {result['failures']} fallos (antes {previous.get('failures', 0)})")
+        for phase in ("initialize", "tools_list"):
+            current = result[phase]['p50']
+            before = previous.get(phase, {}).get('p50')
+            if current is None or before is None:
+                continue
+            if current > before * (1 + REGRESSION_TOLERANCE) and current - before > REGRESSION_MIN_DELTA:
+                regressions.append(f"{name}: {phase} p50 {format_ms(current)} (antes {format_ms(before)})")
+    return regressions
+
+
+async def run_benchmark(servers: Dict[str, Dict[str, Any]], runs: int = 5, only: Optional[List[str]] = None,
+                        timeout: float = 60, baseline_path: Optional[str] = None, save: bool = False) -> bool:
+    """Mide el arranque de ``servers`` y del servidor de referencia y lo compara con la línea base.
+
+    Con ``only`` se limita a esos servidores (``stub-reference`` permite una
+    medición sin red). Con ``save`` los resultados pasan a ser la nueva
+    línea base de ``baseline_path``.
+
+    Returns:
+        bool: False si alguna fase empeoró respecto a la línea base.
+    """
+    servers = {REFERENCE_SERVER: reference_server_config(), **servers}
+    if only:
+        servers = {name: config for name, config in servers.items() if name in only}
+
+    results = await benchmark_startup(servers, runs, timeout)
+    print("\n" + format_results(results))
+
+    baseline = load_baseline(baseline_path) if baseline_path else None
+    regressions = find_regressions(results, baseline) if baseline else []
+    if regressions:
+        print("\n=== Regresiones respecto a la línea base ===")
+        for regression in regressions:
+            print(f"- {regression}")
+    elif baseline:
+        print("\nSin regresiones respecto a la línea base.")
+
+    if save and baseline_path:
+        save_baseline(results, baseline_path)
+        print(f"Línea base guardada en {baseline_path}")
+    return not regressions
@@ -0,0 +1,27 @@
+"""
+Estadísticas comunes de las mediciones.
+"""
+import math
+from typing import Dict, List, Optional, Sequence
+
+
+def percentile(values: Sequence[float], pct: float) -> Optional[float]:
+    """Percentil ``pct`` (0-100) por el método del rango más cercano, o None si no hay valores."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    """p50, p95 y máximo de una serie de mediciones."""
+    return {
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "max": max(values) if values else None,
+    }
+
+
+def format_ms(seconds: Optional[float]) -> str:
+    return "-" if seconds is None else f"{seconds * 1000:.0f}ms"
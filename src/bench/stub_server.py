@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Servidor MCP de prueba sobre stdio, sin dependencias ni acceso a la red.
+
+Sirve de referencia en las mediciones de arranque y sustituye a las APIs
+reales (Trello, Gmail, Google Calendar...) en las pruebas de carga. Se ejecuta
+por ruta, sin importar el paquete ``src``:
+
+    python src/bench/stub_server.py --tools get_cards,add_card --latency 0.05
+
+Cada herramienta responde con un eco de sus argumentos tras ``--latency``
+segundos (más una variación aleatoria de ``--jitter``). Con ``--error-rate``
+una fracción de las llamadas retorna ``isError``.
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+
+PROTOCOL_VERSION = "2024-11-05"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Servidor MCP de prueba")
+    parser.add_argument('--name', default='stub')
+    parser.add_argument('--tools', default='echo', help="Nombres de las herramientas separados por comas")
+    parser.add_argument('--startup-delay', type=float, default=0.0, help="Segundos antes de aceptar peticiones")
+    parser.add_argument('--latency', type=float, default=0.0, help="Segundos de cada llamada a una herramienta")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Variación aleatoria máxima de la latencia")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fracción de llamadas que fallan")
+    return parser.parse_args()
+
+
+class StubServer:
+    def __init__(self, args):
+        self.args = args
+        self.tools = [name.strip() for name in args.tools.split(',') if name.strip()]
+        self.write_lock = threading.Lock()
+
+    def send(self, message):
+        data = json.dumps(message) + "\n"
+        with self.write_lock:
+            sys.stdout.write(data)
+            sys.stdout.flush()
+
+    def tool_definitions(self):
+        return [{
+            "name": tool,
+            "description": f"Herramienta de prueba {tool} de {self.args.name}",
+            "inputSchema": {"type": "object", "properties": {}, "additionalProperties": True},
+        } for tool in self.tools]
+
+    def call_tool(self, request_id, params):
+        delay = self.args.latency + random.uniform(0, self.args.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        name = params.get('name')
+        if name not in self.tools:
+            self.send({"jsonrpc": "2.0", "id": request_id,
+                       "error": {"code": -32602, "message": f"Herramienta desconocida: {name}"}})
+            return
+        failed = random.random() < self.args.error_rate
+        text = json.dumps({"tool": name, "arguments": params.get('arguments', {})})
+        self.send({"jsonrpc": "2.0", "id": request_id,
+                   "result": {"content": [{"type": "text", "text": text}], "isError": failed}})
+
+    def handle(self, message):
+        request_id = message.get('id')
+        method = message.get('method')
+        if request_id is None:
+            return
+        if method == 'initialize':
+            result = {"protocolVersion": PROTOCOL_VERSION, "capabilities": {"tools": {}},
+                      "serverInfo": {"name": self.args.name, "version": "1.0.0"}}
+        elif method == 'tools/list':
+            result = {"tools": self.tool_definitions()}
+        elif method == 'tools/call':
+            # Las llamadas se atienden en paralelo, como en un servidor real
+            threading.Thread(target=self.call_tool, args=(request_id, message.get('params', {})),
+                             daemon=True).start()
+            return
+        elif method == 'ping':
+            result = {}
+        else:
+            self.send({"jsonrpc": "2.0", "id": request_id,
+                       "error": {"code": -32601, "message": f"Método no soportado: {method}"}})
+            return
+        self.send({"jsonrpc": "2.0", "id": request_id, "result": result})
+
+    def serve(self):
+        if self.args.startup_delay > 0:
+            time.sleep(self.args.startup_delay)
+        for line in sys.stdin:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                self.handle(json.loads(line))
+            except ValueError:
+                continue
+
+
+if __name__ == "__main__":
+    StubServer(parse_args()).serve()
@@ -0,0 +1,279 @@
+"""
+Latencia de las búsquedas del servidor de WhatsApp con y sin el índice de mensajes.
+
+Genera una base de datos sintética con el esquema del bridge
+(``messages`` y ``chats``), mide las consultas del servidor tal como las
+escribe (``LIKE '%texto%'``), construye el índice de ``message_index`` y
+repite las mismas consultas con los cambios de SERVER_PATCHES, comprobando
+que devuelven las mismas filas. Después inserta mensajes como lo hace el
+bridge para medir el coste de los disparadores y de ponerse al día:
+
+    python -m src.bench.whatsapp_search --messages 2000000
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..mcps.whatsapp import message_index
+from .stats import format_ms, summarize
+
+BRIDGE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chats (
+    jid TEXT PRIMARY KEY,
+    name TEXT,
+    last_message_time TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT,
+    chat_jid TEXT,
+    sender TEXT,
+    content TEXT,
+    timestamp TIMESTAMP,
+    is_from_me BOOLEAN,
+    media_type TEXT,
+    filename TEXT,
+    url TEXT,
+    media_key BLOB,
+    file_sha256 BLOB,
+    file_enc_sha256 BLOB,
+    file_length INTEGER,
+    PRIMARY KEY (id, chat_jid),
+    FOREIGN KEY (chat_jid) REFERENCES chats(jid)
+);
+"""
+
+# Consultas del servidor de WhatsApp (list_messages, list_chats y search_contacts)
+QUERIES = {
+    "list_messages": """
+        SELECT messages.timestamp, messages.sender, chats.name, messages.content, messages.is_from_me,
+               chats.jid, messages.id, messages.media_type
+        FROM messages JOIN chats ON messages.chat_jid = chats.jid
+        WHERE LOWER(messages.content) LIKE LOWER(?)
+        ORDER BY messages.timestamp DESC LIMIT 20""",
+    "list_messages_chat": """
+        SELECT messages.timestamp, messages.sender, chats.name, messages.content, messages.is_from_me,
+               chats.jid, messages.id, messages.media_type
+        FROM messages JOIN chats ON messages.chat_jid = chats.jid
+        WHERE messages.chat_jid = ? AND LOWER(messages.content) LIKE LOWER(?)
+        ORDER BY messages.timestamp DESC LIMIT 20""",
+    "list_chats": """
+        SELECT chats.jid, chats.name, chats.last_message_time
+        FROM chats
+        WHERE (LOWER(chats.name) LIKE LOWER(?) OR chats.jid LIKE ?)
+        ORDER BY chats.last_message_time DESC LIMIT 20""",
+    "search_contacts": """
+        SELECT DISTINCT jid, name FROM chats
+        WHERE (LOWER(name) LIKE LOWER(?) OR LOWER(jid) LIKE LOWER(?)) AND jid NOT LIKE '%@g.us'
+        ORDER BY name, jid LIMIT 50""",
+}
+
+SYLLABLES = ["ma", "ta", "pe", "lo", "ri", "sa", "co", "nu", "de", "ble", "tra", "gen", "por", "mi",
+             "cha", "vo", "ra", "li", "mon", "te", "que", "dia", "fer", "gu", "ño", "zar", "bo", "cli"]
+FIRST_NAMES = ["Ana", "Luis", "Marta", "Jorge", "Lucía", "Pablo", "Sofía", "Diego", "Elena", "Raúl"]
+LAST_NAMES = ["García", "Rojas", "Pérez", "Torres", "Flores", "Vargas", "Castro", "Mendoza"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Latencia de búsqueda de mensajes de WhatsApp con y sin índice")
+    parser.add_argument('--messages', type=int, default=2_000_000, help="Mensajes de la base de datos sintética")
+    parser.add_argument('--chats', type=int, default=3000, help="Chats de la base de datos sintética")
+    parser.add_argument('--runs', type=int, default=5, help="Repeticiones de cada consulta")
+    parser.add_argument('--inserts', type=int, default=2000, help="Mensajes nuevos para medir la actualización")
+    parser.add_argument('--db', metavar='RUTA', help="Ruta de la base de datos (por defecto, una temporal)")
+    parser.add_argument('--keep', action='store_true', help="No borrar la base de datos al terminar")
+    parser.add_argument('--seed', type=int, default=7)
+    return parser.parse_args()
+
+
+def make_vocabulary(rng: random.Random, size: int = 8000) -> List[str]:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def generate_database(path: str, messages: int, chats: int, seed: int) -> List[str]:
+    """Crea la base de datos sintética y retorna el vocabulario ordenado por frecuencia."""
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(rng)
+    rng.shuffle(vocabulary)
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    start = datetime(2018, 1, 1)
+
+    conn = sqlite3.connect(path)
+    conn.executescript(BRIDGE_SCHEMA)
+    chat_rows = []
+    for index in range(chats):
+        group = index % 10 == 0
+        jid = f"{120363000000 + index}@g.us" if group else f"{51900000000 + index}@s.whatsapp.net"
+        name = (f"Grupo {' '.join(rng.choices(vocabulary[:500], k=2))}" if group
+                else f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {index}")
+        chat_rows.append((jid, name, (start + timedelta(days=rng.randint(0, 2500), seconds=index)).isoformat()))
+    conn.executemany("INSERT INTO chats VALUES (?, ?, ?)", chat_rows)
+
+    batch = []
+    for index in range(messages):
+        chat = chat_rows[int(rng.paretovariate(1.2)) % chats][0]
+        media = rng.random() < 0.1
+        content = "" if media else " ".join(rng.choices(vocabulary, weights, k=rng.randint(2, 18)))
+        moment = start + timedelta(seconds=index * 120 + rng.randint(0, 119))
+        batch.append((f"3EB0{index:016X}", chat, chat.split("@")[0], content, moment.isoformat(),
+                      rng.random() < 0.4, "image" if media else None))
+        if len(batch) == 50000:
+            conn.executemany("INSERT INTO messages(id, chat_jid, sender, content, timestamp, is_from_me, media_type) "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+            batch = []
+            print(f"\rGenerados {index + 1}/{messages} mensajes", end="", flush=True)
+    conn.executemany("INSERT INTO messages(id, chat_jid, sender, content, timestamp, is_from_me, media_type) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+    conn.commit()
+    conn.close()
+    print(f"\rGenerados {messages} mensajes en {chats} chats")
+    return vocabulary
+
+
+def reset_indexes(path: str):
+    """Quita los índices de una ejecución anterior para medir la base de datos como la deja el bridge."""
+    conn = sqlite3.connect(path)
+    conn.executescript(message_index.DROP_SCHEMA)
+    for name in message_index.SECONDARY_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    conn.commit()
+    conn.close()
+
+
+def build_cases(vocabulary: List[str], busiest_chat: str) -> List[Tuple[str, str, Tuple[Any, ...]]]:
+    """(nombre, consulta, parámetros) con términos frecuentes, medios y raros."""
+    cases = []
+    for label, rank in (("frecuente", 5), ("medio", 500), ("raro", 7000)):
+        term = f"%{vocabulary[rank]}%"
+        cases.append((f"list_messages {label}", "list_messages", (term,)))
+    cases.append(("list_messages chat", "list_messages_chat", (busiest_chat, f"%{vocabulary[300]}%")))
+    cases.append(("list_messages sin resultados", "list_messages", ("%presupuesto anual%",)))
+    cases.append(("list_chats", "list_chats", ("%rojas%", "%rojas%")))
+    cases.append(("search_contacts", "search_contacts", ("%9000012%", "%9000012%")))
+    return cases
+
+
+def patched_query(query: str) -> str:
+    for old, new in message_index.SERVER_PATCHES:
+        query = query.replace(old, new)
+    return query
+
+
+def time_query(connect: Callable[[], sqlite3.Connection], query: str, params: Tuple[Any, ...],
+               runs: int) -> Tuple[Dict[str, Optional[float]], List[Tuple]]:
+    """Mide abrir la conexión y ejecutar la consulta, como hace el servidor en cada llamada."""
+    samples = []
+    rows: List[Tuple] = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        conn = connect()
+        try:
+            rows = conn.execute(query, params).fetchall()
+        finally:
+            conn.close()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples), rows
+
+
+def measure_inserts(path: str, count: int, seed: int) -> float:
+    """Segundos por mensaje al guardar mensajes nuevos como el bridge (INSERT OR REPLACE en chats y messages)."""
+    rng = random.Random(seed)
+    conn = message_index.open_database(path)
+    chats = [row[0] for row in conn.execute("SELECT jid FROM chats LIMIT 50")]
+    start = time.perf_counter()
+    for index in range(count):
+        chat = rng.choice(chats)
+        now = datetime.now().isoformat()
+        conn.execute("INSERT OR REPLACE INTO chats (jid, name, last_message_time) "
+                     "SELECT jid, name, ? FROM chats WHERE jid = ?", (now, chat))
+        conn.execute("INSERT OR REPLACE INTO messages (id, chat_jid, sender, content, timestamp, is_from_me) "
+                     "VALUES (?, ?, ?, ?, ?, ?)",
+                     (f"NEW{seed}{index:08d}", chat, chat.split("@")[0], f"mensaje nuevo {seed} {index}", now, False))
+        conn.commit()
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed / count
+
+
+def format_table(results: List[Tuple[str, Dict, Dict, bool]]) -> str:
+    lines = [f"{'Consulta':<30} {'sin índice p50':>15} {'p95':>8} {'con índice p50':>15} {'p95':>8} {'filas':>6}"]
+    for name, before, after, same in results:
+        lines.append(f"{name:<30} {format_ms(before['p50']):>15} {format_ms(before['p95']):>8} "
+                     f"{format_ms(after['p50']):>15} {format_ms(after['p95']):>8} {'iguales' if same else 'DISTINTAS':>6}")
+    return "\n".join(lines)
+
+
+def main() -> int:
+    args = parse_args()
+    workdir = None
+    path = args.db
+    if not path:
+        workdir = tempfile.mkdtemp(prefix="whatsapp-bench-")
+        path = os.path.join(workdir, "messages.db")
+    try:
+        if not os.path.exists(path):
+            vocabulary = generate_database(path, args.messages, args.chats, args.seed)
+        else:
+            rng = random.Random(args.seed)
+            vocabulary = make_vocabulary(rng)
+            rng.shuffle(vocabulary)
+        conn = sqlite3.connect(path)
+        busiest_chat = conn.execute("SELECT chat_jid FROM messages GROUP BY chat_jid "
+                                    "ORDER BY COUNT(*) DESC LIMIT 1").fetchone()[0]
+        conn.close()
+        reset_indexes(path)
+        cases = build_cases(vocabulary, busiest_chat)
+
+        print("\nMidiendo las consultas sin índice...")
+        before = {name: time_query(lambda: sqlite3.connect(path), QUERIES[query], params, args.runs)
+                  for name, query, params in cases}
+        insert_before = measure_inserts(path, args.inserts, 1)
+
+        print("Construyendo el índice...")
+        size_before = os.path.getsize(path)
+        start = time.perf_counter()
+        if not message_index.build(path, rebuild=True):
+            print("Este SQLite no tiene FTS5 con el tokenizador trigram")
+            return 1
+        build_time = time.perf_counter() - start
+
+        print("Midiendo las consultas con índice...")
+        results = []
+        for name, query, params in cases:
+            summary, rows = time_query(lambda: message_index.connect(path), patched_query(QUERIES[query]),
+                                       params, args.runs)
+            results.append((name, before[name][0], summary, rows == before[name][1]))
+
+        insert_after = measure_inserts(path, args.inserts, 2)
+        conn = message_index.open_database(path)
+        start = time.perf_counter()
+        applied = message_index.sync(conn)
+        sync_time = time.perf_counter() - start
+        found = conn.execute(patched_query(QUERIES["list_messages"]), ("%mensaje nuevo 2 1%",)).fetchall()
+        conn.close()
+
+        print("\n" + format_table(results))
+        print(f"\nConstrucción del índice: {build_time:.1f}s; base de datos de "
+              f"{size_before / 2**20:.0f} MB a {os.path.getsize(path) / 2**20:.0f} MB")
+        print(f"Guardar un mensaje como el bridge: {insert_before * 1000:.2f}ms sin disparadores, "
+              f"{insert_after * 1000:.2f}ms con disparadores")
+        print(f"Poner al día el índice tras {args.inserts} mensajes nuevos: {format_ms(sync_time)} "
+              f"({applied} cambios; {'encontrados' if found else 'NO encontrados'} al buscarlos)")
+        return 0 if all(same for _, _, _, same in results) and found else 1
+    finally:
+        if workdir and not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+        elif args.keep:
+            print(f"Base de datos conservada en {path}")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
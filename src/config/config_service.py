@@ -0,0 +1,161 @@
+"""
+Servicio único de configuración.
+
+Lee ``default.properties``, ``.env`` y ``repositories.json`` de la carpeta de
+configuración una sola vez y memoriza el resultado. Cada acceso comprueba la
+fecha de modificación y el tamaño de los archivos, de modo que un cambio en
+disco se recoge en la siguiente lectura sin reiniciar el proceso.
+
+Los marcadores ``%VARIABLE%`` de ``repositories.json`` (incluido
+``base_path``) se resuelven en una sola pasada con los valores de ``.env`` y
+de ``default.properties``; los que no tienen valor se dejan tal cual.
+
+Los valores de ``overrides`` sustituyen a los de ``default.properties`` y de
+``.env``; así varias instancias (por ejemplo, los perfiles del modo por lotes)
+pueden compartir la carpeta de configuración con otra ruta base.
+
+Los diccionarios retornados se comparten entre todos los consumidores y no
+deben modificarse.
+"""
+import json
+import os
+import re
+from typing import Any, Callable, Dict, Optional, Tuple
+
+PROPERTIES_FILE = 'default.properties'
+ENV_FILE = '.env'
+REPOSITORIES_FILE = 'repositories.json'
+
+PLACEHOLDER = re.compile(r'%([A-Za-z_][A-Za-z0-9_]*)%')
+
+# Huella de un archivo: (mtime en ns, tamaño), o None si no existe
+FileStamp = Optional[Tuple[int, int]]
+
+
+def _stamp(path: str) -> FileStamp:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _parse_key_values(path: str, strip_quotes: bool) -> Dict[str, str]:
+    """Lee líneas ``CLAVE=valor``; ignora comentarios y líneas sin ``=``."""
+    values = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#') or '=' not in line:
+                continue
+            key, value = line.split('=', 1)
+            value = value.strip()
+            if strip_quotes and len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'':
+                value = value[1:-1]
+            values[key.strip()] = value
+    return values
+
+
+def resolve_placeholders(value: Any, variables: Dict[str, str]) -> Any:
+    """Sustituye los ``%VARIABLE%`` de todas las cadenas de ``value`` (sin volver a expandir los valores)."""
+    if isinstance(value, str):
+        return PLACEHOLDER.sub(lambda m: variables.get(m.group(1), m.group(0)), value)
+    if isinstance(value, dict):
+        return {key: resolve_placeholders(item, variables) for key, item in value.items()}
+    if isinstance(value, list):
+        return [resolve_placeholders(item, variables) for item in value]
+    return value
+
+
+class ConfigService:
+    """Configuración memorizada de la carpeta ``config``, invalidada por cambios en disco."""
+
+    def __init__(self, config_dir: Optional[str] = None, repositories_file: str = REPOSITORIES_FILE,
+                 overrides: Optional[Dict[str, str]] = None):
+        if config_dir is None:
+            project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+            config_dir = os.path.join(project_root, 'config')
+        self.config_dir = config_dir
+        self.properties_path = os.path.join(config_dir, PROPERTIES_FILE)
+        self.env_path = os.path.join(config_dir, ENV_FILE)
+        self.repositories_path = os.path.join(config_dir, repositories_file)
+        self.overrides = dict(overrides or {})
+        self._cache: Dict[str, Tuple[Any, Any]] = {}
+
+    def _cached(self, key: str, stamp: Any, loader: Callable[[], Any]) -> Any:
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        value = loader()
+        self._cache[key] = (stamp, value)
+        return value
+
+    def stamp(self) -> Tuple[FileStamp, ...]:
+        """Huella de los tres archivos; cambia cuando alguno se modifica, crea o elimina."""
+        return (_stamp(self.properties_path), _stamp(self.env_path), _stamp(self.repositories_path))
+
+    def reload(self):
+        """Descarta lo memorizado para releer todos los archivos en el siguiente acceso."""
+        self._cache.clear()
+
+    # ------------------------------------------------------------------
+    # Fuentes
+    # ------------------------------------------------------------------
+
+    def properties(self) -> Dict[str, str]:
+        """Valores de default.properties, con ``overrides`` aplicados."""
+        def load() -> Dict[str, str]:
+            if not os.path.exists(self.properties_path):
+                return dict(self.overrides)
+            try:
+                return {**_parse_key_values(self.properties_path, strip_quotes=False), **self.overrides}
+            except Exception as e:
+                print(f"Error cargando propiedades: {e}")
+                return dict(self.overrides)
+        return self._cached('properties', _stamp(self.properties_path), load)
+
+    def env(self) -> Dict[str, str]:
+        """Variables de config/.env, sin las comillas que rodean a los valores."""
+        def load() -> Dict[str, str]:
+            if not os.path.exists(self.env_path):
+                return {}
+            try:
+                return _parse_key_values(self.env_path, strip_quotes=True)
+            except Exception as e:
+                print(f"Error cargando {self.env_path}: {e}")
+                return {}
+        return self._cached('env', _stamp(self.env_path), load)
+
+    def repositories(self) -> Dict[str, Any]:
+        """repositories.json con los marcadores ``%VARIABLE%`` ya resueltos."""
+        properties, env = self.properties(), self.env()
+
+        def load() -> Dict[str, Any]:
+            try:
+                with open(self.repositories_path, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+            except Exception as e:
+                print(f"Error cargando configuración: {str(e)}")
+                return {}
+            # .env tiene prioridad sobre default.properties, y overrides sobre ambos
+            return resolve_placeholders(config, {**properties, **env, **self.overrides})
+
+        return self._cached('repositories', self.stamp(), load)
+
+    # ------------------------------------------------------------------
+    # Acceso a propiedades
+    # ------------------------------------------------------------------
+
+    def get(self, key: str, default: str = '') -> str:
+        return self.properties().get(key, default)
+
+    def get_bool(self, key: str, default: bool = False) -> bool:
+        value = self.properties().get(key, '')
+        return value.lower() == 'true' if value else default
+
+    def get_float(self, key: str, default: float) -> float:
+        """Propiedad numérica, o ``default`` si falta o no es válida."""
+        try:
+            return float(self.properties().get(key, default))
+        except ValueError:
+            return default
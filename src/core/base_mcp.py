@@ -1,50 +1,214 @@
 import os
 import json
 import asyncio
-import subprocess
-import time
-from typing import Dict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Union
+from ..config.config_service import ConfigService
 from ..interfaces.mcp_interface import MCPInterface
+from .mcp_client import MCPStdioClient, probe_server
+from .build_cache import BuildCache, compute_build_key
+from .pipeline import CPU, IO, NETWORK, PipelineScheduler, SetupContext, Stage
+from .process_runner import capture_output, run_streaming
+from .provisioning_state import hash_env
+from .tracing import annotate, record_write
 
 class BaseMCP(MCPInterface):
     """Clase base que implementa funcionalidades comunes para todos los MCPs."""
+
+    # Carpeta con los artefactos compilados (None si el MCP no se compila)
+    build_dir: Optional[str] = None
+    # Si el servidor canjea GOOGLE_REFRESH_TOKEN con google-auth-library (usa el intermediario de tokens)
+    uses_google_oauth: bool = False
     
-    def __init__(self, name: str):
+    def __init__(self, name: str, settings: Optional[ConfigService] = None):
         self.name = name
+        self.settings = settings or ConfigService()
+        self.startup_timeout = self.settings.get_float('SERVER_STARTUP_TIMEOUT', 30)
+        self.health_check_interval = self.settings.get_float('SERVER_HEALTH_CHECK_INTERVAL', 5)
+        self.build_cache = self._create_build_cache()
+        self.npm_env = self._create_npm_env()
+
+    @property
+    def properties(self) -> Dict[str, str]:
+        """Valores de default.properties, releídos si el archivo cambia."""
+        return self.settings.properties()
+
+    def _create_build_cache(self) -> Optional[BuildCache]:
+        """Crea la caché de compilación según BUILD_CACHE_ENABLED y BUILD_CACHE_PATH."""
+        if self.properties.get('BUILD_CACHE_ENABLED', 'true').lower() != 'true':
+            return None
+        cache_path = self.properties.get('BUILD_CACHE_PATH', '')
+        if not cache_path:
+            base_path = self.properties.get('REPOSITORIES_BASE_PATH', '')
+            if not base_path:
+                return None
+            cache_path = os.path.join(base_path, '.build-cache')
+        return BuildCache(cache_path)
+
+    def _create_npm_env(self) -> Dict[str, str]:
+        """Variables de entorno de npm para usar una caché de paquetes compartida.
+
+        Con NPM_SHARED_CACHE todos los MCPs Node usan la misma caché de npm
+        (direccionada por contenido) en NPM_CACHE_PATH o en
+        REPOSITORIES_BASE_PATH/.npm-cache, y se prefieren los paquetes ya
+        descargados frente a consultar el registro. Así, las dependencias
+        comunes (typescript, @modelcontextprotocol/sdk, dotenv...) se descargan
+        una sola vez.
+        """
+        if self.properties.get('NPM_SHARED_CACHE', 'true').lower() != 'true':
+            return {}
+        cache_path = self.properties.get('NPM_CACHE_PATH', '')
+        if not cache_path:
+            base_path = self.properties.get('REPOSITORIES_BASE_PATH', '')
+            if not base_path:
+                return {}
+            cache_path = os.path.join(base_path, '.npm-cache')
+        return {
+            'npm_config_cache': cache_path,
+            'npm_config_prefer_offline': 'true',
+            'npm_config_audit': 'false',
+            'npm_config_fund': 'false',
+            'npm_config_update_notifier': 'false',
+        }
+
+    def set_offline(self, offline: bool = True):
+        """Obliga a npm a instalar solo desde la caché local, sin consultar el registro."""
+        if offline:
+            self.npm_env['npm_config_offline'] = 'true'
+        else:
+            self.npm_env.pop('npm_config_offline', None)
+
+    async def setup(self, path: str, env_vars: Dict) -> bool:
+        """Configura el MCP ejecutando sus etapas de forma aislada."""
+        scheduler = PipelineScheduler()
+        scheduler.add_job(self.name, self.get_stages(SetupContext(path, env_vars)))
+        results = await scheduler.run()
+        return results[self.name].ok
+
+    def commit_fingerprint(self, context: SetupContext, *required: str) -> Callable[[], Awaitable[Optional[str]]]:
+        """Huella basada en el commit del repositorio; None si falta algún archivo requerido."""
+        async def fingerprint() -> Optional[str]:
+            if any(not os.path.exists(os.path.join(context.path, name)) for name in required):
+                return None
+            return await capture_output(["git", "rev-parse", "HEAD"], cwd=context.path)
+        return fingerprint
+
+    def env_fingerprint(self, context: SetupContext) -> Callable[[], Awaitable[Optional[str]]]:
+        """Huella de las variables de entorno; None si el archivo .env no existe."""
+        async def fingerprint() -> Optional[str]:
+            if not os.path.exists(os.path.join(context.path, '.env')):
+                return None
+            return hash_env(context.env_vars)
+        return fingerprint
+
+    def build_fingerprint(self, context: SetupContext, *required: str) -> Callable[[], Awaitable[Optional[str]]]:
+        """Huella de las entradas de la compilación; None si falta algún artefacto requerido."""
+        async def fingerprint() -> Optional[str]:
+            if any(not os.path.exists(os.path.join(context.path, name)) for name in required):
+                return None
+            return await compute_build_key(context.path)
+        return fingerprint
+
+    def constant_fingerprint(self, value: str) -> Callable[[], Awaitable[Optional[str]]]:
+        """Huella fija: la etapa solo se repite si falló o si se ejecutó alguna dependencia."""
+        async def fingerprint() -> Optional[str]:
+            return value
+        return fingerprint
+
+    def get_npm_stages(self, context: SetupContext, depends_on: List[str],
+                       install_commands: Optional[List[str]] = None,
+                       build_depends_on: Optional[List[str]] = None) -> List[Stage]:
+        """Declara las etapas cache → install → build de un proyecto Node.
+
+        La etapa ``cache`` calcula la clave de la caché de compilación y, si hay
+        acierto, restaura ``node_modules`` y ``build_dir``; en ese caso
+        ``install`` y ``build`` no ejecutan npm. Tras una compilación correcta
+        los artefactos se guardan en la caché antes de que otras etapas los
+        modifiquen.
+        """
+        install_commands = install_commands or ["npm install"]
+        cached_dirs = ['node_modules', self.build_dir]
+        fingerprint = self.build_fingerprint(context, *cached_dirs)
+
+        async def restore() -> bool:
+            context.data['cache_hit'] = False
+            if self.build_cache is None:
+                return True
+            key = await self.build_cache.compute_key(context.path)
+            context.data['build_key'] = key
+            if key and await self.build_cache.restore(key, context.path, cached_dirs):
+                context.data['cache_hit'] = True
+                print(f"[{self.name}] Compilación restaurada desde la caché ({key[:12]})")
+            return True
+
+        async def install() -> bool:
+            if context.data.get('cache_hit'):
+                return True
+            print("\nInstalando dependencias...")
+            for command in install_commands:
+                if not await self.run_command(command, cwd=context.path, env=self.npm_env):
+                    return False
+            return True
+
+        async def build() -> bool:
+            if context.data.get('cache_hit'):
+                return True
+            print("\nCompilando el proyecto...")
+            if not await self.run_command("npm run build", cwd=context.path, env=self.npm_env):
+                return False
+            key = context.data.get('build_key')
+            if self.build_cache is not None and key:
+                try:
+                    if await self.build_cache.store(key, context.path, cached_dirs):
+                        print(f"[{self.name}] Compilación guardada en la caché ({key[:12]})")
+                except Exception as e:
+                    print(f"[{self.name}] No se pudo guardar la compilación en la caché: {str(e)}")
+            return True
+
+        return [
+            Stage('cache', restore, IO, list(depends_on), fingerprint),
+            Stage('install', install, NETWORK, ['cache'], fingerprint),
+            Stage('build', build, CPU, ['install'] + list(build_depends_on or []), fingerprint),
+        ]
+
+    def check_required_env(self, env_vars: Dict, required: List[str]) -> bool:
+        """Verifica que las variables requeridas existan y no estén vacías."""
+        missing = [v for v in required if v not in env_vars]
+        empty   = [v for v in required if v in env_vars and not env_vars[v].strip()]
         
+        if missing:
+            print(f"Faltan variables de entorno: {', '.join(missing)}")
+            print("Configura las credenciales en repositories.json y vuelve a ejecutar.")
+            return False
+        if empty:
+            print(f"Variables vacías: {', '.join(empty)}")
+            print("Configura las credenciales en repositories.json y vuelve a ejecutar.")
+            return False
+        return True
+
     def create_env_file(self, path: str, env_vars: Dict):
         """Crea el archivo .env con las variables de entorno."""
         env_path = os.path.join(path, '.env')
         with open(env_path, 'w') as f:
             for key, value in env_vars.items():
                 f.write(f"{key}={value}\n")
+        record_write(env_path)
                 
-    async def run_command(self, command: str) -> bool:
-        """Ejecuta un comando en la terminal y muestra la salida en tiempo real."""
+    async def run_command(self, command: Union[str, List[str]], cwd: Optional[str] = None,
+                          timeout: Optional[float] = None, env: Optional[Dict[str, str]] = None) -> bool:
+        """Ejecuta un comando sin bloquear el bucle de eventos y muestra la salida en tiempo real.
+
+        Cada línea de stdout y stderr se muestra con el nombre del MCP como
+        prefijo, de modo que la salida de varios MCPs en paralelo se distingue.
+        """
         try:
-            process = subprocess.Popen(
-                command,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                universal_newlines=True
-            )
-            
-            while True:
-                output = process.stdout.readline()
-                if output == '' and process.poll() is not None:
-                    break
-                if output:
-                    print(output.strip())
-                    
-            stderr = process.stderr.read()
-            if stderr:
-                print(f"Error: {stderr}")
-                
-            return process.returncode == 0
+            result = await run_streaming(command, cwd=cwd, env=env, prefix=self.name, timeout=timeout)
+            if not result.ok:
+                print(f"[{self.name}] Error: el comando terminó con código {result.returncode}")
+            return result.ok
             
+        except asyncio.TimeoutError:
+            print(f"[{self.name}] Error: tiempo de espera agotado ({timeout}s) ejecutando: {command}")
+            return False
         except Exception as e:
             print(f"Error ejecutando comando: {str(e)}")
             return False
@@ -74,44 +238,49 @@ def clean_file(self, file_path: str):
                         
                 with open(file_path, 'w', encoding='utf-8') as f:
                     f.write(content)
+                record_write(file_path)
                     
             except Exception as e:
                 print(f"Error al limpiar {os.path.basename(file_path)}: {str(e)}")
                 
+    def get_launch_command(self, path: str) -> Tuple[str, List[str], str]:
+        """Retorna el comando, los argumentos y el directorio para lanzar el servidor.
+
+        Por defecto usa la configuración de Claude Desktop, con rutas relativas
+        al directorio del MCP.
+        """
+        config = self.get_config()
+        return config.get('command', 'node'), list(config.get('args', [])), path
+
     async def verify_server(self, path: str) -> bool:
-        """Verifica que el servidor funcione correctamente."""
+        """Verifica que el servidor responda al handshake MCP ``initialize``.
+
+        Retorna en cuanto el servidor contesta, sin esperas fijas. El tiempo
+        máximo y el intervalo de aviso se toman de SERVER_STARTUP_TIMEOUT y
+        SERVER_HEALTH_CHECK_INTERVAL en default.properties.
+        """
+        client = None
         try:
-            process = subprocess.Popen(
-                "npm start",
-                cwd=path,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                universal_newlines=True
-            )
-            
-            time.sleep(2)
+            command, args, cwd = self.get_launch_command(str(path))
+            print(f"\nIntentando iniciar el servidor: {command} {' '.join(args)}")
+            client = MCPStdioClient(command, args, cwd=cwd, name=self.name)
+            elapsed = await probe_server(client, self.startup_timeout, self.health_check_interval)
             
-            if process.poll() is None:
-                print("Servidor iniciado correctamente!")
-                print("Consejo: Para ver la salida completa del servidor, ejecuta 'npm start' en el CMD")
-                
-                try:
-                    process.terminate()
-                    time.sleep(1)
-                    if process.poll() is None:
-                        process.kill()
-                    time.sleep(1)
-                except Exception:
-                    pass
-                    
+            annotate(ready_after=round(elapsed, 3) if elapsed is not None else None)
+            if elapsed is not None:
+                server = client.server_info.get('name', self.name)
+                print(f"Servidor iniciado correctamente! ({server} respondió en {elapsed:.1f}s)")
                 return True
-            else:
-                print("Error: El servidor no pudo iniciar correctamente")
-                return False
+            
+            print("Error: El servidor no pudo iniciar correctamente")
+            if client.stderr_tail:
+                print("\nErrores encontrados:")
+                print(client.stderr_tail)
+            return False
                 
         except Exception as e:
             print(f"Error al verificar el servidor: {str(e)}")
-            return False 
\ No newline at end of file
+            return False
+        finally:
+            if client:
+                await client.close(grace=0.5)
@@ -0,0 +1,117 @@
+"""
+Caché local de compilaciones de los MCPs basados en Node.
+
+La clave de cada entrada es un hash del commit del repositorio (git HEAD), del
+``package-lock.json``, del ``package.json`` ya modificado y de la versión de
+Node. Si la clave ya existe, ``node_modules`` y la carpeta de compilación se
+restauran desde la caché en lugar de ejecutar ``npm install`` y ``npm run build``.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import List, Optional
+
+from .process_runner import capture_output
+
+# Marca que indica que una entrada se guardó completa
+COMPLETE_MARKER = '.complete'
+
+
+_node_version: Optional[str] = None
+
+
+async def get_node_version() -> str:
+    """Versión de Node instalada; se consulta una sola vez por proceso."""
+    global _node_version
+    if _node_version is None:
+        _node_version = await capture_output(["node", "--version"]) or "unknown"
+    return _node_version
+
+
+async def compute_build_key(path: str) -> Optional[str]:
+    """Hash de las entradas de la compilación de un proyecto Node.
+
+    Combina git HEAD, package-lock.json, package.json y la versión de Node.
+    Retorna None si ``path`` no es un repositorio git.
+    """
+    head = await capture_output(["git", "rev-parse", "HEAD"], cwd=path)
+    if not head:
+        return None
+
+    digest = hashlib.sha256()
+    digest.update(f"commit:{head}\n".encode())
+    digest.update(f"node:{await get_node_version()}\n".encode())
+    for name in ('package-lock.json', 'package.json'):
+        file_path = os.path.join(path, name)
+        digest.update(f"{name}:".encode())
+        if os.path.exists(file_path):
+            with open(file_path, 'rb') as f:
+                digest.update(f.read())
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+class BuildCache:
+    """Guarda y restaura artefactos de compilación indexados por contenido."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    async def compute_key(self, path: str) -> Optional[str]:
+        """Calcula la clave de caché del proyecto, o None si no está en un repositorio git."""
+        return await compute_build_key(path)
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def has(self, key: str) -> bool:
+        return os.path.exists(os.path.join(self._entry_path(key), COMPLETE_MARKER))
+
+    def _restore(self, key: str, path: str, dirs: List[str]) -> bool:
+        entry = self._entry_path(key)
+        for name in dirs:
+            if not os.path.isdir(os.path.join(entry, name)):
+                return False
+        for name in dirs:
+            target = os.path.join(path, name)
+            if os.path.isdir(target):
+                shutil.rmtree(target)
+            shutil.copytree(os.path.join(entry, name), target, symlinks=True)
+        return True
+
+    def _store(self, key: str, path: str, dirs: List[str]):
+        entry = self._entry_path(key)
+        if self.has(key):
+            return
+        os.makedirs(self.root, exist_ok=True)
+
+        # Copiar a una carpeta temporal y renombrar, para no dejar entradas a medias
+        tmp_entry = f"{entry}.tmp-{os.getpid()}-{int(time.time() * 1000)}"
+        try:
+            for name in dirs:
+                shutil.copytree(os.path.join(path, name), os.path.join(tmp_entry, name), symlinks=True)
+            with open(os.path.join(tmp_entry, 'manifest.json'), 'w', encoding='utf-8') as f:
+                json.dump({"dirs": dirs, "created": time.time()}, f, indent=2)
+            open(os.path.join(tmp_entry, COMPLETE_MARKER), 'w').close()
+            if os.path.exists(entry):
+                shutil.rmtree(entry)
+            os.replace(tmp_entry, entry)
+        finally:
+            if os.path.exists(tmp_entry):
+                shutil.rmtree(tmp_entry, ignore_errors=True)
+
+    async def restore(self, key: str, path: str, dirs: List[str]) -> bool:
+        """Restaura las carpetas ``dirs`` en ``path``. Retorna True si hubo acierto."""
+        if not self.has(key):
+            return False
+        return await asyncio.to_thread(self._restore, key, path, dirs)
+
+    async def store(self, key: str, path: str, dirs: List[str]) -> bool:
+        """Guarda las carpetas ``dirs`` de ``path`` en la caché."""
+        if any(not os.path.isdir(os.path.join(path, name)) for name in dirs):
+            return False
+        await asyncio.to_thread(self._store, key, path, dirs)
+        return True
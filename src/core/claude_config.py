@@ -0,0 +1,162 @@
+"""
+Escritura de claude_desktop_config.json.
+
+La configuración se fusiona con el archivo que usa Claude Desktop: solo se
+tocan las entradas de ``mcpServers`` que escribió este proyecto (las registra
+el manifiesto de estado); el resto de entradas y de claves del archivo se
+conservan tal cual y en el mismo orden, aunque tengan el nombre de un MCP
+gestionado.
+
+El archivo se escribe solo si alguna entrada cambió, y de forma atómica
+(archivo temporal en la misma carpeta, fsync y renombrado), de modo que Claude
+Desktop nunca lee un archivo a medias y no se modifica si no hay cambios.
+"""
+import json
+import os
+import sys
+import tempfile
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List
+
+from . import tracing
+
+CONFIG_FILE = 'claude_desktop_config.json'
+# Carpeta de Claude Desktop en Linux si default.properties no indica otra
+DEFAULT_LINUX_CONFIG_DIR = '~/.config/Claude'
+
+
+@dataclass
+class ConfigChanges:
+    """Entradas de ``mcpServers`` añadidas, modificadas, eliminadas y omitidas por ser del usuario."""
+    added: List[str] = field(default_factory=list)
+    updated: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.updated or self.removed)
+
+    def describe(self) -> str:
+        parts = []
+        for label, names in (("añadidas", self.added), ("actualizadas", self.updated), ("eliminadas", self.removed)):
+            if names:
+                parts.append(f"{label}: {', '.join(names)}")
+        return "; ".join(parts) or "sin cambios"
+
+
+def get_config_dir(properties: Dict[str, str], platform: str = sys.platform) -> str:
+    """Carpeta de configuración de Claude Desktop según el sistema operativo.
+
+    Usa WINDOWS_CLAUDE_CONFIG_PATH, MAC_CLAUDE_CONFIG_PATH o
+    LINUX_CLAUDE_CONFIG_PATH (por defecto ``$XDG_CONFIG_HOME/Claude``).
+    """
+    if platform == 'win32':
+        directory = properties.get('WINDOWS_CLAUDE_CONFIG_PATH') or r'%APPDATA%\Claude'
+    elif platform == 'darwin':
+        directory = properties.get('MAC_CLAUDE_CONFIG_PATH') or '~/Library/Application Support/Claude'
+    else:
+        directory = properties.get('LINUX_CLAUDE_CONFIG_PATH')
+        if not directory:
+            xdg_config = os.environ.get('XDG_CONFIG_HOME')
+            directory = os.path.join(xdg_config, 'Claude') if xdg_config else DEFAULT_LINUX_CONFIG_DIR
+    return os.path.expanduser(os.path.expandvars(directory))
+
+
+def atomic_write_json(path: str, data: Any):
+    """Escribe un JSON de forma atómica y duradera.
+
+    El contenido va a un temporal de la misma carpeta, se sincroniza con
+    fsync y se renombra sobre el destino. Si el destino ya existía, el nuevo
+    archivo conserva sus permisos.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        except OSError:
+            pass
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    if sys.platform != 'win32':
+        # Persistir también el renombrado
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    tracing.record_write(path)
+
+
+def read_config(path: str) -> Dict[str, Any]:
+    """Contenido actual del archivo; ``{}`` si no existe.
+
+    Lanza ValueError si el archivo existe pero no es un objeto JSON válido,
+    para no sobrescribir una configuración que no se ha podido leer.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    if not text.strip():
+        return {}
+    try:
+        config = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"{path} no es un JSON válido: {e}")
+    if not isinstance(config, dict) or not isinstance(config.get('mcpServers', {}), dict):
+        raise ValueError(f"{path} no tiene el formato de claude_desktop_config.json")
+    return config
+
+
+def merge_servers(config: Dict[str, Any], servers: Dict[str, Dict],
+                  owned: Iterable[str]) -> ConfigChanges:
+    """Aplica ``servers`` sobre ``config['mcpServers']`` y retorna los cambios.
+
+    ``owned`` son las entradas que escribió este proyecto: las que ya no están
+    en ``servers`` se eliminan. Una entrada de ``servers`` que ya existe sin
+    estar en ``owned`` es del usuario y se deja tal cual (``skipped``). Las
+    existentes mantienen su posición y las nuevas se añaden al final.
+    """
+    current = config.setdefault('mcpServers', {})
+    owned = set(owned)
+    changes = ConfigChanges()
+    for name in [name for name in current if name in owned and name not in servers]:
+        del current[name]
+        changes.removed.append(name)
+    for name, server in servers.items():
+        if name in current and name not in owned:
+            changes.skipped.append(name)
+            continue
+        if name not in current:
+            changes.added.append(name)
+        elif current[name] != server:
+            changes.updated.append(name)
+        else:
+            continue
+        current[name] = server
+    return changes
+
+
+def update_config(path: str, servers: Dict[str, Dict], owned: Iterable[str]) -> ConfigChanges:
+    """Fusiona ``servers`` con el archivo de ``path`` y lo reescribe solo si algo cambió.
+
+    Tras la escritura, las entradas de este proyecto son las de ``servers``
+    menos las omitidas (``changes.skipped``).
+    """
+    config = read_config(path)
+    changes = merge_servers(config, servers, owned)
+    if changes or not os.path.exists(path):
+        atomic_write_json(path, config)
+    return changes
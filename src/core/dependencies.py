@@ -0,0 +1,26 @@
+"""
+Comprobación de las herramientas necesarias (git, node, npm, python).
+
+Cada herramienta se busca en el PATH y su ``--version`` se ejecuta a la vez
+que las demás, sin pasar por una shell.
+"""
+import asyncio
+import shutil
+from typing import Dict, Optional
+
+from .process_runner import capture_output
+
+REQUIRED_COMMANDS = ('git', 'node', 'npm', 'python')
+
+
+async def _probe(command: str, timeout: float) -> Optional[str]:
+    executable = shutil.which(command)
+    if executable is None:
+        return None
+    return await capture_output([executable, '--version'], timeout=timeout)
+
+
+async def probe_dependencies(commands=REQUIRED_COMMANDS, timeout: float = 30) -> Dict[str, Optional[str]]:
+    """Versión de cada comando, o None si no está instalado o no responde."""
+    versions = await asyncio.gather(*(_probe(command, timeout) for command in commands))
+    return dict(zip(commands, versions))
@@ -0,0 +1,150 @@
+"""
+Vigilancia de cambios en archivos.
+
+En Linux se usa inotify (mediante ctypes, sin dependencias) sobre las carpetas
+de los archivos vigilados, lo que también detecta los editores que guardan
+escribiendo un archivo temporal y renombrándolo. En el resto de sistemas, o si
+inotify no está disponible, se compara periódicamente la fecha de modificación
+y el tamaño de cada archivo.
+
+Los cambios se agrupan durante ``debounce`` segundos para que un guardado que
+genera varios eventos produzca una sola notificación.
+"""
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+from typing import AsyncIterator, Dict, Iterable, Optional, Set, Tuple
+
+# Eventos de inotify que indican que el contenido de un archivo pudo cambiar
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct('iIII')
+
+INOTIFY = 'inotify'
+POLLING = 'sondeo'
+
+
+def _stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class FileWatcher:
+    """Notifica los archivos de ``paths`` que cambian, se crean o se eliminan."""
+
+    def __init__(self, paths: Iterable[str], debounce: float = 0.1, poll_interval: float = 1.0):
+        self.paths = {os.path.abspath(path) for path in paths}
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.backend = POLLING
+        self._fd: Optional[int] = None
+        self._watches: Dict[int, str] = {}
+
+    def _start_inotify(self) -> bool:
+        if not sys.platform.startswith('linux'):
+            return False
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                return False
+            for directory in {os.path.dirname(path) for path in self.paths}:
+                wd = libc.inotify_add_watch(fd, os.fsencode(directory), WATCH_MASK)
+                if wd < 0:
+                    os.close(fd)
+                    self._watches.clear()
+                    return False
+                self._watches[wd] = directory
+        except (OSError, AttributeError):
+            return False
+        self._fd = fd
+        self.backend = INOTIFY
+        return True
+
+    def _read_events(self) -> Set[str]:
+        """Archivos vigilados que aparecen en los eventos pendientes de inotify."""
+        changed = set()
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(data):
+                wd, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+                name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0')
+                offset += EVENT_HEADER.size + length
+                path = os.path.join(self._watches.get(wd, ''), os.fsdecode(name))
+                if path in self.paths:
+                    changed.add(path)
+
+    async def _inotify_changes(self) -> AsyncIterator[Set[str]]:
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+        loop.add_reader(self._fd, ready.set)
+        try:
+            while True:
+                await ready.wait()
+                ready.clear()
+                changed = self._read_events()
+                if not changed:
+                    continue
+                # Agrupar los eventos del mismo guardado
+                await asyncio.sleep(self.debounce)
+                changed |= self._read_events()
+                ready.clear()
+                yield changed
+        finally:
+            loop.remove_reader(self._fd)
+
+    async def _polling_changes(self) -> AsyncIterator[Set[str]]:
+        stamps = {path: _stamp(path) for path in self.paths}
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            changed = {path for path in self.paths if _stamp(path) != stamps[path]}
+            if not changed:
+                continue
+            await asyncio.sleep(self.debounce)
+            for path in self.paths:
+                current = _stamp(path)
+                if current != stamps[path]:
+                    changed.add(path)
+                    stamps[path] = current
+            yield changed
+
+    def start(self) -> str:
+        """Elige el mecanismo de vigilancia y lo retorna (``inotify`` o ``sondeo``)."""
+        if self._fd is None:
+            self._start_inotify()
+        return self.backend
+
+    async def changes(self) -> AsyncIterator[Set[str]]:
+        """Itera indefinidamente sobre los conjuntos de archivos modificados."""
+        self.start()
+        iterator = self._inotify_changes() if self._fd is not None else self._polling_changes()
+        try:
+            async for changed in iterator:
+                yield changed
+        finally:
+            await iterator.aclose()
+            self.close()
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            self._watches.clear()
+            self.backend = POLLING
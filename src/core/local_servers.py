@@ -0,0 +1,151 @@
+"""
+Instalación local y fijada de los servidores temporales (NPX_MCPS y UVX_MCPS).
+
+En lugar de ``npx -y paquete`` y ``uvx paquete``, que resuelven el paquete en
+el registro en cada arranque, los servidores se instalan una vez en un prefijo
+de Node y en un entorno virtual de Python gestionados (por defecto en
+``REPOSITORIES_BASE_PATH/.servers``). La versión instalada de cada paquete se
+guarda en ``servers-lock.json`` y se reutiliza en las siguientes instalaciones,
+y la configuración apunta directamente al script de entrada de cada servidor.
+"""
+import asyncio
+import json
+import os
+import sys
+from typing import Any, Dict, Optional
+
+from .process_runner import capture_output, run_streaming
+
+
+class LocalServerInstaller:
+    """Instala los servidores temporales en un prefijo y un entorno virtual propios."""
+
+    def __init__(self, root: str, npm_env: Optional[Dict[str, str]] = None):
+        self.root = root
+        self.node_prefix = os.path.join(root, 'node')
+        self.venv_path = os.path.join(root, 'python', '.venv')
+        self.lock_path = os.path.join(root, 'servers-lock.json')
+        self.npm_env = npm_env or {}
+        self.lock: Dict[str, Dict[str, Any]] = self._load_lock()
+
+    def _load_lock(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.lock_path):
+            return {}
+        try:
+            with open(self.lock_path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('servers', {})
+        except Exception as e:
+            print(f"Error leyendo {self.lock_path}: {str(e)}")
+            return {}
+
+    def save_lock(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self.lock_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"servers": self.lock}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.lock_path)
+
+    def _venv_executable(self, name: str) -> str:
+        if sys.platform == "win32":
+            return os.path.join(self.venv_path, 'Scripts', f"{name}.exe")
+        return os.path.join(self.venv_path, 'bin', name)
+
+    def _pinned_version(self, name: str, config: Dict[str, Any]) -> Optional[str]:
+        """Versión explícita de la configuración o, si no hay, la registrada en el lock."""
+        return config.get('version') or self.lock.get(name, {}).get('version')
+
+    def _node_entry(self, package: str) -> Optional[str]:
+        """Script de entrada (campo ``bin`` o ``main``) de un paquete instalado."""
+        package_dir = os.path.join(self.node_prefix, 'node_modules', *package.split('/'))
+        try:
+            with open(os.path.join(package_dir, 'package.json'), 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        entry = metadata.get('bin')
+        if isinstance(entry, dict):
+            entry = entry.get(package.split('/')[-1]) or next(iter(entry.values()), None)
+        entry = entry or metadata.get('main')
+        if not entry:
+            return None
+        return os.path.abspath(os.path.join(package_dir, entry))
+
+    async def install_node(self, servers: Dict[str, Dict[str, Any]]) -> Dict[str, bool]:
+        """Instala los paquetes npm de ``servers`` en el prefijo gestionado."""
+        os.makedirs(self.node_prefix, exist_ok=True)
+        dependencies = {config['package']: self._pinned_version(name, config) or 'latest'
+                        for name, config in servers.items()}
+        with open(os.path.join(self.node_prefix, 'package.json'), 'w', encoding='utf-8') as f:
+            json.dump({"name": "mcp-local-servers", "private": True, "dependencies": dependencies}, f, indent=2)
+
+        result = await run_streaming("npm install --no-audit --no-fund", cwd=self.node_prefix,
+                                     env=self.npm_env, prefix="npm")
+        status = {}
+        for name, config in servers.items():
+            entry = self._node_entry(config['package']) if result.ok else None
+            if not entry or not os.path.exists(entry):
+                status[name] = False
+                continue
+            with open(os.path.join(self.node_prefix, 'node_modules', *config['package'].split('/'),
+                                   'package.json'), 'r', encoding='utf-8') as f:
+                version = json.load(f).get('version')
+            self.lock[name] = {
+                "package": config['package'],
+                "version": version,
+                "command": "node",
+                "args": [entry.replace("\\", "/")],
+            }
+            status[name] = True
+        return status
+
+    async def install_python(self, servers: Dict[str, Dict[str, Any]]) -> Dict[str, bool]:
+        """Instala los paquetes de PyPI de ``servers`` en el entorno virtual gestionado."""
+        python = self._venv_executable('python')
+        if not os.path.exists(python):
+            os.makedirs(os.path.dirname(self.venv_path), exist_ok=True)
+            result = await run_streaming([sys.executable, "-m", "venv", self.venv_path], prefix="venv")
+            if not result.ok:
+                return {name: False for name in servers}
+
+        specs = []
+        for name, config in servers.items():
+            version = self._pinned_version(name, config)
+            specs.append(f"{config['package']}=={version}" if version else config['package'])
+        result = await run_streaming([python, "-m", "pip", "install", "--disable-pip-version-check", *specs],
+                                     prefix="pip")
+
+        status = {}
+        for name, config in servers.items():
+            entry = self._venv_executable(config.get('entry', config['package']))
+            if not result.ok or not os.path.exists(entry):
+                status[name] = False
+                continue
+            version = await capture_output(
+                [python, "-c", f"import importlib.metadata as m; print(m.version({config['package']!r}))"])
+            self.lock[name] = {
+                "package": config['package'],
+                "version": version,
+                "command": entry.replace("\\", "/"),
+                "args": [],
+            }
+            status[name] = True
+        return status
+
+    async def install(self, npx_servers: Dict[str, Dict[str, Any]],
+                      uvx_servers: Dict[str, Dict[str, Any]]) -> Dict[str, bool]:
+        """Instala a la vez los servidores npm y los de Python y guarda el lock."""
+        node_status, python_status = await asyncio.gather(
+            self.install_node(npx_servers), self.install_python(uvx_servers))
+        self.save_lock()
+        return {**node_status, **python_status}
+
+    def get_config(self, name: str) -> Optional[Dict[str, Any]]:
+        """Comando y argumentos del servidor instalado localmente, o None si no lo está."""
+        entry = self.lock.get(name)
+        if not entry:
+            return None
+        script = entry['args'][0] if entry['args'] else entry['command']
+        if not os.path.exists(script):
+            return None
+        return {"command": entry['command'], "args": list(entry['args'])}
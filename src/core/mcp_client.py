@@ -0,0 +1,247 @@
+"""
+Cliente mínimo del protocolo MCP sobre stdio (JSON-RPC 2.0 delimitado por líneas).
+
+Se usa para comprobar que un servidor está listo (handshake ``initialize``) y
+para hablar con él una vez arrancado. Las líneas de stdout que no son JSON
+(por ejemplo, la cabecera que imprime ``npm start``) se ignoran.
+"""
+import asyncio
+import itertools
+import json
+import os
+import shutil
+import sys
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set
+
+# Versión del protocolo que se anuncia en el handshake
+PROTOCOL_VERSION = "2024-11-05"
+CLIENT_INFO = {"name": "mcp-claude-setup", "version": "1.0.0"}
+
+# Límite por línea del lector; las respuestas de tools/list pueden ser grandes
+STREAM_LIMIT = 16 * 1024 * 1024
+
+
+class MCPError(Exception):
+    """Error retornado por el servidor en una respuesta JSON-RPC."""
+
+    def __init__(self, error: Dict[str, Any]):
+        self.code = error.get('code')
+        self.data = error.get('data')
+        super().__init__(error.get('message', 'Error desconocido'))
+
+
+class MCPStdioClient:
+    """Lanza un servidor MCP y le envía peticiones JSON-RPC por stdin/stdout."""
+
+    def __init__(self, command: str, args: Optional[List[str]] = None, cwd: Optional[str] = None,
+                 env: Optional[Dict[str, str]] = None, name: str = ""):
+        self.command = command
+        self.args = list(args or [])
+        self.cwd = cwd
+        self.env = env
+        self.name = name or os.path.basename(command)
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.server_info: Dict[str, Any] = {}
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._stderr_tail: Deque[str] = deque(maxlen=50)
+        self._reader: Optional[asyncio.Task] = None
+        self._stderr_reader: Optional[asyncio.Task] = None
+        self._write_lock = asyncio.Lock()
+        self._replies: Set[asyncio.Task] = set()
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid if self.process else None
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    @property
+    def stderr_tail(self) -> str:
+        """Últimas líneas de stderr del servidor, útiles para diagnosticar fallos."""
+        return "\n".join(self._stderr_tail)
+
+    async def start(self):
+        """Lanza el proceso del servidor."""
+        env = None
+        if self.env:
+            env = dict(os.environ)
+            env.update(self.env)
+
+        # En Windows, node/uv/npx pueden ser .cmd o .exe; create_subprocess_exec necesita la ruta real
+        executable = shutil.which(self.command) or self.command
+        args = [executable] + self.args
+        if sys.platform == "win32" and executable.lower().endswith(('.cmd', '.bat')):
+            args = ["cmd", "/c"] + args
+
+        self.process = await asyncio.create_subprocess_exec(
+            *args,
+            cwd=self.cwd,
+            env=env,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=STREAM_LIMIT,
+        )
+        self._reader = asyncio.create_task(self._read_stdout())
+        self._stderr_reader = asyncio.create_task(self._read_stderr())
+
+    async def _read_stdout(self):
+        """Despacha cada respuesta JSON-RPC a la petición que la espera.
+
+        Los mensajes con ``method`` son del servidor: las notificaciones se
+        ignoran y las peticiones se contestan sin bloquear la lectura.
+        """
+        try:
+            while True:
+                line = await self.process.stdout.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                if not isinstance(message, dict) or 'id' not in message:
+                    continue
+                if 'method' in message:
+                    task = asyncio.create_task(self._reply(message))
+                    self._replies.add(task)
+                    task.add_done_callback(self._replies.discard)
+                    continue
+                future = self._pending.pop(message['id'], None)
+                if future and not future.done():
+                    future.set_result(message)
+        finally:
+            await self.process.wait()
+            error = ConnectionError(f"El servidor {self.name} terminó con código {self.process.returncode}")
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self._pending.clear()
+
+    async def _read_stderr(self):
+        """Consume stderr para que el servidor no se bloquee y guarda las últimas líneas."""
+        while True:
+            line = await self.process.stderr.readline()
+            if not line:
+                break
+            self._stderr_tail.append(line.decode(errors='replace').rstrip())
+
+    async def _reply(self, request: Dict[str, Any]):
+        """Contesta una petición del servidor: ``ping`` con un resultado vacío y el resto como no soportada."""
+        reply: Dict[str, Any] = {"jsonrpc": "2.0", "id": request['id']}
+        if request['method'] == "ping":
+            reply["result"] = {}
+        else:
+            reply["error"] = {"code": -32601, "message": f"Método no soportado: {request['method']}"}
+        try:
+            await self._send(reply)
+        except (ConnectionError, OSError):
+            pass
+
+    async def _send(self, message: Dict[str, Any]):
+        if not self.alive:
+            raise ConnectionError(f"El servidor {self.name} no está en ejecución")
+        data = (json.dumps(message) + "\n").encode()
+        async with self._write_lock:
+            self.process.stdin.write(data)
+            await self.process.stdin.drain()
+
+    async def request(self, method: str, params: Optional[Dict[str, Any]] = None,
+                      timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Envía una petición y retorna el campo ``result`` de la respuesta."""
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        message = {"jsonrpc": "2.0", "id": request_id, "method": method}
+        if params is not None:
+            message["params"] = params
+        try:
+            await self._send(message)
+            response = await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(request_id, None)
+        if 'error' in response:
+            raise MCPError(response['error'])
+        return response.get('result', {})
+
+    async def notify(self, method: str, params: Optional[Dict[str, Any]] = None):
+        """Envía una notificación (sin respuesta)."""
+        message = {"jsonrpc": "2.0", "method": method}
+        if params is not None:
+            message["params"] = params
+        await self._send(message)
+
+    async def initialize(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Realiza el handshake ``initialize`` del protocolo MCP."""
+        result = await self.request("initialize", {
+            "protocolVersion": PROTOCOL_VERSION,
+            "capabilities": {},
+            "clientInfo": CLIENT_INFO,
+        }, timeout=timeout)
+        self.server_info = result.get('serverInfo', {})
+        await self.notify("notifications/initialized")
+        return result
+
+    async def close(self, grace: float = 2.0):
+        """Cierra stdin y termina el servidor si no sale por sí solo."""
+        if self.process is None:
+            return
+        if self.process.returncode is None:
+            try:
+                self.process.stdin.close()
+            except Exception:
+                pass
+            try:
+                await asyncio.wait_for(self.process.wait(), grace)
+            except asyncio.TimeoutError:
+                try:
+                    self.process.terminate()
+                    await asyncio.wait_for(self.process.wait(), grace)
+                except asyncio.TimeoutError:
+                    self.process.kill()
+                    await self.process.wait()
+                except ProcessLookupError:
+                    pass
+        for task in (self._reader, self._stderr_reader):
+            if task:
+                try:
+                    await task
+                except Exception:
+                    pass
+
+
+async def probe_server(client: MCPStdioClient, timeout: float, interval: float) -> Optional[float]:
+    """Espera a que el servidor responda al handshake ``initialize``.
+
+    Retorna en cuanto el servidor contesta, con los segundos transcurridos, o
+    None si el proceso termina o se agota ``timeout``. Cada ``interval``
+    segundos se informa del tiempo de espera.
+    """
+    start = time.perf_counter()
+    if not client.alive:
+        await client.start()
+
+    handshake = asyncio.create_task(client.initialize())
+    try:
+        while True:
+            elapsed = time.perf_counter() - start
+            remaining = timeout - elapsed
+            if remaining <= 0:
+                print(f"[{client.name}] El servidor no respondió en {timeout:.0f}s")
+                return None
+            done, _ = await asyncio.wait({handshake}, timeout=min(interval, remaining))
+            if done:
+                handshake.result()
+                return time.perf_counter() - start
+            print(f"[{client.name}] Esperando al servidor... ({time.perf_counter() - start:.1f}s)")
+    except (ConnectionError, MCPError) as e:
+        print(f"[{client.name}] {str(e)}")
+        return None
+    finally:
+        if not handshake.done():
+            handshake.cancel()
@@ -0,0 +1,257 @@
+"""
+Planificador de etapas de aprovisionamiento con dependencias explícitas.
+
+Cada MCP declara su configuración como una lista de etapas (``Stage``) con sus
+dependencias. El ``PipelineScheduler`` ejecuta las etapas de todos los
+repositorios a la vez respetando el grafo de dependencias, de modo que la
+clonación de un repositorio se solapa con el ``npm install`` de otro. Cada tipo
+de etapa (red, CPU, disco) tiene su propio pool de trabajadores.
+
+Con un ``ProvisioningState`` el scheduler es incremental: una etapa con
+``fingerprint`` se omite si su huella coincide con la registrada en la última
+ejecución correcta y ninguna de sus dependencias se ejecutó en esta pasada.
+
+Cada trabajo y cada etapa ejecutada se registran como spans en la traza activa
+(ver ``tracing``).
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+from . import tracing
+from .provisioning_state import ProvisioningState
+
+# Tipos de etapa, cada uno con su propio pool de trabajadores
+NETWORK = 'network'
+CPU = 'cpu'
+IO = 'io'
+
+DEFAULT_POOL_SIZES = {
+    NETWORK: 4,
+    CPU: 2,
+    IO: 8,
+}
+
+# Estados posibles de una etapa tras la ejecución
+STAGE_OK = 'ok'
+STAGE_UNCHANGED = 'unchanged'
+STAGE_FAILED = 'failed'
+STAGE_SKIPPED = 'skipped'
+
+# Valor que una acción puede retornar para indicar que terminó bien sin cambiar
+# nada (por ejemplo, una validación o un repositorio ya actualizado). Sus
+# dependientes no se ven obligados a ejecutarse de nuevo.
+UNCHANGED = STAGE_UNCHANGED
+
+# Estados que permiten continuar con las etapas dependientes
+SUCCESS_STATUSES = (STAGE_OK, STAGE_UNCHANGED)
+
+
+@dataclass
+class SetupContext:
+    """Estado compartido por las etapas de un mismo MCP.
+
+    ``path`` puede cambiar durante la ejecución (por ejemplo, cuando tras
+    clonar se detecta una subcarpeta con el mismo nombre), por eso las etapas
+    deben leerlo al ejecutarse y no al construirse.
+    """
+    path: str
+    env_vars: Dict[str, str]
+    data: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class Stage:
+    """Una etapa del pipeline: una acción asíncrona que retorna True si tuvo éxito.
+
+    ``fingerprint`` es opcional y retorna una huella de las entradas de la
+    etapa, o None si la etapa debe ejecutarse siempre (por ejemplo, porque
+    faltan sus artefactos).
+    """
+    name: str
+    action: Callable[[], Awaitable[Union[bool, str]]]
+    kind: str = IO
+    depends_on: List[str] = field(default_factory=list)
+    fingerprint: Optional[Callable[[], Awaitable[Optional[str]]]] = None
+
+
+@dataclass
+class StageResult:
+    """Resultado y duración de una etapa."""
+    name: str
+    kind: str
+    status: str
+    duration: float = 0.0
+
+
+@dataclass
+class JobResult:
+    """Resultado de todas las etapas de un trabajo (un MCP)."""
+    name: str
+    stages: List[StageResult] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return all(stage.status in SUCCESS_STATUSES for stage in self.stages)
+
+    def status(self, stage_name: str) -> Optional[str]:
+        for stage in self.stages:
+            if stage.name == stage_name:
+                return stage.status
+        return None
+
+    @property
+    def duration(self) -> float:
+        return sum(stage.duration for stage in self.stages)
+
+
+class PipelineScheduler:
+    """Ejecuta los grafos de etapas de varios trabajos de forma concurrente."""
+
+    def __init__(self, pool_sizes: Optional[Dict[str, int]] = None, max_jobs: Optional[int] = None,
+                 state: Optional[ProvisioningState] = None):
+        self.pool_sizes = dict(DEFAULT_POOL_SIZES)
+        self.pool_sizes.update(pool_sizes or {})
+        self.max_jobs = max_jobs
+        self.state = state
+        self._jobs: Dict[str, List[Stage]] = {}
+
+    def add_job(self, name: str, stages: List[Stage]):
+        """Registra un trabajo validando que su grafo de etapas sea ejecutable."""
+        if name in self._jobs:
+            raise ValueError(f"El trabajo {name} ya está registrado")
+
+        names = [stage.name for stage in stages]
+        if len(names) != len(set(names)):
+            raise ValueError(f"Etapas duplicadas en el trabajo {name}")
+
+        by_name = {stage.name: stage for stage in stages}
+        for stage in stages:
+            if stage.kind not in self.pool_sizes:
+                raise ValueError(f"Tipo de etapa desconocido '{stage.kind}' en {name}/{stage.name}")
+            for dep in stage.depends_on:
+                if dep not in by_name:
+                    raise ValueError(f"La etapa {name}/{stage.name} depende de '{dep}', que no existe")
+
+        # Detectar ciclos con un recorrido topológico
+        pending = {stage.name: set(stage.depends_on) for stage in stages}
+        while pending:
+            ready = [stage for stage, deps in pending.items() if not deps]
+            if not ready:
+                raise ValueError(f"Dependencias cíclicas en el trabajo {name}: {', '.join(pending)}")
+            for stage in ready:
+                del pending[stage]
+            for deps in pending.values():
+                deps.difference_update(ready)
+
+        self._jobs[name] = list(stages)
+
+    async def run(self) -> Dict[str, JobResult]:
+        """Ejecuta todos los trabajos registrados y retorna sus resultados en orden de registro."""
+        pools = {kind: asyncio.Semaphore(size) for kind, size in self.pool_sizes.items()}
+        job_limit = asyncio.Semaphore(self.max_jobs) if self.max_jobs else None
+
+        async def run_job_limited(name: str, stages: List[Stage]) -> JobResult:
+            if job_limit is None:
+                return await self._run_job(name, stages, pools)
+            async with job_limit:
+                return await self._run_job(name, stages, pools)
+
+        results = await asyncio.gather(
+            *(run_job_limited(name, stages) for name, stages in self._jobs.items())
+        )
+        return {result.name: result for result in results}
+
+    async def _run_job(self, job: str, stages: List[Stage], pools: Dict[str, asyncio.Semaphore]) -> JobResult:
+        """Ejecuta el grafo de etapas de un trabajo dentro de un span con su nombre."""
+        with tracing.span(job, 'job', track=job) as job_span:
+            result = await self._run_stages(job, stages, pools)
+            job_span.attrs['status'] = STAGE_OK if result.ok else STAGE_FAILED
+        return result
+
+    async def _run_stages(self, job: str, stages: List[Stage], pools: Dict[str, asyncio.Semaphore]) -> JobResult:
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_stage(stage: Stage) -> StageResult:
+            # Esperar a las dependencias; si alguna no terminó bien, la etapa se omite
+            dep_results = [await tasks[dep] for dep in stage.depends_on]
+            if any(result.status not in SUCCESS_STATUSES for result in dep_results):
+                return StageResult(stage.name, stage.kind, STAGE_SKIPPED)
+
+            # Omitir la etapa si sus entradas no cambiaron desde la última ejecución correcta
+            deps_ran = any(result.status == STAGE_OK for result in dep_results)
+            if self.state is not None and stage.fingerprint is not None and not deps_ran:
+                try:
+                    fingerprint = await stage.fingerprint()
+                except Exception:
+                    fingerprint = None
+                if fingerprint is not None and self.state.is_current(job, stage.name, fingerprint):
+                    return StageResult(stage.name, stage.kind, STAGE_UNCHANGED)
+
+            async with pools[stage.kind]:
+                with tracing.span(stage.name, 'stage', kind=stage.kind) as stage_span:
+                    start = time.perf_counter()
+                    try:
+                        outcome = await stage.action()
+                    except Exception as e:
+                        print(f"[{job}] Error en la etapa {stage.name}: {str(e)}")
+                        stage_span.attrs['error'] = str(e)
+                        outcome = False
+                    duration = time.perf_counter() - start
+
+                    if outcome == UNCHANGED:
+                        status = STAGE_UNCHANGED
+                    else:
+                        status = STAGE_OK if outcome else STAGE_FAILED
+                    stage_span.attrs['status'] = status
+            return StageResult(stage.name, stage.kind, status, duration)
+
+        # Crear las tareas en orden topológico para que las dependencias existan al esperarlas
+        remaining = list(stages)
+        while remaining:
+            for stage in list(remaining):
+                if all(dep in tasks for dep in stage.depends_on):
+                    tasks[stage.name] = asyncio.create_task(run_stage(stage))
+                    remaining.remove(stage)
+
+        results = await asyncio.gather(*(tasks[stage.name] for stage in stages))
+        if self.state is not None:
+            await self._record(job, stages, results)
+        return JobResult(job, list(results))
+
+    async def _record(self, job: str, stages: List[Stage], results: List[StageResult]):
+        """Registra las huellas de las etapas al terminar el trabajo.
+
+        Se calculan sobre el estado final, porque una etapa posterior puede
+        modificar las entradas de otra (``npm install dotenv`` cambia
+        package.json, del que depende la etapa de caché).
+        """
+        for stage, result in zip(stages, results):
+            if stage.fingerprint is None or result.status == STAGE_SKIPPED:
+                continue
+            if result.status == STAGE_FAILED:
+                self.state.record_stage(job, stage.name, None, False)
+                continue
+            try:
+                fingerprint = await stage.fingerprint()
+            except Exception:
+                fingerprint = None
+            self.state.record_stage(job, stage.name, fingerprint, fingerprint is not None)
+
+
+def format_report(results: Dict[str, JobResult]) -> str:
+    """Genera un informe de tiempos por etapa para cada trabajo."""
+    lines = ["=== Tiempos por etapa ==="]
+    for job in results.values():
+        lines.append(f"{job.name} ({job.duration:.1f}s)")
+        for stage in job.stages:
+            kind = f"[{stage.kind}]"
+            if stage.status == STAGE_SKIPPED:
+                lines.append(f"  - {stage.name:<12} {kind:<10} omitida")
+            elif stage.status == STAGE_UNCHANGED:
+                lines.append(f"  - {stage.name:<12} {kind:<10} sin cambios")
+            else:
+                lines.append(f"  - {stage.name:<12} {kind:<10} {stage.duration:6.1f}s {stage.status}")
+    lines.append("================================")
+    return "\n".join(lines)
@@ -0,0 +1,230 @@
+"""
+Memoria residente (RSS) y tiempo de CPU de procesos y de sus hijos.
+
+Los servidores MCP se lanzan a menudo a través de intermediarios (``npx`` lanza
+``node``, ``uvx`` lanza ``python``, en Windows ``cmd /c``), por lo que la
+memoria relevante es la de todo el árbol de procesos. Se usa ``/proc`` en
+Linux, ``ps`` en macOS y la API de Windows mediante ctypes, sin dependencias
+externas. Las funciones retornan None si la información no está disponible.
+"""
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+
+def _linux_rss(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status", 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        return None
+    return 0
+
+
+def _linux_children(pid: int) -> List[int]:
+    children = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children", 'r') as f:
+                children.extend(int(child) for child in f.read().split())
+    except (OSError, ValueError):
+        pass
+    return children
+
+
+def _ps_rss(pid: int) -> Optional[int]:
+    try:
+        output = subprocess.run(["ps", "-o", "rss=", "-p", str(pid)], capture_output=True, text=True).stdout
+        return int(output.strip()) * 1024
+    except (OSError, ValueError):
+        return None
+
+
+def _ps_children(pid: int) -> List[int]:
+    try:
+        output = subprocess.run(["pgrep", "-P", str(pid)], capture_output=True, text=True).stdout
+        return [int(child) for child in output.split()]
+    except (OSError, ValueError):
+        return []
+
+
+def _windows_rss(pid: int) -> Optional[int]:
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    PROCESS_VM_READ = 0x0010
+    kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    psapi = ctypes.WinDLL('psapi', use_last_error=True)
+    handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION | PROCESS_VM_READ, False, pid)
+    if not handle:
+        return None
+    try:
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        if not psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return None
+        return counters.WorkingSetSize
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def _windows_parents() -> Dict[int, List[int]]:
+    """Mapa padre -> hijos de todos los procesos (instantánea Toolhelp32)."""
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESSENTRY32(ctypes.Structure):
+        _fields_ = [
+            ("dwSize", wintypes.DWORD),
+            ("cntUsage", wintypes.DWORD),
+            ("th32ProcessID", wintypes.DWORD),
+            ("th32DefaultHeapID", ctypes.c_void_p),
+            ("th32ModuleID", wintypes.DWORD),
+            ("cntThreads", wintypes.DWORD),
+            ("th32ParentProcessID", wintypes.DWORD),
+            ("pcPriClassBase", ctypes.c_long),
+            ("dwFlags", wintypes.DWORD),
+            ("szExeFile", ctypes.c_char * 260),
+        ]
+
+    TH32CS_SNAPPROCESS = 0x00000002
+    kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    kernel32.CreateToolhelp32Snapshot.restype = wintypes.HANDLE
+    snapshot = kernel32.CreateToolhelp32Snapshot(TH32CS_SNAPPROCESS, 0)
+    tree: Dict[int, List[int]] = {}
+    if not snapshot or snapshot == wintypes.HANDLE(-1).value:
+        return tree
+    try:
+        entry = PROCESSENTRY32()
+        entry.dwSize = ctypes.sizeof(entry)
+        ok = kernel32.Process32First(snapshot, ctypes.byref(entry))
+        while ok:
+            tree.setdefault(entry.th32ParentProcessID, []).append(entry.th32ProcessID)
+            ok = kernel32.Process32Next(snapshot, ctypes.byref(entry))
+    finally:
+        kernel32.CloseHandle(snapshot)
+    return tree
+
+
+def _linux_cpu_time(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/stat", 'r') as f:
+            # El nombre del proceso va entre paréntesis y puede contener espacios
+            fields = f.read().rsplit(')', 1)[1].split()
+        ticks = int(fields[11]) + int(fields[12])
+        return ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _ps_cpu_time(pid: int) -> Optional[float]:
+    try:
+        output = subprocess.run(["ps", "-o", "time=", "-p", str(pid)], capture_output=True, text=True).stdout
+        parts = output.strip().replace('-', ':').split(':')
+        seconds = 0.0
+        for part in parts:
+            seconds = seconds * 60 + float(part)
+        return seconds
+    except (OSError, ValueError):
+        return None
+
+
+def _windows_cpu_time(pid: int) -> Optional[float]:
+    import ctypes
+    from ctypes import wintypes
+
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not handle:
+        return None
+    try:
+        creation, exit_time, kernel, user = (wintypes.FILETIME() for _ in range(4))
+        if not kernel32.GetProcessTimes(handle, ctypes.byref(creation), ctypes.byref(exit_time),
+                                        ctypes.byref(kernel), ctypes.byref(user)):
+            return None
+        to_int = lambda t: (t.dwHighDateTime << 32) | t.dwLowDateTime
+        # FILETIME se expresa en intervalos de 100 ns
+        return (to_int(kernel) + to_int(user)) / 1e7
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def get_rss(pid: int) -> Optional[int]:
+    """Memoria residente de un proceso en bytes."""
+    if sys.platform.startswith('linux'):
+        return _linux_rss(pid)
+    if sys.platform == 'win32':
+        return _windows_rss(pid)
+    return _ps_rss(pid)
+
+
+def get_process_tree(pid: int) -> List[int]:
+    """El proceso y todos sus descendientes."""
+    if sys.platform == 'win32':
+        tree = _windows_parents()
+        children_of = lambda p: tree.get(p, [])
+    elif sys.platform.startswith('linux'):
+        children_of = _linux_children
+    else:
+        children_of = _ps_children
+
+    pids, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        if current in pids:
+            continue
+        pids.append(current)
+        pending.extend(children_of(current))
+    return pids
+
+
+def get_tree_rss(pid: int) -> Optional[int]:
+    """Memoria residente del proceso y sus descendientes en bytes."""
+    sizes = [get_rss(child) for child in get_process_tree(pid)]
+    sizes = [size for size in sizes if size is not None]
+    return sum(sizes) if sizes else None
+
+
+def get_cpu_time(pid: int) -> Optional[float]:
+    """Segundos de CPU (usuario + sistema) consumidos por un proceso."""
+    if sys.platform.startswith('linux'):
+        return _linux_cpu_time(pid)
+    if sys.platform == 'win32':
+        return _windows_cpu_time(pid)
+    return _ps_cpu_time(pid)
+
+
+def get_tree_cpu_time(pid: int) -> Optional[float]:
+    """Segundos de CPU consumidos por el proceso y sus descendientes vivos."""
+    times = [get_cpu_time(child) for child in get_process_tree(pid)]
+    times = [value for value in times if value is not None]
+    return sum(times) if times else None
+
+
+def format_bytes(size: Optional[float]) -> str:
+    if size is None:
+        return "-"
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
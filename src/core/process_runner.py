@@ -0,0 +1,174 @@
+"""
+Ejecución de comandos externos sin bloquear el bucle de eventos.
+
+``run_streaming`` lanza el proceso con ``asyncio``, lee stdout y stderr a la vez
+(evitando el bloqueo cuando uno de los dos llena el buffer del pipe) y muestra
+cada línea con el nombre del MCP como prefijo. Si se agota el tiempo de espera
+o la tarea se cancela, el proceso y sus hijos se terminan. El código de salida
+y los bytes leídos se registran en el span de traza actual.
+"""
+import asyncio
+import logging
+import os
+import signal
+import subprocess
+import sys
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Union
+
+from . import tracing
+
+logger = logging.getLogger('mcp.process')
+
+# Límite por línea del lector de asyncio; npm puede emitir líneas muy largas
+STREAM_LIMIT = 1024 * 1024
+
+
+@dataclass
+class CommandResult:
+    """Resultado de un comando ejecutado con ``run_streaming``."""
+    returncode: int
+    stdout: str = ""
+    stderr: str = ""
+    stdout_bytes: int = 0
+    stderr_bytes: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+
+async def _pump(stream: asyncio.StreamReader, prefix: str, echo: bool, sink: Optional[List[str]]) -> int:
+    """Lee un stream línea a línea, lo muestra y retorna la cantidad de bytes leídos."""
+    total = 0
+    while True:
+        line = await stream.readline()
+        if not line:
+            return total
+        total += len(line)
+        text = line.decode(errors='replace').rstrip()
+        if sink is not None:
+            sink.append(text)
+        if text and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s%s", prefix, text)
+        if echo and text:
+            print(f"{prefix}{text}")
+
+
+async def _terminate(process: asyncio.subprocess.Process):
+    """Termina el proceso junto con sus hijos (npm lanza node, la shell lanza npm)."""
+    if process.returncode is not None:
+        return
+    try:
+        if sys.platform == "win32":
+            killer = await asyncio.create_subprocess_exec(
+                "taskkill", "/F", "/T", "/PID", str(process.pid),
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            await killer.wait()
+        else:
+            os.killpg(process.pid, signal.SIGTERM)
+            try:
+                await asyncio.wait_for(process.wait(), 5)
+            except asyncio.TimeoutError:
+                os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    if process.returncode is None:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+    await process.wait()
+
+
+async def run_streaming(command: Union[str, List[str]],
+                        cwd: Optional[str] = None,
+                        env: Optional[Dict[str, str]] = None,
+                        prefix: str = "",
+                        timeout: Optional[float] = None,
+                        capture: bool = False,
+                        echo: bool = True,
+                        trace: bool = True) -> CommandResult:
+    """Ejecuta un comando mostrando su salida en tiempo real.
+
+    Args:
+        command: Comando como texto (se ejecuta en una shell) o lista de argumentos.
+        cwd: Directorio de trabajo.
+        env: Variables de entorno adicionales a las del proceso actual.
+        prefix: Prefijo de cada línea mostrada, normalmente el nombre del MCP.
+        timeout: Segundos máximos de ejecución, hasta que el proceso termina; al agotarse se
+            termina el proceso y se lanza asyncio.TimeoutError.
+        capture: Si es True, guarda la salida en el resultado.
+        echo: Si es False, no muestra la salida.
+        trace: Si es False, el comando no se registra en el span de traza actual.
+
+    Returns:
+        CommandResult: Código de salida, salida capturada y bytes leídos.
+    """
+    line_prefix = f"[{prefix}] " if prefix else ""
+    process_env = None
+    if env:
+        process_env = dict(os.environ)
+        process_env.update(env)
+
+    kwargs = dict(
+        cwd=cwd,
+        env=process_env,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        limit=STREAM_LIMIT,
+    )
+    if sys.platform == "win32":
+        kwargs['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        # Grupo de procesos propio para poder terminar también a los hijos
+        kwargs['start_new_session'] = True
+
+    if isinstance(command, str):
+        process = await asyncio.create_subprocess_shell(command, **kwargs)
+    else:
+        process = await asyncio.create_subprocess_exec(*command, **kwargs)
+
+    stdout_lines: Optional[List[str]] = [] if capture else None
+    stderr_lines: Optional[List[str]] = [] if capture else None
+    readers = asyncio.gather(
+        _pump(process.stdout, line_prefix, echo, stdout_lines),
+        _pump(process.stderr, line_prefix, echo, stderr_lines),
+    )
+
+    try:
+        # Un único plazo para la salida y el final del proceso: un hijo que cierra
+        # sus tuberías y sigue en marcha también se termina al agotarse
+        (stdout_bytes, stderr_bytes), _ = await asyncio.wait_for(
+            asyncio.gather(asyncio.shield(readers), process.wait()), timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        await _terminate(process)
+        readers.cancel()
+        try:
+            await readers
+        except (asyncio.CancelledError, Exception):
+            pass
+        raise
+
+    if trace:
+        tracing.record_command(process.returncode, stdout_bytes, stderr_bytes)
+    return CommandResult(
+        returncode=process.returncode,
+        stdout="\n".join(stdout_lines or []),
+        stderr="\n".join(stderr_lines or []),
+        stdout_bytes=stdout_bytes,
+        stderr_bytes=stderr_bytes,
+    )
+
+
+async def capture_output(command: Union[str, List[str]], cwd: Optional[str] = None,
+                         timeout: Optional[float] = 30) -> Optional[str]:
+    """Ejecuta un comando sin mostrar su salida y retorna stdout, o None si falla."""
+    try:
+        result = await run_streaming(command, cwd=cwd, capture=True, echo=False, timeout=timeout, trace=False)
+    except Exception:
+        return None
+    return result.stdout.strip() if result.ok else None
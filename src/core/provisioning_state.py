@@ -0,0 +1,105 @@
+"""
+Estado persistido del aprovisionamiento de los MCPs.
+
+Guarda, por cada MCP, el commit desplegado, el hash de su ``.env``, el hash de
+los artefactos compilados, el resultado de la verificación y la huella de cada
+etapa. Con esta información una nueva ejecución solo repite las etapas cuyas
+entradas cambiaron. También registra qué entradas de cada
+claude_desktop_config.json escribió este proyecto, las únicas que modifica.
+"""
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, Optional, Set
+
+STATE_VERSION = 1
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def hash_env(env_vars: Dict[str, str]) -> str:
+    """Hash estable de un conjunto de variables de entorno."""
+    return hash_text(json.dumps(env_vars, sort_keys=True))
+
+
+def hash_tree(path: str) -> Optional[str]:
+    """Hash del contenido de una carpeta (rutas relativas y bytes), o None si no existe."""
+    if not os.path.isdir(path):
+        return None
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            digest.update(os.path.relpath(file_path, path).replace("\\", "/").encode())
+            digest.update(b"\0")
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ProvisioningState:
+    """Manifiesto JSON con el estado de aprovisionamiento de cada MCP."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data: Dict[str, Any] = {"version": STATE_VERSION, "mcps": {}}
+        self.load()
+
+    def load(self):
+        """Carga el manifiesto; si no existe o está dañado se empieza de cero."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == STATE_VERSION:
+                self.data = data
+        except Exception as e:
+            print(f"Error leyendo el estado de aprovisionamiento ({self.path}): {str(e)}")
+
+    def save(self):
+        """Escribe el manifiesto de forma atómica."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def mcp(self, name: str) -> Dict[str, Any]:
+        """Retorna (creándola si hace falta) la entrada de un MCP."""
+        return self.data["mcps"].setdefault(name, {"stages": {}})
+
+    def is_current(self, name: str, stage: str, fingerprint: str) -> bool:
+        """Indica si la etapa terminó bien la última vez con la misma huella."""
+        record = self.data["mcps"].get(name, {}).get("stages", {}).get(stage)
+        return bool(record and record.get("ok") and record.get("fingerprint") == fingerprint)
+
+    def record_stage(self, name: str, stage: str, fingerprint: Optional[str], ok: bool):
+        self.mcp(name)["stages"][stage] = {"fingerprint": fingerprint, "ok": ok}
+
+    def update_mcp(self, name: str, **info: Any):
+        """Actualiza los datos generales de un MCP (commit, hashes, verificación...)."""
+        entry = self.mcp(name)
+        entry.update(info)
+        entry["updated_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+    def claude_servers(self, config_path: str) -> Set[str]:
+        """Entradas de ``mcpServers`` que este proyecto escribió en ``config_path``."""
+        return set(self.data.get("claude_servers", {}).get(config_path, []))
+
+    def set_claude_servers(self, config_path: str, names: Iterable[str]):
+        self.data.setdefault("claude_servers", {})[config_path] = sorted(names)
+
+    def forget(self, name: str):
+        """Elimina el estado de un MCP para forzar su reconfiguración completa."""
+        self.data["mcps"].pop(name, None)
@@ -0,0 +1,247 @@
+"""
+Trazas de tiempos del aprovisionamiento.
+
+Cada fase (clonación, .env, parches, instalación, compilación, verificación)
+se registra como un ``Span`` con su duración y atributos: códigos de salida y
+bytes de salida de los comandos que ejecuta, bytes escritos en archivos, etc.
+Los spans se anidan por contexto de asyncio, de modo que las etapas que el
+``PipelineScheduler`` ejecuta en paralelo quedan bajo el span de su MCP.
+
+Al terminar se puede exportar la traza en el formato de Chrome
+(``chrome://tracing`` o https://ui.perfetto.dev) y mostrar un resumen en texto.
+Cada span terminado se escribe también en el log configurado con LOG_LEVEL y
+LOG_FILE_PATH.
+"""
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger('mcp.trace')
+
+# Pista de los spans que no pertenecen a ningún MCP
+MAIN_TRACK = 'setup'
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+@dataclass
+class Span:
+    """Fase medida, con sus atributos y el span que la contiene."""
+    name: str
+    category: str
+    track: str
+    start: float
+    end: Optional[float] = None
+    parent: Optional['Span'] = None
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    @property
+    def path(self) -> Tuple[str, ...]:
+        """Nombres desde el span raíz hasta este."""
+        names = []
+        span: Optional[Span] = self
+        while span is not None:
+            names.append(span.name)
+            span = span.parent
+        return tuple(reversed(names))
+
+
+_current: ContextVar[Optional[Span]] = ContextVar('mcp_trace_span', default=None)
+
+
+class Tracer:
+    """Registra los spans de una ejecución."""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans: List[Span] = []
+
+    @contextmanager
+    def span(self, name: str, category: str = 'phase', track: Optional[str] = None,
+             **attrs: Any) -> Iterator[Span]:
+        """Mide el bloque como un span hijo del span actual.
+
+        Las tareas de asyncio creadas dentro del bloque heredan el span como padre.
+        """
+        parent = _current.get()
+        span = Span(name, category, track or (parent.track if parent else MAIN_TRACK),
+                    time.perf_counter(), parent=parent, attrs=dict(attrs))
+        token = _current.set(span)
+        logger.debug("inicio %s/%s", span.track, name)
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs.setdefault('error', type(e).__name__)
+            raise
+        finally:
+            span.end = time.perf_counter()
+            _current.reset(token)
+            self.spans.append(span)
+            self._log(span)
+
+    def _log(self, span: Span):
+        details = " ".join(f"{key}={value}" for key, value in span.attrs.items())
+        failed = span.attrs.get('status') == 'failed' or 'error' in span.attrs or span.attrs.get('exit_code', 0) != 0
+        logger.log(logging.WARNING if failed else logging.INFO, "%s/%s %.2fs %s",
+                   span.track, "/".join(span.path[1:]) or span.name, span.duration, details)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Traza en formato Chrome (eventos completos ``X``, una pista por MCP)."""
+        pid = os.getpid()
+        tracks: Dict[str, int] = {}
+        events: List[Dict[str, Any]] = []
+        for span in sorted(self.spans, key=lambda s: s.start):
+            if span.track not in tracks:
+                tracks[span.track] = len(tracks) + 1
+                events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tracks[span.track],
+                               "args": {"name": span.track}})
+            events.append({
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": round((span.start - self.origin) * 1e6),
+                "dur": round(span.duration * 1e6),
+                "pid": pid,
+                "tid": tracks[span.track],
+                "args": span.attrs,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, path: str):
+        """Guarda la traza en formato Chrome."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_chrome_trace(), f, default=str)
+        os.replace(tmp_path, path)
+
+    def format_summary(self, width: int = 30) -> str:
+        """Resumen en forma de árbol (tipo flame graph) y tiempo acumulado por fase.
+
+        Las etapas de distintos MCPs se solapan, por eso la suma de los hijos
+        puede superar la duración del padre.
+        """
+        if not self.spans:
+            return ""
+        totals: Dict[Tuple[str, ...], List[Any]] = {}
+        first_start: Dict[Tuple[str, ...], float] = {}
+        for span in self.spans:
+            first_start[span.path] = min(first_start.get(span.path, span.start), span.start)
+            entry = totals.setdefault(span.path, [0.0, 0, False])
+            entry[0] += span.duration
+            entry[1] += 1
+            entry[2] = entry[2] or span.attrs.get('status') == 'failed' or span.attrs.get('exit_code', 0) != 0
+        wall = max(duration for path, (duration, _, _) in totals.items() if len(path) == 1) or 1e-9
+
+        lines = ["=== Resumen de tiempos ==="]
+        label_width = max(2 * (len(path) - 1) + len(path[-1]) for path in totals) + 2
+        # Cada nivel en el orden en que empezó, como en la traza
+        order = lambda path: tuple(first_start[path[:depth + 1]] for depth in range(len(path)))
+        for path in sorted(totals, key=order):
+            duration, count, failed = totals[path]
+            label = "  " * (len(path) - 1) + path[-1]
+            bar = "█" * max(1, round(min(duration / wall, 1) * width)) if duration >= 0.05 else ""
+            notes = (f" x{count}" if count > 1 else "") + (" (falló)" if failed else "")
+            lines.append(f"{label:<{label_width}}{duration:7.1f}s {bar:<{width}}{notes}".rstrip())
+
+        phases: Dict[str, float] = {}
+        for span in self.spans:
+            if span.category == 'stage':
+                phases[span.name] = phases.get(span.name, 0.0) + span.duration
+        if phases:
+            busy = sum(phases.values()) or 1e-9
+            lines.append("--- Tiempo acumulado por fase (todos los MCPs) ---")
+            for phase, duration in sorted(phases.items(), key=lambda item: -item[1]):
+                lines.append(f"  {phase:<14}{duration:7.1f}s {duration / busy:5.0%}")
+        lines.append("================================")
+        return "\n".join(lines)
+
+
+_default_tracer = Tracer()
+# Traza activa del contexto: cada tarea que llama a start_trace (por ejemplo,
+# cada perfil del modo por lotes) registra sus spans en su propia traza
+_tracer: ContextVar[Tracer] = ContextVar('mcp_tracer', default=_default_tracer)
+
+
+def get_tracer() -> Tracer:
+    return _tracer.get()
+
+
+def start_trace() -> Tracer:
+    """Empieza una traza nueva y la deja como traza activa del contexto actual."""
+    tracer = Tracer()
+    _tracer.set(tracer)
+    _current.set(None)
+    return tracer
+
+
+def span(name: str, category: str = 'phase', track: Optional[str] = None, **attrs: Any):
+    """Span en la traza activa; ver ``Tracer.span``."""
+    return _tracer.get().span(name, category, track, **attrs)
+
+
+def annotate(**attrs: Any):
+    """Añade atributos al span actual, si hay uno."""
+    current = _current.get()
+    if current is not None:
+        current.attrs.update(attrs)
+
+
+def add_counters(**counters: float):
+    """Suma contadores (bytes, número de comandos...) a los del span actual."""
+    current = _current.get()
+    if current is not None:
+        for key, value in counters.items():
+            current.attrs[key] = current.attrs.get(key, 0) + value
+
+
+def record_command(returncode: int, stdout_bytes: int, stderr_bytes: int):
+    """Registra en el span actual un comando externo; el código de salida es el del último comando."""
+    add_counters(commands=1, stdout_bytes=stdout_bytes, stderr_bytes=stderr_bytes)
+    annotate(exit_code=returncode)
+
+
+def record_write(path: str):
+    """Suma al span actual el tamaño de un archivo recién escrito."""
+    try:
+        add_counters(bytes_written=os.path.getsize(path))
+    except OSError:
+        pass
+
+
+def configure_logging(level: str = 'INFO', file_path: Optional[str] = None):
+    """Configura el log de ``mcp`` con LOG_LEVEL y LOG_FILE_PATH.
+
+    La salida por consola sigue siendo la de ``print``; el log solo se escribe
+    en el archivo, y sin archivo no se escribe nada.
+    """
+    root = logging.getLogger('mcp')
+    root.setLevel(getattr(logging, (level or 'INFO').upper(), logging.INFO))
+    root.propagate = False
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    if not file_path:
+        root.addHandler(logging.NullHandler())
+        return
+    try:
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handler = logging.FileHandler(file_path, encoding='utf-8')
+    except OSError as e:
+        print(f"No se pudo abrir el archivo de log {file_path}: {str(e)}")
+        root.addHandler(logging.NullHandler())
+        return
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root.addHandler(handler)
@@ -0,0 +1,3 @@
+"""
+Pasarela MCP que agrupa todos los servidores detrás de un único proceso.
+"""
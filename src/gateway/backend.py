@@ -0,0 +1,132 @@
+"""
+Servidores MCP detrás de la pasarela.
+
+Cada ``Backend`` se lanza la primera vez que se necesita y se reutiliza en las
+peticiones siguientes; si el proceso termina, se vuelve a lanzar en la próxima
+petición. Con ``idle_ttl`` el servidor se cierra tras ese tiempo sin uso y
+vuelve a lanzarse con la siguiente llamada; sin él, el supervisor de la
+pasarela (``supervisor.py``) puede lanzarlo al arrancar y vigilarlo. ``cache`` indica qué herramientas
+se sirven desde la caché de respuestas de la pasarela (ver ``cache.py``) y
+``coalesce`` cuáles agrupan las llamadas idénticas (ver ``single_flight.py``).
+"""
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+from ..core.mcp_client import MCPStdioClient
+from ..core.process_metrics import get_tree_rss
+
+# Claves de la configuración de un servidor que solo interpreta la pasarela
+GATEWAY_KEYS = ('idle_ttl', 'cache', 'coalesce')
+
+
+class Backend:
+    """Servidor MCP lanzado bajo demanda."""
+
+    def __init__(self, name: str, config: Dict[str, Any], startup_timeout: float = 30,
+                 request_timeout: Optional[float] = 120):
+        self.name = name
+        self.config = {key: value for key, value in config.items() if key not in GATEWAY_KEYS}
+        self.idle_ttl: Optional[float] = config.get('idle_ttl') or None
+        self.cache_policy: Dict[str, Any] = config.get('cache') or {}
+        self.coalesce_policy: Any = config.get('coalesce') or []
+        self.startup_timeout = startup_timeout
+        self.request_timeout = request_timeout
+        self.client: Optional[MCPStdioClient] = None
+        self.starts = 0
+        self.calls = 0
+        self.last_used: Optional[float] = None
+        self.in_flight = 0
+        self.evictions = 0
+        self.memory_released = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self.client is not None and self.client.alive
+
+    async def ensure_started(self) -> MCPStdioClient:
+        """Lanza el servidor si no está en marcha y retorna su cliente ya inicializado."""
+        async with self._lock:
+            if self.running:
+                return self.client
+            if self.client is not None:
+                await self.client.close(grace=0.5)
+
+            client = MCPStdioClient(self.config['command'], self.config.get('args', []),
+                                    cwd=self.config.get('cwd'), env=self.config.get('env'), name=self.name)
+            try:
+                await client.start()
+                await client.initialize(timeout=self.startup_timeout)
+            except Exception as e:
+                tail = client.stderr_tail
+                await client.close(grace=0.5)
+                if isinstance(e, asyncio.TimeoutError):
+                    e = f"no respondió en {self.startup_timeout:.0f}s"
+                raise ConnectionError(f"No se pudo iniciar {self.name}: {e}" + (f"\n{tail}" if tail else ""))
+
+            self.client = client
+            self.starts += 1
+            return client
+
+    async def request(self, method: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Envía una petición al servidor, lanzándolo si hace falta."""
+        # Contar la petición antes de lanzar el servidor para que no se desaloje entretanto
+        self.in_flight += 1
+        try:
+            client = await self.ensure_started()
+            self.calls += 1
+            self.last_used = time.monotonic()
+            return await client.request(method, params, timeout=self.request_timeout)
+        finally:
+            self.in_flight -= 1
+            self.last_used = time.monotonic()
+
+    def idle_for(self) -> float:
+        """Segundos desde la última petición."""
+        if self.last_used is None:
+            return 0.0
+        return time.monotonic() - self.last_used
+
+    async def evict_if_idle(self) -> Optional[int]:
+        """Cierra el servidor si lleva ``idle_ttl`` segundos sin peticiones.
+
+        Returns:
+            Bytes de memoria residente liberados (0 si no se pudo medir), o
+            None si el servidor no se cerró.
+        """
+        if not self.idle_ttl or self.in_flight or not self.running or self.idle_for() < self.idle_ttl:
+            return None
+        async with self._lock:
+            if self.in_flight or not self.running:
+                return None
+            rss = await asyncio.to_thread(get_tree_rss, self.client.pid) or 0
+            await self.client.close()
+            self.client = None
+            self.evictions += 1
+            self.memory_released += rss
+            return rss
+
+    async def close_client(self, client: MCPStdioClient):
+        """Cierra ``client`` si sigue siendo el del servidor; si ya se relanzó, no hace nada."""
+        async with self._lock:
+            if self.client is client:
+                await self.client.close(grace=0.5)
+                self.client = None
+
+    async def list_tools(self) -> List[Dict[str, Any]]:
+        """Retorna todas las herramientas del servidor, recorriendo la paginación."""
+        tools: List[Dict[str, Any]] = []
+        cursor = None
+        while True:
+            result = await self.request("tools/list", {"cursor": cursor} if cursor else None)
+            tools.extend(result.get('tools', []))
+            cursor = result.get('nextCursor')
+            if not cursor:
+                return tools
+
+    async def close(self):
+        async with self._lock:
+            if self.client is not None:
+                await self.client.close()
+                self.client = None
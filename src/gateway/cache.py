@@ -0,0 +1,183 @@
+"""
+Caché de respuestas de herramientas idempotentes.
+
+La pasarela guarda el resultado de las llamadas a las herramientas que la
+configuración de su servidor declara en ``cache`` (nombre de la herramienta y
+segundos de validez; ``*`` se aplica a todas)::
+
+    "brave-search": {"command": "npx", "args": [...],
+                     "cache": {"brave_web_search": 3600, "brave_local_search": 3600}}
+
+La clave de cada respuesta es el hash del servidor, su configuración, la
+herramienta y los argumentos. Las respuestas recientes se sirven desde un LRU
+en memoria y todas se guardan en SQLite, de modo que sobreviven a los reinicios
+de Claude Desktop. Solo se guardan las respuestas sin ``isError``.
+
+Una llamada con ``_meta: {"mcp-gateway/cache": "bypass"}`` no lee la caché
+pero sí guarda la respuesta nueva.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from ..core.provisioning_state import hash_text
+from .catalog import hash_server_config
+
+# Clave de ``_meta`` con la que una llamada pide saltarse la caché
+BYPASS_META_KEY = "mcp-gateway/cache"
+BYPASS_VALUE = "bypass"
+# Herramienta comodín de una política de caché
+ANY_TOOL = "*"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    server TEXT NOT NULL,
+    tool TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_expires ON responses (expires_at);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+
+
+def cache_ttl(policy: Optional[Dict[str, Any]], tool: str) -> float:
+    """Segundos de validez de ``tool`` según la política de su servidor (0 = no se guarda)."""
+    if not policy:
+        return 0.0
+    try:
+        return max(0.0, float(policy.get(tool, policy.get(ANY_TOOL, 0)) or 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def wants_bypass(params: Dict[str, Any]) -> bool:
+    meta = params.get('_meta')
+    return isinstance(meta, dict) and meta.get(BYPASS_META_KEY) == BYPASS_VALUE
+
+
+def response_key(server: str, config: Dict[str, Any], tool: str, arguments: Any) -> str:
+    return hash_text(json.dumps([server, hash_server_config(config), tool, arguments or {}],
+                                sort_keys=True, ensure_ascii=False))
+
+
+class ResponseCache:
+    """LRU en memoria respaldado por SQLite, con métricas por herramienta."""
+
+    def __init__(self, path: Optional[str], memory_entries: int = 256, disk_entries: int = 5000):
+        self.path = path
+        self.memory_entries = max(0, memory_entries)
+        self.disk_entries = max(0, disk_entries)
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._metrics: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        if path:
+            self._open()
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+
+    def _count(self, server: str, tool: str, metric: str):
+        counters = self._metrics.setdefault((server, tool), {
+            "hits": 0, "disk_hits": 0, "misses": 0, "bypassed": 0, "stored": 0})
+        counters[metric] += 1
+
+    def _remember(self, key: str, expires_at: float, result: Dict[str, Any]):
+        if not self.memory_entries:
+            return
+        self._memory[key] = (expires_at, result)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    # SQLite (se ejecuta en un hilo para no bloquear el bucle de eventos)
+    # ------------------------------------------------------------------
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[float, str]]:
+        with self._db_lock:
+            row = self._db.execute("SELECT expires_at, body FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[0] <= now:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            return row
+
+    def _disk_put(self, key: str, server: str, tool: str, expires_at: float, body: str):
+        now = time.time()
+        with self._db_lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                                 (key, server, tool, expires_at, now, body))
+                self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+                # Respuestas menos usadas recientemente por encima del límite
+                self._db.execute("DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+                                 "ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (self.disk_entries,))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+
+    async def get(self, key: str, server: str, tool: str) -> Optional[Dict[str, Any]]:
+        """Respuesta guardada y vigente, o None (que cuenta como fallo)."""
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._memory.move_to_end(key)
+                self._count(server, tool, "hits")
+                return entry[1]
+            del self._memory[key]
+        if self._db is not None:
+            row = await asyncio.to_thread(self._disk_get, key, now)
+            if row is not None:
+                result = json.loads(row[1])
+                self._remember(key, row[0], result)
+                self._count(server, tool, "hits")
+                self._count(server, tool, "disk_hits")
+                return result
+        self._count(server, tool, "misses")
+        return None
+
+    async def put(self, key: str, server: str, tool: str, ttl: float, result: Dict[str, Any]):
+        expires_at = time.time() + ttl
+        self._remember(key, expires_at, result)
+        self._count(server, tool, "stored")
+        if self._db is not None:
+            await asyncio.to_thread(self._disk_put, key, server, tool, expires_at,
+                                    json.dumps(result, ensure_ascii=False))
+
+    def record_bypass(self, server: str, tool: str):
+        self._count(server, tool, "bypassed")
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Métricas por ``servidor__herramienta``."""
+        return {f"{server}__{tool}": dict(counters) for (server, tool), counters in sorted(self._metrics.items())}
+
+    def close(self):
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+            self._db = None
@@ -0,0 +1,66 @@
+"""
+Catálogo persistido de las herramientas de cada servidor.
+
+Permite a la pasarela responder a ``tools/list`` sin lanzar los servidores.
+Cada entrada guarda un hash de la configuración del servidor (comando,
+argumentos y variables de entorno), de modo que al cambiar la configuración
+la entrada deja de usarse.
+"""
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from ..core.provisioning_state import hash_text
+
+CATALOG_VERSION = 1
+
+
+def hash_server_config(config: Dict[str, Any]) -> str:
+    return hash_text(json.dumps(config, sort_keys=True))
+
+
+class ToolCatalog:
+    """Herramientas conocidas de cada servidor, guardadas en un archivo JSON."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.data: Dict[str, Any] = {"version": CATALOG_VERSION, "servers": {}}
+        self.load()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == CATALOG_VERSION:
+                self.data = data
+        except Exception:
+            pass
+
+    def save(self):
+        """Escribe el catálogo de forma atómica."""
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp-{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def get(self, name: str, config: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """Herramientas de ``name`` si el catálogo corresponde a su configuración actual."""
+        entry = self.data["servers"].get(name)
+        if entry and entry.get("config_hash") == hash_server_config(config):
+            return entry.get("tools")
+        return None
+
+    def put(self, name: str, config: Dict[str, Any], tools: List[Dict[str, Any]]):
+        self.data["servers"][name] = {
+            "config_hash": hash_server_config(config),
+            "tools": tools,
+            "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
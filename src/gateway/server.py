@@ -0,0 +1,418 @@
+"""
+Pasarela MCP sobre stdio.
+
+Claude Desktop lanza un único proceso (``gateway.py``) que habla MCP por stdin
+y stdout. La pasarela publica las herramientas de todos los servidores con el
+nombre del servidor como prefijo (``trello__get_cards``) y reenvía cada
+``tools/call`` al servidor correspondiente, que se lanza solo la primera vez
+que se usa. La lista de herramientas se sirve desde un catálogo en disco, de
+modo que los servidores que no se usan nunca llegan a arrancar. Los
+servidores con ``idle_ttl`` (los temporales de npx/uvx) se cierran tras ese
+tiempo sin uso, y las herramientas con política de ``cache`` se responden
+desde la caché de respuestas mientras el resultado siga vigente. Las llamadas
+idénticas a herramientas incluidas en ``coalesce`` que coinciden en el tiempo
+comparten una sola ejecución. Con ``--keep-warm`` los servidores persistentes
+se lanzan al arrancar y el supervisor los mantiene en marcha (``supervisor.py``).
+
+Todo lo que no es protocolo se escribe en stderr.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from typing import Any, Dict, List, Optional
+
+from ..core.mcp_client import PROTOCOL_VERSION, MCPError
+from ..core.process_metrics import format_bytes
+from .backend import Backend
+from .cache import BYPASS_META_KEY, ResponseCache, cache_ttl, response_key, wants_bypass
+from .catalog import ToolCatalog
+from .single_flight import SingleFlight, can_coalesce
+from .supervisor import Supervisor
+
+# Separador entre el nombre del servidor y el de la herramienta
+TOOL_SEPARATOR = "__"
+SERVER_INFO = {"name": "mcp-gateway", "version": "1.0.0"}
+# Intervalo máximo entre revisiones de servidores inactivos
+MAX_REAP_INTERVAL = 30
+
+# Códigos de error JSON-RPC
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+
+def log(message: str):
+    print(f"[mcp-gateway] {message}", file=sys.stderr, flush=True)
+
+
+class GatewayError(Exception):
+    """Error que se devuelve al cliente como respuesta JSON-RPC."""
+
+    def __init__(self, code: int, message: str, data: Any = None):
+        super().__init__(message)
+        self.code = code
+        self.data = data
+
+
+class StdioGateway:
+    """Servidor MCP que enruta las herramientas a varios servidores MCP.
+
+    ``keep_warm`` son las opciones del ``Supervisor`` que mantiene en marcha
+    los servidores sin ``idle_ttl``; con None solo se lanzan al usarlos.
+    """
+
+    def __init__(self, servers: Dict[str, Dict[str, Any]], catalog_path: Optional[str] = None,
+                 startup_timeout: float = 30, request_timeout: Optional[float] = 120,
+                 cache: Optional[ResponseCache] = None, keep_warm: Optional[Dict[str, Any]] = None):
+        self.backends = {
+            name: Backend(name, config, startup_timeout=startup_timeout, request_timeout=request_timeout)
+            for name, config in servers.items() if config.get('command')
+        }
+        self.catalog = ToolCatalog(catalog_path)
+        self.cache = cache
+        self.single_flight = SingleFlight()
+        self.keep_warm = keep_warm
+        self.supervisor: Optional[Supervisor] = None
+        self._tasks: set = set()
+
+    # ------------------------------------------------------------------
+    # Herramientas
+    # ------------------------------------------------------------------
+
+    async def _backend_tools(self, backend: Backend) -> List[Dict[str, Any]]:
+        """Herramientas de un servidor, desde el catálogo o lanzándolo si no está catalogado."""
+        tools = self.catalog.get(backend.name, backend.config)
+        if tools is not None:
+            return tools
+        tools = await backend.list_tools()
+        self.catalog.put(backend.name, backend.config, tools)
+        try:
+            self.catalog.save()
+        except Exception as e:
+            log(f"No se pudo guardar el catálogo: {str(e)}")
+        return tools
+
+    async def list_tools(self) -> List[Dict[str, Any]]:
+        """Herramientas de todos los servidores, con el nombre del servidor como prefijo."""
+        backends = list(self.backends.values())
+        results = await asyncio.gather(*(self._backend_tools(b) for b in backends), return_exceptions=True)
+        tools = []
+        for backend, result in zip(backends, results):
+            if isinstance(result, BaseException):
+                log(f"{backend.name}: {str(result)}")
+                continue
+            for tool in result:
+                tools.append(dict(tool, name=f"{backend.name}{TOOL_SEPARATOR}{tool['name']}"))
+        return tools
+
+    def resolve_tool(self, name: str):
+        """Separa ``servidor__herramienta`` y retorna el backend y el nombre original."""
+        server, separator, tool = (name or "").partition(TOOL_SEPARATOR)
+        backend = self.backends.get(server)
+        if not separator or backend is None or not tool:
+            raise GatewayError(INVALID_PARAMS, f"Herramienta desconocida: {name}")
+        return backend, tool
+
+    async def call_tool(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        backend, tool = self.resolve_tool(params.get('name'))
+        forwarded = dict(params, name=tool)
+        ttl = cache_ttl(backend.cache_policy, tool) if self.cache is not None else 0
+        # Las herramientas con caché son idempotentes, por lo que también se agrupan
+        coalesce = bool(ttl) or can_coalesce(backend.coalesce_policy, tool)
+        if not ttl and not coalesce:
+            return await backend.request("tools/call", forwarded)
+
+        key = response_key(backend.name, backend.config, tool, params.get('arguments'))
+        if wants_bypass(params):
+            meta = {k: v for k, v in params['_meta'].items() if k != BYPASS_META_KEY}
+            if meta:
+                forwarded['_meta'] = meta
+            else:
+                del forwarded['_meta']
+            if ttl:
+                self.cache.record_bypass(backend.name, tool)
+        elif ttl:
+            cached = await self.cache.get(key, backend.name, tool)
+            if cached is not None:
+                return cached
+
+        if coalesce:
+            # Las llamadas idénticas que lleguen mientras tanto esperan a esta ejecución
+            return await self.single_flight.run(key, backend.name, tool,
+                                                lambda: self._execute(backend, tool, forwarded, key, ttl))
+        return await self._execute(backend, tool, forwarded, key, ttl)
+
+    async def _execute(self, backend: Backend, tool: str, params: Dict[str, Any], key: str,
+                       ttl: float) -> Dict[str, Any]:
+        """Envía la llamada al servidor y guarda la respuesta en caché si su política lo indica."""
+        result = await backend.request("tools/call", params)
+        if ttl and not result.get('isError'):
+            try:
+                await self.cache.put(key, backend.name, tool, ttl, result)
+            except Exception as e:
+                log(f"No se pudo guardar en caché la respuesta de {backend.name}{TOOL_SEPARATOR}{tool}: {str(e)}")
+        return result
+
+    # ------------------------------------------------------------------
+    # Protocolo
+    # ------------------------------------------------------------------
+
+    async def handle(self, method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Resuelve una petición del cliente y retorna el campo ``result``."""
+        if method == "initialize":
+            return {
+                "protocolVersion": params.get("protocolVersion", PROTOCOL_VERSION),
+                "capabilities": {"tools": {"listChanged": False}},
+                "serverInfo": SERVER_INFO,
+            }
+        if method == "ping":
+            return {}
+        if method == "tools/list":
+            return {"tools": await self.list_tools()}
+        if method == "tools/call":
+            return await self.call_tool(params)
+        if method == "resources/list":
+            return {"resources": []}
+        if method == "prompts/list":
+            return {"prompts": []}
+        raise GatewayError(METHOD_NOT_FOUND, f"Método no soportado: {method}")
+
+    def _write(self, message: Dict[str, Any]):
+        sys.stdout.buffer.write((json.dumps(message) + "\n").encode())
+        sys.stdout.buffer.flush()
+
+    async def _respond(self, message: Dict[str, Any]):
+        request_id = message['id']
+        try:
+            result = await self.handle(message.get('method', ''), message.get('params') or {})
+            self._write({"jsonrpc": "2.0", "id": request_id, "result": result})
+        except GatewayError as e:
+            error = {"code": e.code, "message": str(e)}
+            if e.data is not None:
+                error["data"] = e.data
+            self._write({"jsonrpc": "2.0", "id": request_id, "error": error})
+        except MCPError as e:
+            error = {"code": e.code or INTERNAL_ERROR, "message": str(e)}
+            if e.data is not None:
+                error["data"] = e.data
+            self._write({"jsonrpc": "2.0", "id": request_id, "error": error})
+        except asyncio.TimeoutError:
+            self._write({"jsonrpc": "2.0", "id": request_id,
+                         "error": {"code": INTERNAL_ERROR, "message": "Tiempo de espera agotado"}})
+        except Exception as e:
+            log(f"Error en {message.get('method')}: {str(e)}")
+            self._write({"jsonrpc": "2.0", "id": request_id,
+                         "error": {"code": INTERNAL_ERROR, "message": str(e)}})
+
+    def dispatch(self, line: bytes):
+        """Procesa una línea de stdin; cada petición se atiende en su propia tarea."""
+        try:
+            message = json.loads(line)
+        except ValueError:
+            log("Mensaje no válido ignorado")
+            return
+        if not isinstance(message, dict) or 'id' not in message or 'method' not in message:
+            # Notificaciones (notifications/initialized, cancelaciones...) y respuestas
+            return
+        task = asyncio.create_task(self._respond(message))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def reap_idle(self):
+        """Cierra los servidores que superaron su tiempo de inactividad."""
+        for backend in self.backends.values():
+            try:
+                released = await backend.evict_if_idle()
+            except Exception as e:
+                log(f"{backend.name}: error al cerrar por inactividad: {str(e)}")
+                continue
+            if released is not None:
+                log(f"{backend.name} cerrado tras {backend.idle_ttl:.0f}s sin uso "
+                    f"(libera {format_bytes(released)}; total liberado {format_bytes(self.memory_released)})")
+
+    async def _reap_loop(self):
+        ttls = [backend.idle_ttl for backend in self.backends.values() if backend.idle_ttl]
+        if not ttls:
+            return
+        interval = max(1.0, min(MAX_REAP_INTERVAL, min(ttls) / 4))
+        while True:
+            await asyncio.sleep(interval)
+            await self.reap_idle()
+
+    @property
+    def memory_released(self) -> int:
+        """Memoria residente liberada en total al cerrar servidores inactivos."""
+        return sum(backend.memory_released for backend in self.backends.values())
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: {
+                "running": backend.running,
+                "starts": backend.starts,
+                "calls": backend.calls,
+                "evictions": backend.evictions,
+                "memory_released": backend.memory_released,
+            }
+            for name, backend in self.backends.items()
+        }
+
+    async def serve(self):
+        """Atiende al cliente hasta que cierre stdin."""
+        loop = asyncio.get_running_loop()
+        log(f"Pasarela lista con {len(self.backends)} servidores")
+        reaper = asyncio.create_task(self._reap_loop())
+        self.start_supervisor()
+        try:
+            while True:
+                # Leer en un hilo funciona igual en Windows y en POSIX
+                line = await loop.run_in_executor(None, sys.stdin.buffer.readline)
+                if not line:
+                    break
+                if line.strip():
+                    self.dispatch(line)
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+        finally:
+            reaper.cancel()
+            if self.supervisor is not None:
+                await self.supervisor.stop()
+            await self.close()
+            for name, stats in self.stats().items():
+                if stats["starts"]:
+                    log(f"{name}: {stats['starts']} inicios, {stats['calls']} llamadas, "
+                        f"{stats['evictions']} cierres por inactividad")
+            if self.memory_released:
+                log(f"Memoria liberada por cierres de inactividad: {format_bytes(self.memory_released)}")
+            for name, counters in self.single_flight.stats().items():
+                if counters['shared']:
+                    log(f"{name}: {counters['shared']} llamadas agrupadas en {counters['executions']} ejecuciones")
+            if self.cache is not None:
+                for name, counters in self.cache.stats().items():
+                    log(f"caché {name}: {counters['hits']} aciertos ({counters['disk_hits']} desde disco), "
+                        f"{counters['misses']} fallos, {counters['bypassed']} omitidas")
+                self.cache.close()
+
+    def start_supervisor(self):
+        """Lanza y vigila los servidores persistentes si la pasarela los mantiene en caliente."""
+        if self.keep_warm is None:
+            return
+        persistent = {name: backend for name, backend in self.backends.items() if not backend.idle_ttl}
+        if not persistent:
+            return
+        self.supervisor = Supervisor(persistent, log=log, **self.keep_warm)
+        self.supervisor.start()
+        log(f"Manteniendo en caliente: {', '.join(persistent)}")
+
+    async def close(self):
+        await asyncio.gather(*(backend.close() for backend in self.backends.values()), return_exceptions=True)
+
+
+async def warm_catalog(servers: Dict[str, Dict[str, Any]], catalog_path: str,
+                       startup_timeout: float = 30, max_parallel: int = 4) -> Dict[str, bool]:
+    """Lanza cada servidor una vez para guardar sus herramientas en el catálogo.
+
+    Se ejecuta al generar la configuración, de modo que la pasarela pueda
+    responder a ``tools/list`` sin lanzar ningún servidor.
+    """
+    gateway = StdioGateway(servers, catalog_path, startup_timeout=startup_timeout)
+    semaphore = asyncio.Semaphore(max(1, max_parallel))
+
+    async def warm(backend: Backend) -> bool:
+        async with semaphore:
+            try:
+                tools = await backend.list_tools()
+            except Exception as e:
+                print(f"[{backend.name}] No se pudieron obtener las herramientas: {str(e)}")
+                return False
+            finally:
+                await backend.close()
+            gateway.catalog.put(backend.name, backend.config, tools)
+            print(f"[{backend.name}] {len(tools)} herramientas catalogadas")
+            return True
+
+    names = list(gateway.backends)
+    results = await asyncio.gather(*(warm(gateway.backends[name]) for name in names))
+    gateway.catalog.save()
+    return dict(zip(names, results))
+
+
+def load_servers(path: str) -> Dict[str, Dict[str, Any]]:
+    """Servidores del archivo de la pasarela (formato ``mcpServers``)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        servers = json.load(f)
+    return servers.get('mcpServers', servers)
+
+
+async def prepare_catalog(servers_path: str, catalog_path: str, startup_timeout: float = 30,
+                          max_parallel: int = 4) -> bool:
+    """Cataloga las herramientas de los servidores que setup.py guardó en ``servers_path``.
+
+    Cada servidor se lanza una sola vez aquí; después la pasarela responde
+    a la lista de herramientas desde el catálogo y solo lanza los
+    servidores cuyas herramientas se usan.
+    """
+    try:
+        servers = load_servers(servers_path)
+    except Exception as e:
+        print(f"Error leyendo los servidores de la pasarela ({servers_path}): {str(e)}")
+        return False
+
+    print("\nCatalogando las herramientas de los servidores para la pasarela...")
+    results = await warm_catalog(servers, catalog_path, startup_timeout, max_parallel)
+    failed = [name for name, ok in results.items() if not ok]
+    if failed:
+        print(f"Se catalogarán al primer uso: {', '.join(failed)}")
+    return True
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Pasarela MCP que agrupa varios servidores en un único proceso.")
+    parser.add_argument('--servers', required=True, help="Archivo JSON con los servidores (formato mcpServers)")
+    parser.add_argument('--catalog', help="Catálogo de herramientas de los servidores")
+    parser.add_argument('--startup-timeout', type=float, default=30)
+    parser.add_argument('--cache', metavar='RUTA', help="Base de datos SQLite de la caché de respuestas")
+    parser.add_argument('--cache-memory', type=int, default=256, metavar='N',
+                        help="Respuestas que se mantienen en memoria")
+    parser.add_argument('--cache-disk', type=int, default=5000, metavar='N',
+                        help="Respuestas que se mantienen en disco")
+    parser.add_argument('--no-cache', action='store_true', help="Desactiva la caché de respuestas")
+    parser.add_argument('--keep-warm', action='store_true',
+                        help="Lanza al arrancar los servidores sin idle_ttl y los reinicia si fallan")
+    parser.add_argument('--ping-interval', type=float, default=15, help="Segundos entre pings")
+    parser.add_argument('--ping-timeout', type=float, default=5, help="Espera máxima de cada ping")
+    parser.add_argument('--failure-threshold', type=int, default=3, help="Pings fallidos antes de reiniciar")
+    parser.add_argument('--max-backoff', type=float, default=60, help="Espera máxima entre reinicios")
+    parser.add_argument('--status', metavar='RUTA', help="Archivo de estado de los servidores en caliente")
+    parser.add_argument('--status-interval', type=float, default=60,
+                        help="Cada cuántos segundos se registra y guarda el estado")
+    args = parser.parse_args(argv)
+
+    servers = load_servers(args.servers)
+
+    cache = None
+    if not args.no_cache:
+        try:
+            cache = ResponseCache(args.cache, args.cache_memory, args.cache_disk)
+        except Exception as e:
+            log(f"Caché de respuestas solo en memoria: no se pudo abrir {args.cache}: {str(e)}")
+            cache = ResponseCache(None, args.cache_memory, args.cache_disk)
+
+    keep_warm = None
+    if args.keep_warm:
+        keep_warm = {
+            "ping_interval": args.ping_interval,
+            "ping_timeout": args.ping_timeout,
+            "failure_threshold": args.failure_threshold,
+            "backoff_max": args.max_backoff,
+            "status_path": args.status,
+            "status_interval": args.status_interval,
+        }
+
+    gateway = StdioGateway(servers, args.catalog, startup_timeout=args.startup_timeout, cache=cache,
+                           keep_warm=keep_warm)
+    try:
+        asyncio.run(gateway.serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
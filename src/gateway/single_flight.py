@@ -0,0 +1,70 @@
+"""
+Agrupación de llamadas idénticas en curso (single-flight).
+
+Cuando un agente lanza varias veces la misma llamada (mismo servidor,
+herramienta y argumentos) antes de que llegue la primera respuesta, solo la
+primera llega al servidor; las demás esperan a esa ejecución y reciben el
+mismo resultado o el mismo error.
+
+Las herramientas que se pueden agrupar se declaran por servidor en
+``coalesce``: una lista de nombres, o ``"*"`` para todas. Solo deben
+incluirse herramientas de lectura: dos ``create_event`` idénticos seguidos
+pueden ser intencionados. Las herramientas con política de ``cache`` se
+agrupan siempre.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+ANY_TOOL = "*"
+
+
+def can_coalesce(policy: Any, tool: str) -> bool:
+    """Indica si la política ``coalesce`` de un servidor incluye ``tool``."""
+    if policy == ANY_TOOL or policy is True:
+        return True
+    if isinstance(policy, (list, tuple)):
+        return tool in policy or ANY_TOOL in policy
+    return False
+
+
+class SingleFlight:
+    """Comparte una única ejecución entre las llamadas concurrentes con la misma clave."""
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._metrics: Dict[Tuple[str, str], Dict[str, int]] = {}
+
+    def _count(self, server: str, tool: str, metric: str):
+        counters = self._metrics.setdefault((server, tool), {"executions": 0, "shared": 0})
+        counters[metric] += 1
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Evitar el aviso de excepción no recuperada si todos los que esperaban se cancelaron
+        if not task.cancelled():
+            task.exception()
+
+    async def run(self, key: str, server: str, tool: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Ejecuta ``call`` o se une a la ejecución en curso con la misma clave.
+
+        La ejecución compartida no se cancela si se cancela quien la inició
+        mientras otras llamadas la esperan.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self._count(server, tool, "executions")
+        else:
+            self._count(server, tool, "shared")
+        return await asyncio.shield(task)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Ejecuciones y llamadas agrupadas por ``servidor__herramienta``."""
+        return {f"{server}__{tool}": dict(counters) for (server, tool), counters in sorted(self._metrics.items())}
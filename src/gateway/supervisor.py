@@ -0,0 +1,259 @@
+"""
+Supervisor que mantiene en caliente los servidores de la pasarela.
+
+Con ``--keep-warm`` la pasarela lanza al arrancar los servidores persistentes
+(los que no tienen ``idle_ttl``) en lugar de esperar a la primera llamada. El
+supervisor les envía peticiones ``ping`` del protocolo MCP y, si el proceso
+termina o deja de responder, lo cierra y lo vuelve a lanzar con espera
+exponencial. Como trabaja sobre los mismos ``Backend`` que atienden las
+llamadas, son esos procesos los que se mantienen listos. Por cada servidor
+lleva el tiempo en marcha, el número de reinicios y la latencia de los pings,
+que se escriben periódicamente en el log de la pasarela y en un archivo de
+estado.
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Optional
+
+from ..core.mcp_client import MCPError, MCPStdioClient
+from .backend import Backend
+
+# Estados de un servidor supervisado
+STARTING = 'iniciando'
+RUNNING = 'activo'
+BACKOFF = 'en espera'
+STOPPED = 'detenido'
+
+
+def _log(message: str):
+    # stdout es el canal del protocolo MCP de la pasarela
+    print(message, file=sys.stderr, flush=True)
+
+
+@dataclass
+class ServerStats:
+    """Métricas de un servidor supervisado."""
+    name: str
+    state: str = STOPPED
+    pid: Optional[int] = None
+    started_at: Optional[float] = None
+    restarts: int = 0
+    startup_time: Optional[float] = None
+    last_latency: Optional[float] = None
+    last_error: str = ""
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=200))
+
+    @property
+    def uptime(self) -> float:
+        if self.state != RUNNING or self.started_at is None:
+            return 0.0
+        return time.time() - self.started_at
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "pid": self.pid,
+            "uptime": round(self.uptime, 1),
+            "restarts": self.restarts,
+            "startup_time": self.startup_time,
+            "last_latency_ms": _ms(self.last_latency),
+            "p50_latency_ms": _ms(self.latency_percentile(50)),
+            "p95_latency_ms": _ms(self.latency_percentile(95)),
+            "last_error": self.last_error,
+        }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+
+class SupervisedServer:
+    """Un servidor de la pasarela mantenido en marcha por el supervisor."""
+
+    def __init__(self, backend: Backend, ping_interval: float = 15, ping_timeout: float = 5,
+                 backoff_base: float = 1, backoff_max: float = 60, failure_threshold: int = 3,
+                 stable_after: float = 60, log: Callable[[str], None] = _log):
+        self.backend = backend
+        self.name = backend.name
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.stable_after = stable_after
+        self.log = log
+        self.stats = ServerStats(self.name)
+
+    async def run(self, stop: asyncio.Event):
+        """Mantiene el servidor en marcha hasta que se active ``stop``."""
+        attempt = 0
+        try:
+            while not stop.is_set():
+                client = await self._start()
+                if client is not None:
+                    await self._monitor(client, stop)
+                uptime = self.stats.uptime
+                self.stats.pid = None
+                if stop.is_set():
+                    break
+                if client is not None:
+                    # Si una llamada ya lanzó otro proceso, close_client no lo toca
+                    await self.backend.close_client(client)
+
+                # Si el servidor llevaba un rato estable, se vuelve a la espera mínima
+                if uptime >= self.stable_after:
+                    attempt = 0
+                delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+                attempt += 1
+                self.stats.restarts += 1
+                self.stats.state = BACKOFF
+                self.log(f"[{self.name}] Reiniciando en {delay:.0f}s (reinicio #{self.stats.restarts}): "
+                         f"{self.stats.last_error}")
+                try:
+                    await asyncio.wait_for(stop.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.stats.state = STOPPED
+            self.stats.pid = None
+
+    async def _start(self) -> Optional[MCPStdioClient]:
+        """Lanza el servidor en su ``Backend`` (o adopta el proceso que ya atiende llamadas)."""
+        self.stats.state = STARTING
+        start = time.perf_counter()
+        try:
+            client = await self.backend.ensure_started()
+        except Exception as e:
+            self.stats.last_error = str(e).splitlines()[0] if str(e) else type(e).__name__
+            return None
+        elapsed = time.perf_counter() - start
+
+        self.stats.state = RUNNING
+        self.stats.pid = client.pid
+        self.stats.started_at = time.time()
+        self.stats.startup_time = round(elapsed, 2)
+        self.log(f"[{self.name}] Servidor activo (pid {client.pid}, listo en {elapsed:.1f}s)")
+        return client
+
+    async def _monitor(self, client: MCPStdioClient, stop: asyncio.Event):
+        """Envía pings periódicos; retorna si el proceso termina, deja de responder o se detiene."""
+        failures = 0
+        stop_waiter = asyncio.ensure_future(stop.wait())
+        exited = asyncio.ensure_future(client.process.wait())
+        try:
+            while True:
+                await asyncio.wait({stop_waiter, exited}, timeout=self.ping_interval,
+                                   return_when=asyncio.FIRST_COMPLETED)
+                if stop.is_set():
+                    return
+                if exited.done():
+                    self.stats.last_error = f"el proceso terminó con código {client.process.returncode}"
+                    return
+
+                start = time.perf_counter()
+                try:
+                    await client.request("ping", timeout=self.ping_timeout)
+                except MCPError:
+                    # El servidor respondió, aunque no implemente ping
+                    pass
+                except (asyncio.TimeoutError, ConnectionError):
+                    failures += 1
+                    self.stats.last_error = f"ping sin respuesta ({failures}/{self.failure_threshold})"
+                    if failures >= self.failure_threshold:
+                        return
+                    continue
+                failures = 0
+                self.stats.last_latency = time.perf_counter() - start
+                self.stats.latencies.append(self.stats.last_latency)
+        finally:
+            for task in (stop_waiter, exited):
+                if not task.done():
+                    task.cancel()
+
+
+class Supervisor:
+    """Mantiene en caliente un conjunto de ``Backend`` de la pasarela."""
+
+    def __init__(self, backends: Dict[str, Backend], status_interval: float = 60,
+                 status_path: Optional[str] = None, log: Callable[[str], None] = _log, **options: Any):
+        self.servers = {name: SupervisedServer(backend, log=log, **options) for name, backend in backends.items()}
+        self.status_interval = status_interval
+        self.status_path = status_path
+        self.log = log
+        self._stop: Optional[asyncio.Event] = None
+        self._tasks: list = []
+        self._reporter: Optional[asyncio.Task] = None
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: server.stats.as_dict() for name, server in self.servers.items()}
+
+    def format_status(self) -> str:
+        """Tabla con el estado, tiempo en marcha, reinicios y latencia de cada servidor."""
+        lines = ["=== Estado de los servidores MCP ==="]
+        width = max((len(name) for name in self.servers), default=10)
+        for name, server in self.servers.items():
+            stats = server.stats
+            p50 = stats.latency_percentile(50)
+            latency = f"{p50 * 1000:.1f}ms" if p50 is not None else "-"
+            lines.append(
+                f"  {name:<{width}}  {stats.state:<10} pid {str(stats.pid or '-'):<7} "
+                f"en marcha {_format_duration(stats.uptime):<9} reinicios {stats.restarts:<3} ping p50 {latency}"
+            )
+        lines.append("================================")
+        return "\n".join(lines)
+
+    def write_status(self):
+        """Guarda las métricas en ``status_path`` de forma atómica."""
+        if not self.status_path:
+            return
+        try:
+            tmp_path = f"{self.status_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "servers": self.stats()},
+                          f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.status_path)
+        except Exception as e:
+            self.log(f"Error guardando el estado del supervisor: {str(e)}")
+
+    async def _report(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._stop.wait(), self.status_interval)
+                return
+            except asyncio.TimeoutError:
+                self.log(self.format_status())
+                self.write_status()
+
+    def start(self):
+        """Lanza los servidores y empieza a vigilarlos en segundo plano."""
+        self._stop = asyncio.Event()
+        self._tasks = [asyncio.create_task(server.run(self._stop)) for server in self.servers.values()]
+        self._reporter = asyncio.create_task(self._report())
+
+    async def stop(self):
+        """Deja de vigilar los servidores; cerrarlos corresponde a la pasarela."""
+        if self._stop is None:
+            return
+        self._stop.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._reporter:
+            self._reporter.cancel()
+        self.write_status()
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 class MCPInterface(ABC):
     """Interfaz base para todos los MCPs."""
@@ -9,6 +9,11 @@ async def setup(self, path: str, env_vars: Dict) -> bool:
         """Configura el MCP con las variables de entorno proporcionadas."""
         pass
     
+    @abstractmethod
+    def get_stages(self, context) -> List:
+        """Declara las etapas de configuración del MCP y sus dependencias."""
+        pass
+    
     @abstractmethod
     async def verify_server(self, path: str) -> bool:
         """Verifica que el servidor del MCP funcione correctamente."""
@@ -1,18 +1,31 @@
 import os
-import json
+import sys
 import asyncio
-from typing import Dict, List, Optional
+import time
+from typing import Dict, List, Optional, Set, Tuple, Union
+from .core.pipeline import (CPU, IO, NETWORK, SUCCESS_STATUSES, UNCHANGED, JobResult, PipelineScheduler,
+                            SetupContext, Stage, format_report)
+from .core.file_watcher import FileWatcher
+from .core.local_servers import LocalServerInstaller
+from .core.process_runner import capture_output, run_streaming
+from .core.provisioning_state import ProvisioningState, hash_env, hash_tree
+from .core import claude_config, tracing
+from .config.config_service import ConfigService
 from .mcps.trello.trello_mcp import TrelloMCP
 from .mcps.google_calendar.google_calendar_mcp import GoogleCalendarMCP
 from .mcps.gmail.gmail_mcp import GmailMCP
 from .mcps.whatsapp.whatsapp_mcp import WhatsAppMCP
 from .mcps.linkedin_extract.linkedin_extract_mcp import LinkedInMCP
+from .vcs.git_client import GitClient
+from .vcs.mirror_cache import MirrorCache
 
 # Lista de MCPs NPX con sus configuraciones específicas
 NPX_MCPS = {
     "brave-search": {
         "package": "@modelcontextprotocol/server-brave-search",
-        "env": {"BRAVE_API_KEY": ""}
+        "env": {"BRAVE_API_KEY": ""},
+        # Segundos que la pasarela reutiliza la respuesta de cada herramienta
+        "cache": {"brave_web_search": 3600, "brave_local_search": 3600}
     },
     "filesystem": {
         "package": "@modelcontextprotocol/server-filesystem",
@@ -32,102 +45,72 @@
 # Lista de MCPs UVX
 UVX_MCPS = {
     "fetch": {
-        "package": "mcp-server-fetch"
+        "package": "mcp-server-fetch",
+        "cache": {"fetch": 900}
     }
 }
 
+# Número de repositorios que se configuran a la vez si default.properties no indica otro valor
+DEFAULT_MAX_CONCURRENT_SETUPS = 3
+
 class MCPManager:
-    def __init__(self, config_path: str):
+    def __init__(self, config_path: str, max_concurrency: Optional[int] = None,
+                 offline: Optional[bool] = None, gateway_mode: Optional[bool] = None,
+                 local_servers: Optional[bool] = None, property_overrides: Optional[Dict[str, str]] = None,
+                 install_npx: Optional[bool] = None):
         self.config_path = config_path
-        self.config = self.load_config(config_path)
+        self.settings = ConfigService(os.path.dirname(config_path) or '.', os.path.basename(config_path),
+                                      property_overrides)
+        # None: se pregunta al usuario; True/False: respuesta dada de antemano (modo por lotes)
+        self.install_npx = install_npx
         self.base_path = self.config['base_path']
+        self._configure_logging()
+        self.max_concurrency = max_concurrency or self._get_max_concurrency()
+        self.update_existing = self.properties.get('GIT_UPDATE_EXISTING', 'true').lower() == 'true'
+        if offline is None:
+            offline = self.properties.get('GIT_OFFLINE', 'false').lower() == 'true'
+        self.offline = offline
+        self.mirrors = self._create_mirror_cache()
+        self.git = self._create_git_client()
+        if gateway_mode is None:
+            gateway_mode = self.properties.get('GATEWAY_MODE', 'false').lower() == 'true'
+        self.gateway_mode = gateway_mode
         self.mcp_handlers = {
-            'trello': TrelloMCP(),
-            'google-calendar': GoogleCalendarMCP(),
-            'gmail': GmailMCP(),
-            'linkedin-extract': LinkedInMCP(),
-            'whatsapp': WhatsAppMCP(),
+            'trello': TrelloMCP(self.settings),
+            'google-calendar': GoogleCalendarMCP(self.settings),
+            'gmail': GmailMCP(self.settings),
+            'linkedin-extract': LinkedInMCP(self.settings),
+            'whatsapp': WhatsAppMCP(self.settings),
         }
-        self.env_vars = self.load_env_vars()
+        if self.offline:
+            for handler in self.mcp_handlers.values():
+                handler.set_offline()
+        if local_servers is None:
+            local_servers = self.properties.get('LOCAL_SERVERS', 'false').lower() == 'true'
+        self.local_servers = self._create_local_installer() if local_servers else None
         
-    def load_config(self, config_path: str) -> Dict:
-        """Carga la configuración desde el archivo repositories.json y reemplaza las variables de entorno."""
-        try:
-            # Primero cargar default.properties
-            default_props = {}
-            with open('config/default.properties', 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    if line and not line.startswith('#'):
-                        key, value = line.split('=', 1)
-                        default_props[key.strip()] = value.strip()
-
-            # Cargar repositories.json
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-
-            # Reemplazar la ruta base con la de default.properties
-            if 'base_path' in config and 'REPOSITORIES_BASE_PATH' in default_props:
-                config['base_path'] = default_props['REPOSITORIES_BASE_PATH']
-
-            # Cargar variables de entorno desde .env
-            env_vars = {}
-            env_path = os.path.join(os.path.dirname(config_path), '.env')
-            if os.path.exists(env_path):
-                with open(env_path, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        line = line.strip()
-                        if line and not line.startswith('#'):
-                            key, value = line.split('=', 1)
-                            env_vars[key.strip()] = value.strip('"\' ')
-
-            # Reemplazar variables de entorno en los repositorios
-            for repo in config.get('repositories', []):
-                if 'env_vars' in repo:
-                    for key, value in repo['env_vars'].items():
-                        if value.startswith('%') and value.endswith('%'):
-                            env_key = value[1:-1]
-                            if env_key in env_vars:
-                                repo['env_vars'][key] = env_vars[env_key]
-
-            return config
-        except Exception as e:
-            print(f"Error cargando configuración: {str(e)}")
-            return {}
-            
-    def load_env_vars(self) -> Dict:
-        """Carga las variables de entorno desde config/.env"""
-        env_vars = {}
-        env_path = os.path.join(os.path.dirname(self.config_path), '.env')
-        if os.path.exists(env_path):
-            with open(env_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    if line and not line.startswith('#'):
-                        key, value = line.split('=', 1)
-                        env_vars[key] = value.strip('"\'')
-        return env_vars
-
-    async def run_command(self, command: str) -> bool:
-        """Ejecuta un comando en la terminal."""
+    @property
+    def properties(self) -> Dict[str, str]:
+        """Valores de default.properties."""
+        return self.settings.properties()
+
+    @property
+    def config(self) -> Dict:
+        """repositories.json con las variables de .env y default.properties ya sustituidas."""
+        return self.settings.repositories()
+
+    @property
+    def env_vars(self) -> Dict[str, str]:
+        """Variables de config/.env."""
+        return self.settings.env()
+
+    async def run_command(self, command: str, cwd: Optional[str] = None) -> bool:
+        """Ejecuta un comando en la terminal mostrando su salida en tiempo real."""
         try:
-            process = await asyncio.create_subprocess_shell(
-                command,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            stdout, stderr = await process.communicate()
-
-            if process.returncode != 0:
-                error_message = stderr.decode().strip()
-                print(f"Error ejecutando comando: {error_message}")
-                return False
-
-            output = stdout.decode().strip()
-            if output:
-                print(output)
-
-            return True
+            result = await run_streaming(command, cwd=cwd, prefix="setup")
+            if not result.ok:
+                print(f"Error ejecutando comando: código de salida {result.returncode}")
+            return result.ok
         except Exception as e:
             print(f"Error ejecutando comando: {str(e)}")
             return False
@@ -135,93 +118,297 @@ async def run_command(self, command: str) -> bool:
     async def install_npx_packages(self):
         """Instala el paquete NPX de brave-search"""
         print("\n=== Instalación de paquete NPX ===")
-        respuesta = input("\n¿Deseas instalar el paquete NPX de brave-search ahora? (s/n): ").lower()
-        if respuesta != 's':
+        install = self.install_npx
+        if install is None:
+            install = input("\n¿Deseas instalar el paquete NPX de brave-search ahora? (s/n): ").lower() == 's'
+        if not install:
             print("Omitiendo instalación de paquete NPX...")
             return
 
-        # Cambiar al directorio del usuario
+        # Instalar en el directorio del usuario
         user_dir = os.path.expanduser("~")
-        os.chdir(user_dir)
         print(f"\nInstalando en: {user_dir}")
 
         print("\nInstalando @modelcontextprotocol/server-brave-search...")
         try:
-            await self.run_command("npm i @modelcontextprotocol/server-brave-search")
+            await self.run_command("npm i @modelcontextprotocol/server-brave-search", cwd=user_dir)
             print("Paquete instalado correctamente")
         except Exception as e:
             print(f"Error instalando el paquete: {e}")
 
-    async def setup_all_mcps(self):
-        """Configura todos los MCPs listados en la configuración."""
+    def _get_max_concurrency(self) -> int:
+        """Obtiene el límite de repositorios a configurar en paralelo desde default.properties."""
+        value = self.properties.get('MAX_CONCURRENT_SETUPS', '')
+        try:
+            return max(1, int(value))
+        except ValueError:
+            return DEFAULT_MAX_CONCURRENT_SETUPS
+
+    def _get_mcp_type(self, repo_name: str) -> Optional[str]:
+        """Determina el tipo de MCP a partir del nombre del repositorio."""
+        name = repo_name.lower()
+        if 'trello' in name:
+            return 'trello'
+        elif 'google-calendar' in name:
+            return 'google-calendar'
+        elif 'gmail' in name:
+            return 'gmail'
+        elif 'linkedin-extract' in name:
+            return 'linkedin-extract'
+        elif 'whatsapp' in name:
+            return 'whatsapp'
+        return None
+
+    def _create_git_client(self) -> GitClient:
+        """Crea el cliente git con la profundidad y el filtro de clonación de default.properties.
+
+        El filtro se aplica también al clonar desde los espejos locales: las
+        actualizaciones descargan desde la URL del espejo, que git registra
+        como origen de los blobs que falten, así que funcionan sin conexión.
+        """
+        try:
+            depth = max(0, int(self.properties.get('GIT_CLONE_DEPTH', '1')))
+        except ValueError:
+            depth = 1
+        return GitClient(depth=depth, blob_filter=self.properties.get('GIT_CLONE_FILTER', 'blob:none'))
+
+    def _create_mirror_cache(self) -> Optional[MirrorCache]:
+        """Crea la caché de espejos (GIT_MIRRORS_PATH o REPOSITORIES_BASE_PATH/.mirrors) si está habilitada."""
+        if self.properties.get('GIT_MIRRORS_ENABLED', 'false').lower() != 'true':
+            return None
+        root = self.properties.get('GIT_MIRRORS_PATH') or os.path.join(self.base_path, '.mirrors')
+        return MirrorCache(root, offline=self.offline)
+
+    async def install_local_servers(self) -> bool:
+        """Instala los servidores NPX y UVX en el prefijo local con versiones fijadas."""
+        print("\n=== Instalación local de servidores temporales ===")
+        print(f"Instalando en: {self.local_servers.root}")
+        status = await self.local_servers.install(NPX_MCPS, UVX_MCPS)
+        for name, ok in status.items():
+            version = self.local_servers.lock.get(name, {}).get('version')
+            print(f"- {name}: {version if ok else 'error (se usará npx/uvx)'}")
+        return all(status.values())
+
+    def _create_local_installer(self) -> LocalServerInstaller:
+        """Instalador de los servidores temporales en LOCAL_SERVERS_PATH o REPOSITORIES_BASE_PATH/.servers."""
+        root = self.properties.get('LOCAL_SERVERS_PATH') or os.path.join(self.base_path, '.servers')
+        npm_env = next(iter(self.mcp_handlers.values())).npm_env
+        return LocalServerInstaller(root, npm_env)
+
+    def _get_number(self, key: str, default: float) -> float:
+        """Obtiene una propiedad numérica de default.properties, o ``default`` si no es válida."""
+        try:
+            return float(self.properties.get(key, default))
+        except ValueError:
+            return default
+
+    def _get_pool_sizes(self) -> Dict[str, int]:
+        """Obtiene el tamaño de cada pool de trabajadores desde default.properties."""
+        pool_sizes = {}
+        for kind, key in ((NETWORK, 'NETWORK_WORKERS'), (CPU, 'CPU_WORKERS'), (IO, 'IO_WORKERS')):
+            try:
+                pool_sizes[kind] = max(1, int(self.properties.get(key, '')))
+            except ValueError:
+                pass
+        return pool_sizes
+
+    def build_repository_job(self, repo: Dict) -> Optional[Tuple[SetupContext, List[Stage]]]:
+        """Construye el contexto y las etapas de configuración de un repositorio.
+
+        Retorna None si no se puede determinar el tipo de MCP. Las etapas del
+        handler que no tienen dependencias pasan a depender de la clonación.
+        """
+        repo_name = repo['url'].split('/')[-1].replace('.git', '')
+        mcp_type = self._get_mcp_type(repo_name)
+        if not mcp_type or mcp_type not in self.mcp_handlers:
+            print(f"No se pudo determinar el tipo de MCP para {repo_name}")
+            return None
+
+        target_path = os.path.join(self.base_path, repo_name)
+        context = SetupContext(target_path, repo.get('env_vars', {}))
+        context.data['mcp_type'] = mcp_type
+
+        def resolve_subfolder():
+            # Verificar si el repositorio tiene una subcarpeta con el mismo nombre
+            subfolder_path = os.path.join(target_path, repo_name)
+            if os.path.exists(subfolder_path):
+                print(f"Configurando en subcarpeta: {subfolder_path}")
+                context.path = subfolder_path
+
+        async def clone() -> Union[bool, str]:
+            if os.path.exists(target_path):
+                if not os.path.exists(os.path.join(target_path, '.git')):
+                    print(f"El directorio {target_path} existe pero no es un repositorio git.")
+                    print("Elimínalo manualmente y vuelve a ejecutar python setup.py")
+                    return False
+                if not self.update_existing or (self.offline and not self.mirrors):
+                    print(f"MCP {repo_name} ya está clonado en {target_path}")
+                    resolve_subfolder()
+                    return UNCHANGED
+
+                source = await self._resolve_source(repo['url'], repo_name)
+                if not source:
+                    return False
+                print(f"Actualizando MCP {repo_name} en {target_path}")
+                changed = await self.git.update(target_path, repo.get('ref'), name=repo_name,
+                                                remote=source if self.mirrors else 'origin')
+                if changed is None:
+                    print(f"Error al actualizar el repositorio {repo_name}. Saltando...")
+                    return False
+                resolve_subfolder()
+                return True if changed else UNCHANGED
+
+            source = await self._resolve_source(repo['url'], repo_name)
+            if not source:
+                return False
+            print(f"\nConfigurando MCP en: {target_path}")
+            print(f"Clonando repositorio: {repo['url']}")
+            if not await self.clone_repository(repo['url'], target_path, repo.get('ref'), source=source):
+                print(f"Error al clonar el repositorio {repo_name}. Saltando...")
+                return False
+
+            resolve_subfolder()
+            print(f"\nConfigurando MCP de {mcp_type}...")
+            return True
+
+        stages = [Stage('clone', clone, NETWORK)]
+        for stage in self.mcp_handlers[mcp_type].get_stages(context):
+            if not stage.depends_on:
+                stage.depends_on = ['clone']
+            stages.append(stage)
+        return context, stages
+
+    async def _resolve_source(self, url: str, repo_name: str) -> Optional[str]:
+        """URL desde la que se clona o actualiza: el espejo local si está habilitado, o el original."""
+        if not self.mirrors:
+            return url
+        return await self.mirrors.ensure(url, repo_name)
+
+    async def refresh_mirrors(self) -> bool:
+        """Crea o actualiza en paralelo los espejos de todos los repositorios de la configuración."""
+        if not self.mirrors:
+            print("La caché de espejos está deshabilitada (GIT_MIRRORS_ENABLED=false)")
+            return False
+        if self.offline:
+            print("No se pueden actualizar los espejos en modo sin conexión")
+            return False
+
+        repositories = {repo['url'].split('/')[-1].replace('.git', ''): repo['url']
+                        for repo in self.config.get('repositories', [])}
+        print(f"\nActualizando {len(repositories)} espejos en {self.mirrors.root}...")
+        results = await self.mirrors.refresh_all(repositories, self._get_pool_sizes().get(NETWORK, 4))
+        for name, ok in results.items():
+            print(f"- {name}: {'actualizado' if ok else 'error'}")
+        return all(results.values())
+
+    def _get_state_path(self) -> str:
+        """Ruta del manifiesto de estado (PROVISIONING_STATE_PATH o REPOSITORIES_BASE_PATH/.mcp-state.json)."""
+        return self.properties.get('PROVISIONING_STATE_PATH') or os.path.join(self.base_path, '.mcp-state.json')
+
+    async def _record_mcp_state(self, state: ProvisioningState, repo_name: str,
+                                context: SetupContext, job: JobResult):
+        """Guarda en el manifiesto el commit, los hashes y la verificación de un MCP."""
+        handler = self.mcp_handlers[context.data['mcp_type']]
+        build_hash = None
+        if handler.build_dir:
+            build_hash = await asyncio.to_thread(hash_tree, os.path.join(context.path, handler.build_dir))
+        state.update_mcp(
+            repo_name,
+            mcp_type=context.data['mcp_type'],
+            path=context.path,
+            commit=await capture_output(["git", "rev-parse", "HEAD"], cwd=context.path),
+            env_hash=hash_env(context.env_vars),
+            build_hash=build_hash,
+            verified=job.status('verify') in SUCCESS_STATUSES,
+            ok=job.ok,
+        )
+
+    async def setup_all_mcps(self, force: bool = False) -> Dict:
+        """Configura todos los MCPs listados en la configuración.
+
+        Las etapas de todos los repositorios se ejecutan en un único
+        ``PipelineScheduler``: la clonación de un repositorio se solapa con la
+        instalación o compilación de otro, con un máximo de ``max_concurrency``
+        repositorios en curso. El fallo de uno no afecta a los demás y el
+        resumen conserva el orden de repositories.json.
+
+        El resultado de cada etapa se guarda en un manifiesto de estado, de
+        modo que una nueva ejecución solo repite las etapas cuyas entradas
+        cambiaron (por ejemplo, un token rotado solo reescribe el .env y vuelve
+        a verificar). Con ``force`` se ignora el estado guardado.
+
+        Cada fase queda registrada en una traza; al terminar se muestra un
+        resumen de tiempos y la traza se guarda en formato Chrome (ver
+        ``_get_trace_path``).
+
+        Returns:
+            Dict: Resumen de la ejecución (ver ``_setup_all_mcps``).
+        """
+        tracer = tracing.start_trace()
+        try:
+            with tracing.span('setup', 'setup'):
+                return await self._setup_all_mcps(force)
+        finally:
+            self._report_trace(tracer)
+
+    async def _setup_all_mcps(self, force: bool) -> Dict:
+        """Aprovisiona los MCPs y retorna el resumen que usa el modo por lotes.
+
+        El resumen contiene la ruta base, los MCPs instalados y fallidos, el
+        estado de cada etapa por MCP y los cambios en la configuración de
+        Claude Desktop (None si no se actualizó).
+        """
         # Crear directorio base si no existe
         os.makedirs(self.base_path, exist_ok=True)
         
         # Instalar paquetes NPX
-        await self.install_npx_packages()
-        
-        # Lista para guardar los MCPs instalados
-        installed_mcps = []
-        failed_mcps = []
+        with tracing.span('npx', 'phase'):
+            if self.local_servers:
+                await self.install_local_servers()
+            else:
+                await self.install_npx_packages()
         
-        # Configurar cada MCP secuencialmente
+        state = ProvisioningState(self._get_state_path())
+        scheduler = PipelineScheduler(self._get_pool_sizes(), max_jobs=self.max_concurrency, state=state)
+        outcome: Dict[str, Optional[bool]] = {}
+        contexts: Dict[str, SetupContext] = {}
+
         for repo in self.config['repositories']:
-            try:
-                # 1. Extraer información del repositorio
-                repo_name = repo['url'].split('/')[-1].replace('.git', '')
-                target_path = os.path.join(self.base_path, repo_name)
-                
-                # 2. Verificar si ya está configurado
-                is_configured = os.path.exists(target_path)
-                
-                if is_configured:
-                    print(f"MCP {repo_name} ya está configurado. Saltando...")
-                    installed_mcps.append(repo_name)
-                    continue
-                
-                print(f"\nConfigurando MCP en: {target_path}")
-                
-                # 3. Clonar repositorio
-                print(f"Clonando repositorio: {repo['url']}")
-                if not await self.clone_repository(repo['url'], target_path):
-                    print(f"Error al clonar el repositorio {repo_name}. Saltando...")
-                    failed_mcps.append(repo_name)
-                    continue
-                
-                # 4. Verificar si el repositorio tiene una subcarpeta con el mismo nombre
-                subfolder_path = os.path.join(target_path, repo_name)
-                if os.path.exists(subfolder_path):
-                    print(f"Configurando en subcarpeta: {subfolder_path}")
-                    target_path = subfolder_path
-                
-                # 5. Determinar el tipo de MCP y configurarlo
-                mcp_type = None
-                if 'trello' in repo_name.lower():
-                    mcp_type = 'trello'
-                elif 'google-calendar' in repo_name.lower():
-                    mcp_type = 'google-calendar'
-                elif 'gmail' in repo_name.lower():
-                    mcp_type = 'gmail'
-                elif 'linkedin-extract' in repo_name.lower():
-                    mcp_type = 'linkedin-extract'
-                elif 'whatsapp' in repo_name.lower():
-                    mcp_type = 'whatsapp'
+            repo_name = repo['url'].split('/')[-1].replace('.git', '')
 
-                
-                if mcp_type and mcp_type in self.mcp_handlers:
-                    print(f"\nConfigurando MCP de {mcp_type}...")
-                    if await self.mcp_handlers[mcp_type].setup(target_path, repo.get('env_vars', {})):
-                        installed_mcps.append(repo_name)
-                    else:
-                        failed_mcps.append(repo_name)
-                else:
-                    print(f"No se pudo determinar el tipo de MCP para {repo_name}")
-                    failed_mcps.append(repo_name)
-                    
-            except Exception as e:
-                print(f"Error configurando MCP {repo_name}: {str(e)}")
-                failed_mcps.append(repo_name)
+            job = self.build_repository_job(repo)
+            if job is None:
+                outcome[repo_name] = False
                 continue
+
+            if force:
+                state.forget(repo_name)
+            contexts[repo_name], stages = job
+            scheduler.add_job(repo_name, stages)
+            outcome[repo_name] = None
+
+        print(f"\nConfigurando MCPs ({self.max_concurrency} en paralelo como máximo)...")
+        results = await scheduler.run()
+        for repo_name, job in results.items():
+            outcome[repo_name] = job.ok
+            try:
+                await self._record_mcp_state(state, repo_name, contexts[repo_name], job)
+            except Exception as e:
+                print(f"Error registrando el estado de {repo_name}: {str(e)}")
+
+        try:
+            state.save()
+        except Exception as e:
+            print(f"Error guardando el estado de aprovisionamiento: {str(e)}")
+
+        # outcome conserva el orden de repositories.json, por lo que el resumen es estable
+        installed_mcps = [name for name, ok in outcome.items() if ok]
+        failed_mcps = [name for name, ok in outcome.items() if not ok]
+
+        if results:
+            print("\n" + format_report(results))
+
+        config_changes: Optional[claude_config.ConfigChanges] = None
                 
         if installed_mcps or NPX_MCPS or UVX_MCPS:
             print("\n=== Resumen de MCPs instalados ===")
@@ -249,138 +436,419 @@ async def setup_all_mcps(self):
             else:
                 print("\nTodas las MCPs se han configurado correctamente.")
                 print("Actualizando archivo de configuración para Claude Desktop...")
-                self.create_claude_desktop_config(installed_mcps)
+                with tracing.span('config', 'phase'):
+                    if self.gateway_mode:
+                        self.write_gateway_servers(installed_mcps)
+                    config_changes = self.create_claude_desktop_config(installed_mcps)
+
+        return {
+            "base_path": self.base_path,
+            "ok": not failed_mcps and config_changes is not None,
+            "installed": installed_mcps,
+            "failed": failed_mcps,
+            "stages": {name: {stage.name: stage.status for stage in job.stages} for name, job in results.items()},
+            "claude_config": None if config_changes is None else {
+                "path": self._get_claude_config_path(),
+                "added": config_changes.added,
+                "updated": config_changes.updated,
+                "removed": config_changes.removed,
+            },
+        }
                 
-    async def clone_repository(self, url: str, path: str) -> bool:
+    async def clone_repository(self, url: str, path: str, ref: Optional[str] = None,
+                               source: Optional[str] = None) -> bool:
+        """Clona un repositorio en modo rápido (superficial y sin blobs históricos).
+
+        Si se indica ``ref`` (rama, tag o commit), la copia queda fijada a él.
+        ``source`` permite clonar desde otra URL (el espejo local) manteniendo
+        ``url`` como remoto ``origin``.
+        """
         try:
             if os.path.exists(path):
                 print(f"El directorio {path} ya existe. Saltando clonación...")
                 return True
 
-            command = f"git clone {url} {path}"
-            process = await asyncio.create_subprocess_shell(
-                command,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-
-            stdout, stderr = await process.communicate()
-
-            if process.returncode != 0:
-                error_message = stderr.decode().strip()
-                if "already exists" in error_message:
-                    print(f"El repositorio ya existe en {path}")
-                    return True
-                else:
-                    print(f"Error al clonar el repositorio: {error_message}")
-                    return False
-
-            output = stdout.decode().strip()
-            if output:
-                print(output)
-
+            name = url.split('/')[-1].replace('.git', '')
+            origin = url if source and source != url else None
+            if not await self.git.clone(source or url, path, ref, name=name, origin=origin):
+                print(f"Error al clonar el repositorio: {url}")
+                return False
             return True
 
         except Exception as e:
             print(f"Error al clonar el repositorio: {str(e)}")
             return False
 
-    def create_claude_desktop_config(self, installed_mcps: List[str]):
-        try:
-            config = { "mcpServers": {} }
-
-            # Agregar MCPs NPX
-            for mcp_name, mcp_config in NPX_MCPS.items():
-                config["mcpServers"][mcp_name] = {
-                    "command": "npx",
-                    "args": ["-y", mcp_config["package"]]
-                }
-                
-                if "args" in mcp_config:
-                    config["mcpServers"][mcp_name]["args"].extend(mcp_config["args"])
-                    
-                if "env" in mcp_config:
-                    # Si es brave-search, usar la clave del archivo .env
-                    if mcp_name == "brave-search" and "BRAVE_API_KEY" in self.env_vars:
-                        config["mcpServers"][mcp_name]["env"] = {
-                            "BRAVE_API_KEY": self.env_vars["BRAVE_API_KEY"]
-                        }
-                    else:
-                        config["mcpServers"][mcp_name]["env"] = mcp_config["env"]
+    def get_installed_mcps(self) -> List[str]:
+        """Repositorios clonados cuya última configuración no falló, en el orden de repositories.json."""
+        state = ProvisioningState(self._get_state_path())
+        installed = []
+        for repo in self.config.get('repositories', []):
+            repo_name = repo['url'].split('/')[-1].replace('.git', '')
+            if not os.path.exists(os.path.join(self.base_path, repo_name)):
+                continue
+            if state.data["mcps"].get(repo_name, {}).get('ok') is False:
+                continue
+            installed.append(repo_name)
+        return installed
+
+    def get_temporary_server_configs(self, use_local: bool) -> Dict[str, Dict]:
+        """Entradas de los servidores NPX y UVX.
+
+        Con ``use_local`` los servidores instalados localmente se lanzan
+        directamente desde su script de entrada en lugar de con npx/uvx.
+        """
+        servers: Dict[str, Dict] = {}
+
+        # Agregar MCPs NPX
+        for mcp_name, mcp_config in NPX_MCPS.items():
+            local_config = self.local_servers.get_config(mcp_name) if use_local and self.local_servers else None
+            servers[mcp_name] = local_config or {
+                "command": "npx",
+                "args": ["-y", mcp_config["package"]]
+            }
+
+            if "args" in mcp_config:
+                servers[mcp_name]["args"].extend(mcp_config["args"])
+
+            if "env" in mcp_config:
+                # Si es brave-search, usar la clave del archivo .env
+                if mcp_name == "brave-search" and "BRAVE_API_KEY" in self.env_vars:
+                    servers[mcp_name]["env"] = {
+                        "BRAVE_API_KEY": self.env_vars["BRAVE_API_KEY"]
+                    }
+                else:
+                    servers[mcp_name]["env"] = mcp_config["env"]
 
-            # Agregar MCP fetch con configuración específica
-            config["mcpServers"]["fetch"] = {
+        # Agregar MCPs UVX
+        for mcp_name, mcp_config in UVX_MCPS.items():
+            local_config = self.local_servers.get_config(mcp_name) if use_local and self.local_servers else None
+            servers[mcp_name] = local_config or {
                 "command": "uvx",
-                "args": ["mcp-server-fetch"]
+                "args": [mcp_config["package"]]
             }
 
-            # Agregar MCPs físicos
-            for mcp_name in installed_mcps:
-                mcp_path = os.path.join(self.base_path, mcp_name)
-                
-                subfolder_path = os.path.join(mcp_path, mcp_name)
-                if os.path.exists(subfolder_path):
-                    mcp_path = subfolder_path
-
-                mcp_type = None
-                if 'trello' in mcp_name.lower():
-                    mcp_type = 'trello'
-                elif 'google-calendar' in mcp_name.lower():
-                    mcp_type = 'google-calendar'
-                elif 'gmail' in mcp_name.lower():
-                    mcp_type = 'gmail'
-                elif 'whatsapp' in mcp_name.lower():
-                    mcp_type = 'whatsapp'
-                elif 'linkedin-extract' in mcp_name.lower():
-                    mcp_type = 'linkedin-extract'
-
-                if mcp_type and mcp_type in self.mcp_handlers:
-                    mcp_config = self.mcp_handlers[mcp_type].get_config()
-                    
-                    if mcp_type != 'whatsapp':  # Solo modificar rutas para MCPs que no sean WhatsApp
-                        build_path = os.path.join(mcp_path, mcp_config['args'][0])
-                        if os.path.exists(build_path):
-                            mcp_config['args'][0] = build_path.replace("\\", "/")
-                        else:
-                            mcp_config['args'][0] = os.path.join(mcp_path, mcp_config['args'][0]).replace("\\", "/")
-
-                    for repo in self.config['repositories']:
-                        repo_name = repo['url'].split('/')[-1].replace('.git', '')
-                        if repo_name == mcp_name and 'env_vars' in repo:
-                            mcp_config['env'] = repo['env_vars']
-                            break
-
-                    # Asegurar que todas las rutas en la configuración usen barras normales
-                    if 'command' in mcp_config:
-                        mcp_config['command'] = mcp_config['command'].replace("\\", "/")
-                    if 'args' in mcp_config:
-                        mcp_config['args'] = [arg.replace("\\", "/") if isinstance(arg, str) else arg for arg in mcp_config['args']]
-
-                    config["mcpServers"][mcp_type] = mcp_config
-
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            project_root = os.path.dirname(current_dir)
-            config_path = os.path.join(project_root, "claude_desktop_config.json")
-            
-            os.makedirs(os.path.dirname(config_path), exist_ok=True)
-            
-            with open(config_path, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=2, ensure_ascii=False)
-            
-            if os.path.exists(config_path):
-                print("Archivo de configuración creado exitosamente.")
-                print("\nPor favor, copia el archivo 'claude_desktop_config.json' en donde tengas instalado Claude Desktop")
-            else:
-                print("Error: No se pudo crear el archivo de configuración.")
-                
+        return servers
+
+    def get_server_configs(self, installed_mcps: List[str], only: Optional[Set[str]] = None) -> Dict[str, Dict]:
+        """Construye la entrada ``mcpServers`` de cada servidor (NPX, UVX y MCPs físicos).
+
+        Es la configuración que se escribe para Claude Desktop y la que usa la
+        pasarela para lanzar los servidores. Con ``only`` solo se calculan
+        las entradas con esos nombres.
+        """
+        servers = self.get_temporary_server_configs(use_local=self.local_servers is not None)
+        if only is not None:
+            servers = {name: config for name, config in servers.items() if name in only}
+
+        # Agregar MCPs físicos
+        for mcp_name in installed_mcps:
+            if only is not None and self._get_mcp_type(mcp_name) not in only:
+                continue
+            mcp_path = os.path.join(self.base_path, mcp_name)
+
+            subfolder_path = os.path.join(mcp_path, mcp_name)
+            if os.path.exists(subfolder_path):
+                mcp_path = subfolder_path
+
+            mcp_type = self._get_mcp_type(mcp_name)
+
+            if mcp_type and mcp_type in self.mcp_handlers:
+                mcp_config = self.mcp_handlers[mcp_type].get_config()
+
+                if mcp_type != 'whatsapp':  # Solo modificar rutas para MCPs que no sean WhatsApp
+                    build_path = os.path.join(mcp_path, mcp_config['args'][0])
+                    if os.path.exists(build_path):
+                        mcp_config['args'][0] = build_path.replace("\\", "/")
+                    else:
+                        mcp_config['args'][0] = os.path.join(mcp_path, mcp_config['args'][0]).replace("\\", "/")
+
+                for repo in self.config['repositories']:
+                    repo_name = repo['url'].split('/')[-1].replace('.git', '')
+                    if repo_name == mcp_name and 'env_vars' in repo:
+                        mcp_config['env'] = dict(repo['env_vars'])
+                        break
+
+                if self.mcp_handlers[mcp_type].uses_google_oauth:
+                    mcp_config['env'] = self._with_token_broker(mcp_config.get('env', {}))
+
+                # Asegurar que todas las rutas en la configuración usen barras normales
+                if 'command' in mcp_config:
+                    mcp_config['command'] = mcp_config['command'].replace("\\", "/")
+                if 'args' in mcp_config:
+                    mcp_config['args'] = [arg.replace("\\", "/") if isinstance(arg, str) else arg for arg in mcp_config['args']]
+
+                servers[mcp_type] = mcp_config
+
+        return servers
+
+    def _with_token_broker(self, env: Dict[str, str]) -> Dict[str, str]:
+        """Hace que un MCP de Google pida sus tokens de acceso al intermediario local.
+
+        Gmail y Google Calendar comparten el refresh token; con
+        GOOGLE_TOKEN_BROKER=true (desactivado por defecto) cargan scripts/google_token_preload.js, que
+        obtiene el token de acceso de scripts/google_token_broker.js en lugar
+        de canjearlo cada servidor al arrancar y al caducar.
+        """
+        if self.properties.get('GOOGLE_TOKEN_BROKER', 'false').lower() != 'true':
+            return env
+        preload = os.path.join(self._get_project_root(), 'scripts', 'google_token_preload.js').replace("\\", "/")
+        node_options = f'--require "{preload}"'
+        if env.get('NODE_OPTIONS'):
+            node_options = f"{env['NODE_OPTIONS']} {node_options}"
+        env = dict(env, NODE_OPTIONS=node_options)
+        for key in ('GOOGLE_TOKEN_URI', 'GOOGLE_TOKEN_BROKER_SOCKET', 'GOOGLE_TOKEN_REFRESH_MARGIN',
+                    'GOOGLE_TOKEN_BROKER_IDLE_TTL'):
+            if self.properties.get(key):
+                env[key] = self.properties[key]
+        return env
+
+    def _get_log_path(self) -> Optional[str]:
+        """LOG_FILE_PATH, relativo a la raíz del proyecto si no es absoluto; None si está vacío."""
+        log_path = self.properties.get('LOG_FILE_PATH', '')
+        if not log_path:
+            return None
+        return os.path.join(self._get_project_root(), log_path)
+
+    def _configure_logging(self):
+        """Aplica LOG_LEVEL y LOG_FILE_PATH al log de trazas y de comandos."""
+        tracing.configure_logging(self.properties.get('LOG_LEVEL', 'INFO'), self._get_log_path())
+
+    def _get_trace_path(self) -> str:
+        """TRACE_PATH o, por defecto, setup-trace.json junto al archivo de log."""
+        trace_path = self.properties.get('TRACE_PATH', '')
+        if trace_path:
+            return os.path.join(self._get_project_root(), trace_path)
+        log_path = self._get_log_path()
+        log_dir = os.path.dirname(log_path) if log_path else os.path.join(self._get_project_root(), 'logs')
+        return os.path.join(log_dir, 'setup-trace.json')
+
+    def _report_trace(self, tracer: tracing.Tracer):
+        """Muestra el resumen de tiempos de la traza y la guarda en formato Chrome."""
+        summary = tracer.format_summary()
+        if summary:
+            print("\n" + summary)
+        trace_path = self._get_trace_path()
+        try:
+            tracer.export(trace_path)
+            print(f"Traza guardada en {trace_path} (ábrela en chrome://tracing o ui.perfetto.dev)")
         except Exception as e:
-            print(f"Error al crear/actualizar el archivo de configuración: {str(e)}")
+            print(f"No se pudo guardar la traza: {str(e)}")
 
-    def _get_mcp_config(self, mcp_name: str) -> Optional[Dict]:
+    def _get_project_root(self) -> str:
+        return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def get_gateway_paths(self) -> Tuple[str, str]:
+        """Rutas del archivo de servidores de la pasarela y de su catálogo de herramientas."""
+        servers_path = os.path.join(self._get_project_root(), "gateway_servers.json")
+        catalog_path = self.properties.get('GATEWAY_CATALOG_PATH') or os.path.join(self.base_path, '.gateway-tools.json')
+        return servers_path, catalog_path
+
+    def write_gateway_servers(self, installed_mcps: List[str]) -> bool:
+        """Guarda los servidores que lanza la pasarela en gateway_servers.json.
+
+        Catalogar sus herramientas corresponde a ``gateway.server.prepare_catalog``,
+        que setup.py ejecuta después de aprovisionar.
+        """
+        servers_path, _ = self.get_gateway_paths()
+        servers = self._with_gateway_options(self.get_server_configs(installed_mcps))
         try:
-            with open(self.config_path, 'r') as f:
-                config = json.load(f)
-                return config.get(mcp_name)
+            self._write_json(servers_path, {"mcpServers": servers})
         except Exception as e:
-            print(f"Error al leer configuración de {mcp_name}: {str(e)}")
+            print(f"Error guardando los servidores de la pasarela: {str(e)}")
+            return False
+        return True
+
+    def _with_gateway_options(self, servers: Dict[str, Dict]) -> Dict[str, Dict]:
+        """Añade las opciones que solo interpreta la pasarela.
+
+        ``idle_ttl`` en los servidores temporales (npx/uvx), que la pasarela
+        cierra tras un tiempo sin uso; ``cache`` con la política de caché de
+        respuestas y ``coalesce`` con las herramientas cuyas llamadas idénticas
+        simultáneas comparten una ejecución, tomadas de NPX_MCPS, UVX_MCPS o de
+        la entrada de repositories.json.
+        """
+        idle_ttl = self._get_number('TEMPORARY_SERVER_IDLE_TTL', 300)
+        if idle_ttl > 0:
+            for name in list(NPX_MCPS) + list(UVX_MCPS):
+                if name in servers:
+                    servers[name] = dict(servers[name], idle_ttl=idle_ttl)
+
+        for option in ('cache', 'coalesce'):
+            policies = {name: config.get(option) for name, config in {**NPX_MCPS, **UVX_MCPS}.items()}
+            for repo in self.config.get('repositories', []):
+                mcp_type = self._get_mcp_type(repo['url'].split('/')[-1].replace('.git', ''))
+                if mcp_type and option in repo:
+                    policies[mcp_type] = repo[option]
+            for name, policy in policies.items():
+                if policy and name in servers:
+                    servers[name] = dict(servers[name], **{option: policy})
+        return servers
+
+    def get_gateway_config(self) -> Dict[str, Dict]:
+        """Entrada única de ``mcpServers`` que lanza la pasarela."""
+        servers_path, catalog_path = self.get_gateway_paths()
+        gateway_script = os.path.join(self._get_project_root(), "gateway.py")
+        args = [gateway_script, "--servers", servers_path, "--catalog", catalog_path]
+        if self.properties.get('GATEWAY_CACHE_ENABLED', 'true').lower() == 'true':
+            cache_path = self.properties.get('GATEWAY_CACHE_PATH') or os.path.join(self.base_path, '.gateway-cache.sqlite')
+            args += ["--cache", cache_path,
+                     "--cache-memory", str(int(self._get_number('GATEWAY_CACHE_MEMORY_ENTRIES', 256))),
+                     "--cache-disk", str(int(self._get_number('GATEWAY_CACHE_DISK_ENTRIES', 5000)))]
+        else:
+            args.append("--no-cache")
+        if self.properties.get('GATEWAY_KEEP_WARM', 'true').lower() == 'true':
+            status_path = self.properties.get('SUPERVISOR_STATUS_PATH') or os.path.join(self.base_path, '.supervisor-status.json')
+            args += ["--keep-warm",
+                     "--startup-timeout", str(self._get_number('SERVER_STARTUP_TIMEOUT', 30)),
+                     "--ping-interval", str(self._get_number('SUPERVISOR_PING_INTERVAL', 15)),
+                     "--ping-timeout", str(self._get_number('SUPERVISOR_PING_TIMEOUT', 5)),
+                     "--failure-threshold", str(int(self._get_number('SUPERVISOR_FAILURE_THRESHOLD', 3))),
+                     "--max-backoff", str(self._get_number('SUPERVISOR_MAX_BACKOFF', 60)),
+                     "--status", status_path,
+                     "--status-interval", str(self._get_number('SUPERVISOR_STATUS_INTERVAL', 60))]
+        return {
+            "mcp-gateway": {
+                "command": sys.executable.replace("\\", "/"),
+                "args": [arg.replace("\\", "/") for arg in args]
+            }
+        }
+
+    def _write_json(self, path: str, data: Dict):
+        """Escribe un JSON de forma atómica: quien lo lea verá el archivo anterior o el nuevo, nunca uno a medias."""
+        claude_config.atomic_write_json(path, data)
+
+    def _get_claude_config_path(self) -> str:
+        """claude_desktop_config.json en la carpeta de Claude Desktop de este sistema operativo."""
+        return os.path.join(claude_config.get_config_dir(self.properties), claude_config.CONFIG_FILE)
+
+    def _write_claude_servers(self, servers: Dict[str, Dict]) -> claude_config.ConfigChanges:
+        """Fusiona ``servers`` con la configuración de Claude Desktop; solo escribe si algo cambió.
+
+        Solo se modifican o eliminan las entradas que escribió este proyecto,
+        registradas en el manifiesto de estado. Una entrada con el mismo nombre
+        creada por el usuario se conserva con un aviso.
+        """
+        config_path = self._get_claude_config_path()
+        state = ProvisioningState(self._get_state_path())
+        owned = state.claude_servers(config_path)
+        changes = claude_config.update_config(config_path, servers, owned)
+        for name in changes.skipped:
+            print(f"Aviso: la entrada '{name}' de {config_path} no la creó este proyecto y no se modifica. "
+                  f"Elimínala si quieres que la gestione setup.py.")
+        written = set(servers) - set(changes.skipped)
+        if written != owned:
+            state.set_claude_servers(config_path, written)
+            state.save()
+        return changes
+
+    def create_claude_desktop_config(self, installed_mcps: List[str]) -> Optional[claude_config.ConfigChanges]:
+        """Actualiza la configuración de Claude Desktop con los servidores instalados.
+
+        Las entradas que no gestiona este proyecto se conservan. Si nada
+        cambió, el archivo no se reescribe y Claude Desktop no necesita
+        reiniciarse.
+
+        Returns:
+            Optional[ConfigChanges]: Entradas modificadas, o None si no se pudo escribir.
+        """
+        config_path = self._get_claude_config_path()
+        try:
+            if self.gateway_mode:
+                servers = self.get_gateway_config()
+            else:
+                servers = self.get_server_configs(installed_mcps)
+            changes = self._write_claude_servers(servers)
+        except Exception as e:
+            print(f"Error al crear/actualizar el archivo de configuración {config_path}: {str(e)}")
+            return None
+
+        if changes:
+            print(f"Configuración de Claude Desktop actualizada en {config_path} ({changes.describe()}).")
+            print("Reinicia Claude Desktop para aplicar los cambios.")
+        else:
+            print(f"La configuración de Claude Desktop en {config_path} ya está al día.")
+        return changes
+
+    def _affected_servers(self, before: Dict, after: Dict) -> Optional[Set[str]]:
+        """Entradas de ``mcpServers`` afectadas entre dos instantáneas de la configuración.
+
+        Retorna None si cambió algo que afecta a todas (default.properties o la
+        ruta base). Las variables de .env ya están sustituidas en los
+        repositorios, por lo que un token rotado solo afecta a los repositorios
+        que lo usan.
+        """
+        if before['properties'] != after['properties'] or before['base_path'] != after['base_path']:
             return None
+        affected = set()
+        for repo_name in set(before['repositories']) | set(after['repositories']):
+            if before['repositories'].get(repo_name) != after['repositories'].get(repo_name):
+                affected.add(self._get_mcp_type(repo_name) or repo_name)
+        if before['env'].get('BRAVE_API_KEY') != after['env'].get('BRAVE_API_KEY'):
+            affected.add('brave-search')
+        return affected
+
+    def _config_snapshot(self) -> Dict:
+        config = self.config
+        return {
+            "properties": self.properties,
+            "env": self.env_vars,
+            "base_path": config.get('base_path'),
+            "repositories": {repo['url'].split('/')[-1].replace('.git', ''): repo
+                             for repo in config.get('repositories', [])},
+        }
+
+    def _write_watched_servers(self, servers: Dict[str, Dict]):
+        """Escribe las entradas: en modo pasarela, en el archivo de servidores de la pasarela."""
+        if self.gateway_mode:
+            servers_path, _ = self.get_gateway_paths()
+            self._write_json(servers_path, {"mcpServers": self._with_gateway_options(dict(servers))})
+            self._write_claude_servers(self.get_gateway_config())
+        else:
+            self._write_claude_servers(servers)
+
+    async def watch(self):
+        """Regenera la configuración de Claude Desktop cada vez que cambian los archivos de config.
+
+        Vigila repositories.json, .env y default.properties (con inotify o, si
+        no está disponible, por sondeo cada CONFIG_WATCH_POLL_INTERVAL
+        segundos), recalcula solo las entradas afectadas y reescribe el archivo
+        de forma atómica. No clona ni instala nada: los repositorios nuevos
+        necesitan una ejecución normal de setup.py.
+        """
+        paths = [self.settings.properties_path, self.settings.env_path, self.settings.repositories_path]
+        watcher = FileWatcher(paths, poll_interval=self._get_number('CONFIG_WATCH_POLL_INTERVAL', 1.0))
+        snapshot = self._config_snapshot()
+        servers = self.get_server_configs(self.get_installed_mcps())
+        self._write_watched_servers(servers)
+        print(f"Vigilando {self.settings.config_dir} ({watcher.start()}); "
+              f"{len(servers)} servidores configurados. Ctrl+C para terminar.")
+
+        async for changed in watcher.changes():
+            start = time.perf_counter()
+            current = self._config_snapshot()
+            affected = self._affected_servers(snapshot, current)
+            installed = self.get_installed_mcps()
+            if affected is None:
+                updated = self.get_server_configs(installed)
+            else:
+                updated = {name: config for name, config in servers.items() if name not in affected}
+                updated.update(self.get_server_configs(installed, only=affected))
+            modified = sorted(name for name in set(servers) | set(updated) if servers.get(name) != updated.get(name))
+            if modified:
+                try:
+                    self._write_watched_servers(updated)
+                except Exception as e:
+                    print(f"Error al escribir la configuración: {str(e)}")
+                    continue
+                elapsed = (time.perf_counter() - start) * 1000
+                print(f"[{time.strftime('%H:%M:%S')}] {', '.join(os.path.basename(p) for p in sorted(changed))}: "
+                      f"actualizadas {', '.join(modified)} ({elapsed:.1f} ms)")
+            pending = [name for name in set(current['repositories']) - set(snapshot['repositories'])
+                       if name not in installed]
+            if pending:
+                print(f"Repositorios nuevos sin instalar: {', '.join(pending)}. Ejecuta python setup.py para instalarlos.")
+            servers, snapshot = updated, current
+
+    def _get_mcp_config(self, mcp_name: str) -> Optional[Dict]:
+        return self.config.get(mcp_name)
@@ -1,42 +1,32 @@
 import os
 import json
-import re
-import asyncio
-import subprocess
-from typing import Dict
+from typing import Dict, List, Optional
+from ...config.config_service import ConfigService
 from ...core.base_mcp import BaseMCP
+from ...core.pipeline import CPU, IO, UNCHANGED, SetupContext, Stage
+from ...core.tracing import record_write
 
 class GoogleCalendarMCP(BaseMCP):
     """Implementación específica para el MCP de Google Calendar."""
+
+    build_dir = 'build'
+    uses_google_oauth = True
     
-    def __init__(self):
-        super().__init__("google-calendar")
+    def __init__(self, settings: Optional[ConfigService] = None):
+        super().__init__("google-calendar", settings)
+        
+    def get_stages(self, context: SetupContext) -> List[Stage]:
+        """Declara las etapas de configuración del MCP de Google Calendar."""
+        min_required = ['GOOGLE_CLIENT_ID', 'GOOGLE_CLIENT_SECRET']
         
-    async def setup(self, path: str, env_vars: Dict) -> bool:
-        """Configura el MCP de Google Calendar."""
-        try:
+        async def validate() -> bool:
             # 1. Verificar credenciales mínimas para obtener token
-            min_required = ['GOOGLE_CLIENT_ID', 'GOOGLE_CLIENT_SECRET']
-            missing = [v for v in min_required if v not in env_vars]
-            empty   = [v for v in min_required if v in env_vars and not env_vars[v].strip()]
-            
-            if missing:
-                print(f"Faltan variables de entorno: {', '.join(missing)}")
-                print("Configura las credenciales en repositories.json y vuelve a ejecutar.")
-                return False
-            if empty:
-                print(f"Variables vacías: {', '.join(empty)}")
-                print("Configura las credenciales en repositories.json y vuelve a ejecutar.")
-                return False
-            
-            # 2. Crear archivo .env con las credenciales mínimas
-            print("\nCreando archivo .env con credenciales básicas...")
-            self.create_env_file(path, {k: v for k, v in env_vars.items() if k in min_required})
-            print(f"Archivo .env creado en: {os.path.join(path, '.env')}")
-
-            # 3. Modificar package.json para Windows
+            return UNCHANGED if self.check_required_env(context.env_vars, min_required) else False
+        
+        async def patch_package() -> bool:
+            # 2. Modificar package.json para Windows
             print("\nModificando package.json para Windows...")
-            package_path = os.path.join(path, 'package.json')
+            package_path = os.path.join(context.path, 'package.json')
             if os.path.exists(package_path):
                 with open(package_path, 'r', encoding='utf-8') as f:
                     package_data = json.load(f)
@@ -52,14 +42,18 @@ async def setup(self, path: str, env_vars: Dict) -> bool:
                 
                 with open(package_path, 'w', encoding='utf-8') as f:
                     json.dump(package_data, f, indent=2)
+                record_write(package_path)
                 print("package.json actualizado para Windows")
+            return True
 
-            # 4. Instalar dependencias
-            print("\nInstalando dependencias...")
-            await self.run_command(f"cd {path} && npm install")
+        async def write_env() -> bool:
+            # 3. Crear archivo .env con las credenciales mínimas
+            print("\nCreando archivo .env con credenciales básicas...")
+            self.create_env_file(context.path, {k: v for k, v in context.env_vars.items() if k in min_required})
+            print(f"Archivo .env creado en: {os.path.join(context.path, '.env')}")
 
-            # 5. Verificar si existe refresh token
-            if not env_vars.get('GOOGLE_REFRESH_TOKEN', '').strip():
+            # 4. Verificar si existe refresh token
+            if not context.env_vars.get('GOOGLE_REFRESH_TOKEN', '').strip():
                 print("\nNo se encontró refresh token.")
                 print("Pasos a seguir:")
                 print(" 1. Ejecuta en la terminal: node obtener_token_google.js")
@@ -69,13 +63,15 @@ async def setup(self, path: str, env_vars: Dict) -> bool:
                 print(" 5. Elimina la carpeta del MCP google-calendar y vuelve a ejecutar python setup.py")
                 return False
 
-            # 6. Actualizar .env con todas las variables
+            # 5. Actualizar .env con todas las variables
             print("\nActualizando archivo .env con todas las variables...")
-            self.create_env_file(path, env_vars)
+            self.create_env_file(context.path, context.env_vars)
+            return True
 
-            # 7. Modificar index.ts
+        async def patch_source() -> bool:
+            # 6. Modificar index.ts
             print("\nModificando index.ts...")
-            index_path = os.path.join(path, 'index.ts')
+            index_path = os.path.join(context.path, 'index.ts')
             if os.path.exists(index_path):
                 with open(index_path, 'r', encoding='utf-8') as f:
                     content = f.read()
@@ -89,15 +85,14 @@ async def setup(self, path: str, env_vars: Dict) -> bool:
                 
                 with open(index_path, 'w', encoding='utf-8') as f:
                     f.write(content)
+                record_write(index_path)
             print("index.ts actualizado")
+            return True
             
-            # 8. Compilar proyecto
-            print("\nCompilando proyecto...")
-            await self.run_command(f"cd {path} && npm run build")
-
-            # 9. Modificar el archivo compilado
+        async def patch_build() -> bool:
+            # 7. Modificar el archivo compilado
             print("\nModificando archivo compilado...")
-            build_index_path = os.path.join(path, 'build', 'index.js')
+            build_index_path = os.path.join(context.path, 'build', 'index.js')
             if os.path.exists(build_index_path):
                 with open(build_index_path, 'r', encoding='utf-8') as f:
                     content = f.read()
@@ -111,19 +106,27 @@ async def setup(self, path: str, env_vars: Dict) -> bool:
                 
                 with open(build_index_path, 'w', encoding='utf-8') as f:
                     f.write(content)
+                record_write(build_index_path)
                 print("Archivo compilado actualizado")
+            return True
             
-            # 10. Verificar que el servidor funcione
+        async def verify() -> bool:
+            # 8. Verificar que el servidor funcione
             print("\nVerificando que el servidor funcione...")
-            if not await self.verify_server(path, env_vars):
+            if not await self.verify_server(context.path):
                 print("Error: El servidor no pudo iniciar correctamente")
                 return False
-            
             return True
-                
-        except Exception as e:
-            print(f"Error configurando Google Calendar: {e}")
-            return False
+        
+        return [
+            Stage('validate', validate, IO),
+            Stage('package', patch_package, IO, ['validate'], self.commit_fingerprint(context, 'package.json')),
+            Stage('env', write_env, IO, ['validate'], self.env_fingerprint(context)),
+            Stage('source', patch_source, IO, ['validate'], self.commit_fingerprint(context)),
+            *self.get_npm_stages(context, ['package'], build_depends_on=['source']),
+            Stage('patch', patch_build, IO, ['build'], self.build_fingerprint(context, self.build_dir)),
+            Stage('verify', verify, CPU, ['env', 'patch'], self.constant_fingerprint('verify')),
+        ]
             
     def get_config(self) -> Dict:
         """Obtiene la configuración específica de Google Calendar para Claude Desktop."""
@@ -144,53 +147,4 @@ def create_env_file(self, path: str, env_vars: Dict) -> None:
         with open(env_path, 'w', encoding='utf-8') as f:
             for key, value in env_vars.items():
                 f.write(f'{key}="{value}"\n')
-
-    async def verify_server(self, path: str, env_vars: Dict) -> bool:
-        """Verifica que el servidor funcione correctamente."""
-        try:
-            print("\nIntentando iniciar el servidor...")
-            
-            # Primero asegurarnos que el archivo .env está actualizado
-            self.create_env_file(path, env_vars)
-            
-            # Iniciar el servidor
-            process = subprocess.Popen(
-                "npm start",
-                cwd=path,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            
-            # Esperar un momento para ver si el servidor inicia
-            await asyncio.sleep(2)
-            
-            # Verificar si el proceso sigue corriendo
-            if process.poll() is None:
-                print("Servidor iniciado correctamente!")
-                print("Consejo: Para ver la salida completa del servidor, ejecuta 'npm start' en el CMD")
-                
-                # Intentar terminar el proceso de manera segura
-                try:
-                    process.terminate()
-                    await asyncio.sleep(1)
-                    if process.poll() is None:
-                        process.kill()
-                    await asyncio.sleep(1)
-                except Exception:
-                    pass
-                    
-                return True
-            else:
-                # Si el proceso terminó, leer la salida de error
-                _, stderr = process.communicate()
-                print("Error: El servidor no pudo iniciar correctamente")
-                if stderr:
-                    print("\nErrores encontrados:")
-                    print(stderr.strip())
-                return False
-        
-        except Exception as e:
-            print(f"Error al verificar el servidor: {str(e)}")
-            return False
+        record_write(env_path)
@@ -0,0 +1,392 @@
+"""
+Extracción por lotes de perfiles y empresas de LinkedIn con Apify.
+
+El servidor MCP de LinkedIn lanza una ejecución de Apify por cada llamada a
+una herramienta. Para enriquecer una lista de URLs, este módulo:
+
+1. Normaliza las URLs (``linkedin.com/in/Usuario/?trk=...`` y
+   ``https://es.linkedin.com/in/usuario`` son la misma) y descarta las
+   repetidas y las que no son de un perfil o una empresa.
+2. Consulta el almacén SQLite, indexado por la URL canónica, y omite las que
+   ya se extrajeron; una nueva ejecución solo paga por las que faltan.
+3. Agrupa las pendientes en lotes de ``batch_size`` URLs por actor y lanza
+   hasta ``max_concurrent_runs`` ejecuciones de Apify a la vez.
+
+La URL base de la API es configurable (APIFY_API_URL), de modo que se puede
+probar contra ``src/bench/apify_stub.py`` con cualquier token y sin coste.
+"""
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+PROFILE = 'profile'
+COMPANY = 'company'
+
+DEFAULT_API_URL = "https://api.apify.com"
+# Actor y campo de entrada con la lista de URLs de cada tipo
+DEFAULT_ACTORS = {
+    PROFILE: ("dev_fusion~linkedin-profile-scraper", "profileUrls"),
+    COMPANY: ("dev_fusion~linkedin-company-scraper", "companyUrls"),
+}
+# Campos de los resultados de Apify que pueden contener la URL extraída
+ITEM_URL_FIELDS = ('linkedinUrl', 'linkedInUrl', 'profileUrl', 'companyUrl', 'inputUrl', 'input_url', 'url')
+# Códigos HTTP tras los que se reintenta la ejecución
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+OK = 'ok'
+NOT_FOUND = 'not_found'
+FAILED = 'failed'
+
+_PATH_KINDS = {'in': PROFILE, 'company': COMPANY, 'school': COMPANY, 'showcase': COMPANY}
+_SLUG = re.compile(r'^[^/?#\s]+$')
+
+
+def normalize_linkedin_url(url: str) -> Optional[Tuple[str, str]]:
+    """Tipo (perfil o empresa) y URL canónica, o None si no es una URL de LinkedIn válida.
+
+    Se ignoran el subdominio de idioma, el esquema, los parámetros, el
+    fragmento y las subpáginas (``/details/experience``); el identificador se
+    pasa a minúsculas.
+    """
+    url = (url or "").strip()
+    if not url:
+        return None
+    if "://" not in url:
+        url = "https://" + url
+    parsed = urllib.parse.urlsplit(url)
+    host = (parsed.hostname or "").lower()
+    if host != "linkedin.com" and not host.endswith(".linkedin.com"):
+        return None
+    parts = [part for part in parsed.path.split("/") if part]
+    if len(parts) < 2 or parts[0].lower() not in _PATH_KINDS:
+        return None
+    slug = urllib.parse.unquote(parts[1]).strip().lower()
+    if not _SLUG.match(slug):
+        return None
+    section = parts[0].lower()
+    return _PATH_KINDS[section], f"https://www.linkedin.com/{section}/{urllib.parse.quote(slug)}"
+
+
+def read_url_list(path: str) -> List[str]:
+    """URLs de un archivo de texto (una por línea) o JSON (lista de URLs)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    if path.lower().endswith('.json'):
+        data = json.loads(text)
+        if not isinstance(data, list):
+            raise ValueError(f"{path} debe contener una lista de URLs")
+        return [str(item) for item in data]
+    return [line.strip() for line in text.splitlines() if line.strip() and not line.strip().startswith('#')]
+
+
+class ApifyError(Exception):
+    """Error de la API de Apify."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class ApifyClient:
+    """Cliente mínimo de la API de Apify (solo biblioteca estándar)."""
+
+    def __init__(self, token: str, base_url: str = DEFAULT_API_URL, timeout: float = 300, retries: int = 2):
+        self.token = token
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.retries = retries
+
+    def _post(self, url: str, payload: Dict[str, Any]) -> Any:
+        request = urllib.request.Request(url, data=json.dumps(payload).encode(), method='POST',
+                                         headers={"Content-Type": "application/json",
+                                                  "Authorization": f"Bearer {self.token}"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read() or b"[]")
+        except urllib.error.HTTPError as e:
+            detail = e.read().decode(errors='replace')[:300]
+            raise ApifyError(f"HTTP {e.code}: {detail}", e.code)
+        except (urllib.error.URLError, OSError) as e:
+            raise ApifyError(f"Sin conexión con {self.base_url}: {e}")
+        except ValueError as e:
+            raise ApifyError(f"Respuesta no válida: {e}")
+
+    async def run_actor(self, actor: str, run_input: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Ejecuta el actor y retorna los elementos de su dataset.
+
+        Los errores 429 y 5xx se reintentan con espera exponencial.
+        """
+        url = f"{self.base_url}/v2/acts/{urllib.parse.quote(actor, safe='~')}/run-sync-get-dataset-items"
+        for attempt in range(self.retries + 1):
+            try:
+                items = await asyncio.to_thread(self._post, url, run_input)
+            except ApifyError as e:
+                if attempt == self.retries or (e.status is not None and e.status not in RETRY_STATUSES):
+                    raise
+                await asyncio.sleep(2 ** attempt)
+                continue
+            if not isinstance(items, list):
+                raise ApifyError("La respuesta no es una lista de resultados")
+            return items
+        return []
+
+
+class ExtractionStore:
+    """Resultados de extracción en SQLite, uno por URL canónica."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS extractions (
+                url TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                data TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                fetched_at REAL NOT NULL
+            )""")
+        self.db.commit()
+
+    def statuses(self, urls: Iterable[str]) -> Dict[str, str]:
+        """Estado guardado de cada URL que ya está en el almacén."""
+        urls = list(urls)
+        found: Dict[str, str] = {}
+        # SQLite limita el número de parámetros por consulta
+        for start in range(0, len(urls), 500):
+            chunk = urls[start:start + 500]
+            query = f"SELECT url, status FROM extractions WHERE url IN ({','.join('?' * len(chunk))})"
+            found.update(self.db.execute(query, chunk).fetchall())
+        return found
+
+    def save(self, results: List[Tuple[str, str, str, Optional[Dict[str, Any]], Optional[str]]]):
+        """Guarda ``(url, tipo, estado, datos, error)`` en una sola transacción.
+
+        Un fallo no sustituye a un resultado anterior (por ejemplo, al refrescar).
+        """
+        now = time.time()
+        with self.db:
+            self.db.executemany(f"""
+                INSERT INTO extractions (url, kind, status, data, error, attempts, fetched_at)
+                VALUES (?, ?, ?, ?, ?, 1, ?)
+                ON CONFLICT(url) DO UPDATE SET status = excluded.status, data = excluded.data,
+                    error = excluded.error, attempts = attempts + 1, fetched_at = excluded.fetched_at
+                WHERE excluded.status != '{FAILED}' OR extractions.status = '{FAILED}'
+            """, [(url, kind, status, json.dumps(data, ensure_ascii=False) if data is not None else None, error, now)
+                  for url, kind, status, data, error in results])
+
+    def export(self, urls: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Filas del almacén (todas o las de ``urls``) con los datos ya decodificados."""
+        query = "SELECT url, kind, status, data, error, attempts, fetched_at FROM extractions"
+        rows = self.db.execute(query + " ORDER BY url").fetchall()
+        if urls is not None:
+            wanted = set(urls)
+            rows = [row for row in rows if row[0] in wanted]
+        return [{"url": url, "kind": kind, "status": status, "data": json.loads(data) if data else None,
+                 "error": error, "attempts": attempts,
+                 "fetched_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(fetched_at))}
+                for url, kind, status, data, error, attempts, fetched_at in rows]
+
+    def close(self):
+        self.db.close()
+
+
+@dataclass
+class BatchReport:
+    """Resumen de una extracción por lotes."""
+    requested: int = 0
+    invalid: List[str] = field(default_factory=list)
+    duplicates: int = 0
+    cached: int = 0
+    fetched: int = 0
+    not_found: int = 0
+    failed: int = 0
+    runs: int = 0
+    duration: float = 0.0
+    urls: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+    def format(self) -> str:
+        lines = [
+            "=== Extracción por lotes de LinkedIn ===",
+            f"URLs recibidas:       {self.requested}",
+            f"  no válidas:         {len(self.invalid)}",
+            f"  repetidas:          {self.duplicates}",
+            f"  ya extraídas:       {self.cached}",
+            f"Extraídas ahora:      {self.fetched} en {self.runs} ejecuciones de Apify ({self.duration:.1f}s)",
+            f"Sin resultado:        {self.not_found}",
+            f"Con error:            {self.failed}",
+        ]
+        for url in self.invalid[:10]:
+            lines.append(f"  no válida: {url}")
+        lines.append("========================================")
+        return "\n".join(lines)
+
+
+class BatchExtractor:
+    """Extrae con Apify las URLs que faltan en el almacén, en lotes y con concurrencia limitada."""
+
+    def __init__(self, store: ExtractionStore, client: ApifyClient,
+                 actors: Optional[Dict[str, Tuple[str, str]]] = None,
+                 batch_size: int = 25, max_concurrent_runs: int = 3):
+        self.store = store
+        self.client = client
+        self.actors = dict(DEFAULT_ACTORS, **(actors or {}))
+        self.batch_size = max(1, batch_size)
+        self.max_concurrent_runs = max(1, max_concurrent_runs)
+
+    @staticmethod
+    def _match_items(urls: List[str], items: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Asocia cada resultado de Apify a la URL canónica de la que procede."""
+        pending = set(urls)
+        matched: Dict[str, Dict[str, Any]] = {}
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            for key in ITEM_URL_FIELDS:
+                normalized = normalize_linkedin_url(str(item.get(key) or ""))
+                if normalized and normalized[1] in pending:
+                    matched[normalized[1]] = item
+                    pending.discard(normalized[1])
+                    break
+        # Un lote de una sola URL no necesita que el resultado la identifique
+        if len(urls) == 1 and not matched and len(items) == 1 and isinstance(items[0], dict):
+            matched[urls[0]] = items[0]
+        return matched
+
+    async def _run_batch(self, kind: str, urls: List[str], semaphore: asyncio.Semaphore,
+                         report: BatchReport, label: str):
+        actor, input_field = self.actors[kind]
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                items = await self.client.run_actor(actor, {input_field: urls})
+            except ApifyError as e:
+                print(f"[linkedin] {label}: error en Apify: {str(e)}")
+                self.store.save([(url, kind, FAILED, None, str(e)) for url in urls])
+                report.failed += len(urls)
+                report.runs += 1
+                return
+        matched = self._match_items(urls, items)
+        self.store.save([(url, kind, OK, matched[url], None) if url in matched
+                         else (url, kind, NOT_FOUND, None, "Apify no devolvió datos para esta URL")
+                         for url in urls])
+        report.runs += 1
+        report.fetched += len(matched)
+        report.not_found += len(urls) - len(matched)
+        print(f"[linkedin] {label}: {len(matched)}/{len(urls)} extraídas ({time.perf_counter() - start:.1f}s)")
+
+    async def extract(self, urls: Iterable[str], refresh: bool = False) -> BatchReport:
+        """Extrae las URLs que aún no tienen resultado en el almacén.
+
+        Las URLs con un intento fallido se vuelven a pedir; con ``refresh`` se
+        vuelven a pedir todas.
+        """
+        start = time.perf_counter()
+        report = BatchReport()
+        canonical: Dict[str, str] = {}
+        for url in urls:
+            report.requested += 1
+            normalized = normalize_linkedin_url(url)
+            if normalized is None:
+                report.invalid.append(url)
+            elif normalized[1] in canonical:
+                report.duplicates += 1
+            else:
+                canonical[normalized[1]] = normalized[0]
+        report.urls = list(canonical)
+
+        done = set() if refresh else {url for url, status in self.store.statuses(canonical).items()
+                                      if status in (OK, NOT_FOUND)}
+        report.cached = len(done)
+        by_kind: Dict[str, List[str]] = {}
+        for url, kind in canonical.items():
+            if url not in done:
+                by_kind.setdefault(kind, []).append(url)
+
+        batches = [(kind, kind_urls[i:i + self.batch_size]) for kind, kind_urls in by_kind.items()
+                   for i in range(0, len(kind_urls), self.batch_size)]
+        if batches:
+            print(f"[linkedin] {sum(len(b) for _, b in batches)} URLs pendientes en {len(batches)} lotes "
+                  f"({self.max_concurrent_runs} ejecuciones a la vez como máximo)")
+        semaphore = asyncio.Semaphore(self.max_concurrent_runs)
+        await asyncio.gather(*(self._run_batch(kind, batch, semaphore, report, f"lote {index + 1}/{len(batches)}")
+                               for index, (kind, batch) in enumerate(batches)))
+        report.duration = time.perf_counter() - start
+        return report
+
+
+def _number(properties: Dict[str, str], key: str, default: float) -> float:
+    try:
+        return float(properties.get(key) or default)
+    except ValueError:
+        return default
+
+
+async def extract_file(urls_path: str, token: str, db_path: str, properties: Optional[Dict[str, str]] = None,
+                       output_path: Optional[str] = None, refresh: bool = False) -> bool:
+    """Extrae con Apify los perfiles y empresas de LinkedIn de ``urls_path`` y los guarda en ``db_path``.
+
+    ``properties`` son los valores de default.properties: APIFY_API_URL,
+    APIFY_RUN_TIMEOUT, LINKEDIN_PROFILE_ACTOR/_INPUT,
+    LINKEDIN_COMPANY_ACTOR/_INPUT, LINKEDIN_BATCH_SIZE y
+    LINKEDIN_MAX_CONCURRENT_RUNS. Con ``output_path`` se exportan además a
+    JSON los resultados de las URLs del archivo.
+
+    Returns:
+        bool: False si falta el token, no se pudo leer el archivo o alguna ejecución de Apify falló.
+    """
+    properties = properties or {}
+    if not token:
+        print("Error: falta APIFY_TOKEN en config/.env")
+        return False
+    try:
+        urls = read_url_list(urls_path)
+    except Exception as e:
+        print(f"Error leyendo las URLs de {urls_path}: {str(e)}")
+        return False
+
+    actors = {}
+    for kind, prefix in ((PROFILE, 'LINKEDIN_PROFILE'), (COMPANY, 'LINKEDIN_COMPANY')):
+        actor, input_field = properties.get(f'{prefix}_ACTOR'), properties.get(f'{prefix}_INPUT')
+        if actor and input_field:
+            actors[kind] = (actor, input_field)
+    client = ApifyClient(token, properties.get('APIFY_API_URL') or DEFAULT_API_URL,
+                         timeout=_number(properties, 'APIFY_RUN_TIMEOUT', 300))
+
+    store = ExtractionStore(db_path)
+    try:
+        extractor = BatchExtractor(store, client, actors,
+                                   batch_size=int(_number(properties, 'LINKEDIN_BATCH_SIZE', 25)),
+                                   max_concurrent_runs=int(_number(properties, 'LINKEDIN_MAX_CONCURRENT_RUNS', 3)))
+        report = await extractor.extract(urls, refresh=refresh)
+        print("\n" + report.format())
+        print(f"Resultados guardados en {db_path}")
+        if output_path:
+            directory = os.path.dirname(output_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{output_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"results": store.export(report.urls)}, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, output_path)
+            print(f"Resultados exportados a {output_path}")
+    finally:
+        store.close()
+    return report.ok
@@ -2,40 +2,38 @@
 import json
 import asyncio
 import subprocess
-from typing import Dict
+from typing import Dict, List, Optional
+from ...config.config_service import ConfigService
 from ...core.base_mcp import BaseMCP
+from ...core.pipeline import CPU, IO, UNCHANGED, SetupContext, Stage
+from ...core.tracing import record_write
 
 class LinkedInMCP(BaseMCP):
     """Implementación específica para el MCP de LinkedIn."""
+
+    build_dir = 'build'
     
-    def __init__(self):
-        super().__init__("linkedin-extract")
+    def __init__(self, settings: Optional[ConfigService] = None):
+        super().__init__("linkedin-extract", settings)
+        
+    def get_stages(self, context: SetupContext) -> List[Stage]:
+        """Declara las etapas de configuración del MCP de LinkedIn."""
         
-    async def setup(self, path: str, env_vars: Dict) -> bool:
-        """Configura el MCP de LinkedIn."""
-        try:
+        async def validate() -> bool:
             # 1. Verificar credenciales mínimas
-            min_required = ['APIFY_TOKEN']
-            missing = [v for v in min_required if v not in env_vars]
-            empty   = [v for v in min_required if v in env_vars and not env_vars[v].strip()]
-            
-            if missing:
-                print(f"Faltan variables de entorno: {', '.join(missing)}")
-                print("Configura las credenciales en repositories.json y vuelve a ejecutar.")
-                return False
-            if empty:
-                print(f"Variables vacías: {', '.join(empty)}")
-                print("Configura las credenciales en repositories.json y vuelve a ejecutar.")
-                return False
-            
+            return UNCHANGED if self.check_required_env(context.env_vars, ['APIFY_TOKEN']) else False
+        
+        async def write_env() -> bool:
             # 2. Crear archivo .env con las credenciales
             print("\nCreando archivo .env con credenciales...")
-            self.create_env_file(path, env_vars)
-            print(f"Archivo .env creado en: {os.path.join(path, '.env')}")
+            self.create_env_file(context.path, context.env_vars)
+            print(f"Archivo .env creado en: {os.path.join(context.path, '.env')}")
+            return True
 
+        async def patch_package() -> bool:
             # 3. Modificar package.json
             print("\nModificando package.json...")
-            package_json_path = os.path.join(path, 'package.json')
+            package_json_path = os.path.join(context.path, 'package.json')
             if os.path.exists(package_json_path):
                 with open(package_json_path, 'r', encoding='utf-8') as f:
                     package_json = json.load(f)
@@ -45,19 +43,14 @@ async def setup(self, path: str, env_vars: Dict) -> bool:
                     
                 with open(package_json_path, 'w', encoding='utf-8') as f:
                     json.dump(package_json, f, indent=2)
+                record_write(package_json_path)
                 print("package.json actualizado correctamente")
+            return True
 
-            # 4. Instalar dependencias
-            print("\nInstalando dependencias...")
-            await self.run_command(f"cd {path} && npm install")
-
-            # 5. Construir el proyecto
-            print("\nConstruyendo el proyecto...")
-            await self.run_command(f"cd {path} && npm run build")
-
-            # 6. Configurar config.js
+        async def patch_build() -> bool:
+            # 4. Configurar config.js
             print("\nConfigurando config.js...")
-            config_js_path = os.path.join(path, 'build', 'config.js')
+            config_js_path = os.path.join(context.path, 'build', 'config.js')
             if os.path.exists(config_js_path):
                 with open(config_js_path, 'r', encoding='utf-8') as f:
                     content = f.read()
@@ -66,22 +59,29 @@ async def setup(self, path: str, env_vars: Dict) -> bool:
                 
                 with open(config_js_path, 'w', encoding='utf-8') as f:
                     f.write(new_content)
+                record_write(config_js_path)
                 print("config.js actualizado correctamente")
-            else:
-                print("Error: No se encontró el archivo config.js en la carpeta build")
-                return False
+                return True
+
+            print("Error: No se encontró el archivo config.js en la carpeta build")
+            return False
 
-            # 7. Verificar que el servidor funciona
+        async def verify() -> bool:
+            # 5. Verificar que el servidor funciona
             print("\nVerificando que el servidor funciona...")
-            if not await self.verify_server(path):
+            if not await self.verify_server(context.path):
                 print("Error: El servidor no pudo iniciar correctamente")
                 return False
-            
             return True
-                
-        except Exception as e:
-            print(f"Error configurando LinkedIn: {e}")
-            return False
+        
+        return [
+            Stage('validate', validate, IO),
+            Stage('env', write_env, IO, ['validate'], self.env_fingerprint(context)),
+            Stage('package', patch_package, IO, ['validate'], self.commit_fingerprint(context, 'package.json')),
+            *self.get_npm_stages(context, ['package']),
+            Stage('patch', patch_build, IO, ['build'], self.build_fingerprint(context, self.build_dir)),
+            Stage('verify', verify, CPU, ['env', 'patch'], self.constant_fingerprint('verify')),
+        ]
             
     def get_config(self) -> Dict:
         """Obtiene la configuración específica de LinkedIn para Claude Desktop."""
@@ -98,4 +98,5 @@ def create_env_file(self, path: str, env_vars: Dict) -> None:
         env_path = os.path.join(path, '.env')
         with open(env_path, 'w', encoding='utf-8') as f:
             for key, value in env_vars.items():
-                f.write(f'{key}="{value}"\n') 
\ No newline at end of file
+                f.write(f'{key}="{value}"\n') 
+        record_write(env_path)
\ No newline at end of file
@@ -1,19 +1,25 @@
 import os
 import json
-from typing import Dict
+from typing import Dict, List, Optional
+from ...config.config_service import ConfigService
 from ...core.base_mcp import BaseMCP
+from ...core.pipeline import CPU, IO, SetupContext, Stage
+from ...core.tracing import record_write
 
 class TrelloMCP(BaseMCP):
     """Implementación específica para el MCP de Trello."""
+
+    build_dir = 'build'
     
-    def __init__(self):
-        super().__init__("trello")
+    def __init__(self, settings: Optional[ConfigService] = None):
+        super().__init__("trello", settings)
+        
+    def get_stages(self, context: SetupContext) -> List[Stage]:
+        """Declara las etapas de configuración del MCP de Trello."""
         
-    async def setup(self, path: str, env_vars: Dict) -> bool:
-        """Configura el MCP de Trello."""
-        try:
+        async def patch_package() -> bool:
             # 1. Verificar y modificar package.json
-            package_json_path = os.path.join(path, 'package.json')
+            package_json_path = os.path.join(context.path, 'package.json')
             if os.path.exists(package_json_path):
                 with open(package_json_path, 'r') as f:
                     package_json = json.load(f)
@@ -22,23 +28,19 @@ async def setup(self, path: str, env_vars: Dict) -> bool:
                     package_json['scripts']['build'] = 'tsc'
                     with open(package_json_path, 'w') as f:
                         json.dump(package_json, f, indent=2)
+                    record_write(package_json_path)
                     print("Script de build modificado para Windows")
-            
+            return True
+        
+        async def write_env() -> bool:
             # 2. Crear archivo .env
-            self.create_env_file(path, env_vars)
-            print(f"Creando archivo .env en: {os.path.join(path, '.env')}")
-            
-            # 3. Instalar dependencias incluyendo dotenv
-            print("Instalando dependencias del proyecto MCP...")
-            await self.run_command(f"cd {path} && npm install dotenv")
-            await self.run_command(f"cd {path} && npm install")
-            
-            # 4. Ejecutar build
-            print("Compilando el proyecto...")
-            await self.run_command(f"cd {path} && npm run build")
-            
-            # 5. Agregar configuración de dotenv en index.js
-            index_js_path = os.path.join(path, 'build', 'index.js')
+            self.create_env_file(context.path, context.env_vars)
+            print(f"Creando archivo .env en: {os.path.join(context.path, '.env')}")
+            return True
+        
+        async def patch_build() -> bool:
+            # 3. Agregar configuración de dotenv en index.js
+            index_js_path = os.path.join(context.path, 'build', 'index.js')
             if os.path.exists(index_js_path):
                 with open(index_js_path, 'r', encoding='utf-8') as f:
                     content = f.read()
@@ -51,14 +53,22 @@ async def setup(self, path: str, env_vars: Dict) -> bool:
                     
                     with open(index_js_path, 'w', encoding='utf-8') as f:
                         f.write(content)
+                    record_write(index_js_path)
                     print("Configuración de dotenv agregada en index.js")
-            
-            # 6. Verificar que el servidor funcione
-            return await self.verify_server(path)
-            
-        except Exception as e:
-            print(f"Error configurando Trello: {str(e)}")
-            return False
+            return True
+        
+        async def verify() -> bool:
+            # 4. Verificar que el servidor funcione
+            return await self.verify_server(context.path)
+        
+        return [
+            Stage('package', patch_package, IO, [], self.commit_fingerprint(context, 'package.json')),
+            Stage('env', write_env, IO, [], self.env_fingerprint(context)),
+            *self.get_npm_stages(context, ['package'],
+                                 install_commands=["npm install dotenv", "npm install"]),
+            Stage('patch', patch_build, IO, ['build'], self.build_fingerprint(context, self.build_dir)),
+            Stage('verify', verify, CPU, ['env', 'patch'], self.constant_fingerprint('verify')),
+        ]
             
     def get_config(self) -> Dict:
         """Obtiene la configuración específica de Trello para Claude Desktop."""
@@ -70,4 +80,4 @@ def get_config(self) -> Dict:
                 "TRELLO_TOKEN": "",
                 "TRELLO_BOARD_ID": ""
             }
-        } 
\ No newline at end of file
+        }
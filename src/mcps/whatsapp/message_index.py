@@ -0,0 +1,399 @@
+"""
+Índices de búsqueda sobre el almacén de mensajes del bridge de WhatsApp.
+
+El bridge guarda los mensajes y los chats en ``whatsapp-bridge/store/messages.db``
+y el servidor Python busca en ellos con ``LIKE '%texto%'``, que recorre la
+tabla entera. Este módulo añade a esa base de datos:
+
+- Índices secundarios para los filtros y órdenes habituales (chat, fecha,
+  remitente).
+- Tablas FTS5 con el tokenizador ``trigram`` sobre el texto de los mensajes y
+  el nombre y jid de los chats. Con ``trigram`` las consultas ``LIKE`` usan el
+  índice y devuelven lo mismo que antes, así que el servidor solo cambia la
+  tabla en la que busca.
+- Disparadores que anotan en ``message_index_queue`` las filas que el bridge
+  inserta, reemplaza o borra. Solo escriben en una tabla normal, de modo que
+  el bridge sigue funcionando aunque su SQLite no incluya FTS5.
+
+``connect`` sustituye a ``sqlite3.connect`` en el servidor: si hay cambios
+en la cola los aplica en segundo plano, sin tomar el bloqueo de escritura en
+la consulta, y mientras el índice no está construido lo construye en segundo
+plano y busca sin él. No depende del
+resto del proyecto; se copia junto al servidor y también se puede ejecutar:
+
+    python message_index.py whatsapp-bridge/store/messages.db [--rebuild]
+"""
+import argparse
+import sqlite3
+import sys
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+INDEX_VERSION = "1"
+# Filas por transacción al construir el índice y al vaciar la cola, para no
+# bloquear las escrituras del bridge más de unas décimas de segundo
+BUILD_BATCH = 20000
+SYNC_BATCH = 5000
+BUSY_TIMEOUT_MS = 5000
+
+SECONDARY_INDEXES = {
+    "idx_messages_chat_timestamp": "messages(chat_jid, timestamp)",
+    "idx_messages_timestamp": "messages(timestamp)",
+    "idx_messages_sender": "messages(sender)",
+    "idx_chats_last_message_time": "chats(last_message_time)",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS message_index_meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS message_index_queue (
+    seq INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    row INTEGER,
+    key TEXT
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(content, tokenize='trigram');
+CREATE VIRTUAL TABLE IF NOT EXISTS chats_fts USING fts5(name, jid, tokenize='trigram');
+
+-- El bridge guarda con INSERT OR REPLACE, que no dispara los DELETE: la fila
+-- reemplazada se anota antes de insertar la nueva
+CREATE TRIGGER IF NOT EXISTS message_index_messages_replace BEFORE INSERT ON messages BEGIN
+    INSERT INTO message_index_queue(source, row)
+    SELECT 'messages', rowid FROM messages WHERE id = NEW.id AND chat_jid = NEW.chat_jid;
+END;
+CREATE TRIGGER IF NOT EXISTS message_index_messages_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO message_index_queue(source, row) VALUES ('messages', NEW.rowid);
+END;
+CREATE TRIGGER IF NOT EXISTS message_index_messages_update AFTER UPDATE ON messages
+WHEN OLD.content IS NOT NEW.content OR OLD.rowid != NEW.rowid BEGIN
+    INSERT INTO message_index_queue(source, row) VALUES ('messages', OLD.rowid), ('messages', NEW.rowid);
+END;
+CREATE TRIGGER IF NOT EXISTS message_index_messages_delete AFTER DELETE ON messages BEGIN
+    INSERT INTO message_index_queue(source, row) VALUES ('messages', OLD.rowid);
+END;
+
+-- Los chats se reescriben con cada mensaje; solo se anotan los nuevos y los renombrados
+CREATE TRIGGER IF NOT EXISTS message_index_chats_insert BEFORE INSERT ON chats
+WHEN NOT EXISTS (SELECT 1 FROM chats WHERE jid = NEW.jid AND name IS NEW.name) BEGIN
+    INSERT INTO message_index_queue(source, key) VALUES ('chats', NEW.jid);
+END;
+CREATE TRIGGER IF NOT EXISTS message_index_chats_update AFTER UPDATE ON chats
+WHEN OLD.name IS NOT NEW.name OR OLD.jid != NEW.jid BEGIN
+    INSERT INTO message_index_queue(source, key) VALUES ('chats', OLD.jid), ('chats', NEW.jid);
+END;
+CREATE TRIGGER IF NOT EXISTS message_index_chats_delete AFTER DELETE ON chats BEGIN
+    INSERT INTO message_index_queue(source, key) VALUES ('chats', OLD.jid);
+END;
+"""
+
+DROP_SCHEMA = """
+DROP TRIGGER IF EXISTS message_index_messages_replace;
+DROP TRIGGER IF EXISTS message_index_messages_insert;
+DROP TRIGGER IF EXISTS message_index_messages_update;
+DROP TRIGGER IF EXISTS message_index_messages_delete;
+DROP TRIGGER IF EXISTS message_index_chats_insert;
+DROP TRIGGER IF EXISTS message_index_chats_update;
+DROP TRIGGER IF EXISTS message_index_chats_delete;
+DROP TABLE IF EXISTS messages_fts;
+DROP TABLE IF EXISTS chats_fts;
+DROP TABLE IF EXISTS message_index_queue;
+DROP TABLE IF EXISTS message_index_meta;
+"""
+
+# Vistas con los mismos nombres y columnas que las tablas FTS: mientras el
+# índice no está listo, las consultas del servidor recorren las tablas como antes
+FALLBACK_VIEWS = """
+CREATE TEMP VIEW IF NOT EXISTS messages_fts AS SELECT rowid AS rowid, content FROM main.messages;
+CREATE TEMP VIEW IF NOT EXISTS chats_fts AS SELECT name, jid FROM main.chats;
+"""
+
+# Cambios en whatsapp.py del servidor: abrir la base de datos con ``connect``
+# y buscar en las tablas FTS. Los parámetros de las consultas no cambian.
+SERVER_PATCHES = [
+    ("import sqlite3\n", "import sqlite3\nimport message_index\n"),
+    ("sqlite3.connect(MESSAGES_DB_PATH)", "message_index.connect(MESSAGES_DB_PATH)"),
+    ("LOWER(messages.content) LIKE LOWER(?)",
+     "messages.rowid IN (SELECT rowid FROM messages_fts WHERE messages_fts.content LIKE ?)"),
+    ("(LOWER(chats.name) LIKE LOWER(?) OR chats.jid LIKE ?)",
+     "chats.jid IN (SELECT jid FROM chats_fts WHERE chats_fts.name LIKE ? OR chats_fts.jid LIKE ?)"),
+    ("(LOWER(name) LIKE LOWER(?) OR LOWER(jid) LIKE LOWER(?))",
+     "jid IN (SELECT jid FROM chats_fts WHERE chats_fts.name LIKE ? OR chats_fts.jid LIKE ?)"),
+]
+
+_build_lock = threading.Lock()
+_building: Dict[str, threading.Thread] = {}
+
+
+def patch_server_source(source: str) -> Tuple[str, int]:
+    """Aplica SERVER_PATCHES al código de whatsapp.py: todos o ninguno.
+
+    Un servidor a medio modificar buscaría en unas consultas con el índice y
+    en otras sin él, así que se comprueba que están todos los puntos de
+    anclaje y que el resultado compila antes de dar nada por bueno.
+
+    Returns:
+        Tuple[str, int]: Código resultante y número de cambios aplicados
+        ahora (0 si ya estaba modificado).
+
+    Raises:
+        ValueError: Si falta algún punto de anclaje o el resultado no compila.
+    """
+    pending = [(old, new) for old, new in SERVER_PATCHES if new not in source]
+    if not pending:
+        return source, 0
+    missing = [old for old, _ in pending if old not in source]
+    if missing:
+        raise ValueError(f"no se reconoce el código de whatsapp.py (falta {missing[0].strip()!r})")
+    patched = source
+    for old, new in pending:
+        patched = patched.replace(old, new)
+    try:
+        compile(patched, "whatsapp.py", "exec")
+    except SyntaxError as e:
+        raise ValueError(f"whatsapp.py no compila tras los cambios: {str(e)}")
+    return patched, len(pending)
+
+
+def open_database(path: str, **kwargs) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, **kwargs)
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    return conn
+
+
+def supports_trigram(conn: sqlite3.Connection) -> bool:
+    """Indica si el SQLite de esta conexión tiene FTS5 con el tokenizador ``trigram`` (3.34+)."""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.message_index_probe USING fts5(x, tokenize='trigram')")
+        conn.execute("DROP TABLE temp.message_index_probe")
+        return True
+    except sqlite3.Error:
+        return False
+
+
+def _get_meta(conn: sqlite3.Connection, key: str) -> Optional[str]:
+    try:
+        row = conn.execute("SELECT value FROM message_index_meta WHERE key = ?", (key,)).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+
+def _set_meta(conn: sqlite3.Connection, key: str, value: str):
+    conn.execute("INSERT OR REPLACE INTO message_index_meta(key, value) VALUES (?, ?)", (key, value))
+
+
+def is_ready(conn: sqlite3.Connection) -> bool:
+    """Indica si el índice de texto completo está construido y es de esta versión."""
+    return _get_meta(conn, "ready") == "1" and _get_meta(conn, "version") == INDEX_VERSION
+
+
+def _reindex(conn: sqlite3.Connection, message_rows: List[int], chat_keys: List[str]):
+    """Vuelve a indexar las filas indicadas a partir de su contenido actual.
+
+    Borrar y volver a insertar hace que aplicar una fila varias veces, o en
+    cualquier orden, deje el índice igual que la tabla.
+    """
+    conn.executemany("DELETE FROM messages_fts WHERE rowid = ?", [(row,) for row in message_rows])
+    conn.executemany("DELETE FROM chats_fts WHERE jid = ?", [(key,) for key in chat_keys])
+    # Un INSERT ... SELECT sobre una tabla FTS5 cuesta casi lo mismo con una fila que con
+    # miles: se leen las filas y se insertan con VALUES
+    for start in range(0, len(message_rows), 500):
+        chunk = message_rows[start:start + 500]
+        conn.executemany("INSERT INTO messages_fts(rowid, content) VALUES (?, ?)", conn.execute(
+            f"SELECT rowid, content FROM messages WHERE rowid IN ({','.join('?' * len(chunk))}) "
+            "AND content IS NOT NULL AND content != ''", chunk).fetchall())
+    for start in range(0, len(chat_keys), 500):
+        chunk = chat_keys[start:start + 500]
+        conn.executemany("INSERT INTO chats_fts(name, jid) VALUES (?, ?)", conn.execute(
+            f"SELECT name, jid FROM chats WHERE jid IN ({','.join('?' * len(chunk))})", chunk).fetchall())
+
+
+def has_pending(conn: sqlite3.Connection) -> bool:
+    """Indica si hay cambios en la cola; es una lectura, no bloquea al bridge."""
+    return bool(conn.execute("SELECT EXISTS(SELECT 1 FROM message_index_queue)").fetchone()[0])
+
+
+def sync(conn: sqlite3.Connection, batch: int = SYNC_BATCH) -> int:
+    """Aplica al índice los cambios anotados por los disparadores.
+
+    Returns:
+        int: Número de cambios aplicados.
+    """
+    applied = 0
+    # Sin cambios pendientes no se toma el bloqueo de escritura
+    if not has_pending(conn):
+        return applied
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            changes = conn.execute("SELECT seq, source, row, key FROM message_index_queue ORDER BY seq LIMIT ?",
+                                   (batch,)).fetchall()
+            if changes:
+                message_rows = sorted({row for _, source, row, _ in changes if source == "messages"})
+                chat_keys = sorted({key for _, source, _, key in changes if source == "chats"})
+                _reindex(conn, message_rows, chat_keys)
+                conn.execute("DELETE FROM message_index_queue WHERE seq <= ?", (changes[-1][0],))
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        applied += len(changes)
+        if len(changes) < batch:
+            return applied
+
+
+def build(path: str, rebuild: bool = False, progress: Optional[Callable[[int, int], None]] = None) -> bool:
+    """Crea los índices y construye el índice de texto completo por tramos.
+
+    Los disparadores se crean antes de empezar, así que lo que el bridge
+    escriba durante la construcción queda en la cola y se aplica al final.
+    Se puede interrumpir y retomar: el avance se guarda en ``message_index_meta``.
+
+    Args:
+        path: Ruta de messages.db.
+        rebuild: Borrar el índice existente y construirlo de nuevo.
+        progress: Función a la que se pasa (filas indexadas, total) tras cada tramo.
+
+    Returns:
+        bool: False si este SQLite no tiene FTS5 con ``trigram``.
+    """
+    conn = open_database(path)
+    try:
+        if not supports_trigram(conn):
+            return False
+
+        for name, target in SECONDARY_INDEXES.items():
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+            conn.commit()
+
+        # Disparadores y punto de partida en la misma transacción: las filas
+        # posteriores a ``target`` las recoge la cola
+        drop = DROP_SCHEMA if rebuild or _get_meta(conn, "version") not in (None, INDEX_VERSION) else ""
+        conn.executescript(f"""
+            BEGIN IMMEDIATE;
+            {drop}
+            {SCHEMA}
+            INSERT OR IGNORE INTO message_index_meta(key, value) VALUES ('version', '{INDEX_VERSION}');
+            INSERT OR IGNORE INTO message_index_meta(key, value) VALUES ('built_through', '0');
+            INSERT OR IGNORE INTO message_index_meta(key, value)
+            SELECT 'target', COALESCE(MAX(rowid), 0) FROM messages;
+            COMMIT;
+        """)
+
+        while not is_ready(conn):
+            conn.execute("BEGIN IMMEDIATE")
+            built_through = int(_get_meta(conn, "built_through"))
+            target = int(_get_meta(conn, "target"))
+            if built_through < target:
+                upper = min(built_through + BUILD_BATCH, target)
+                conn.execute("INSERT INTO messages_fts(rowid, content) SELECT rowid, content FROM messages "
+                             "WHERE rowid > ? AND rowid <= ? AND content IS NOT NULL AND content != ''",
+                             (built_through, upper))
+                _set_meta(conn, "built_through", str(upper))
+            else:
+                conn.execute("DELETE FROM chats_fts")
+                conn.execute("INSERT INTO chats_fts(name, jid) SELECT name, jid FROM chats")
+                _set_meta(conn, "ready", "1")
+                upper = target
+            conn.commit()
+            if progress:
+                progress(upper, target)
+
+        sync(conn)
+        return True
+    finally:
+        conn.close()
+
+
+def _in_background(path: str, task: Callable[[], None], name: str):
+    """Ejecuta ``task`` en un hilo, salvo que ya haya uno construyendo o sincronizando ``path``."""
+    with _build_lock:
+        thread = _building.get(path)
+        if thread is None or not thread.is_alive():
+            _building[path] = threading.Thread(target=task, name=name, daemon=True)
+            _building[path].start()
+
+
+def _build_in_background(path: str):
+    def run():
+        try:
+            if not build(path):
+                print("message_index: este SQLite no tiene FTS5 con trigram; las búsquedas no usarán índice",
+                      file=sys.stderr)
+        except sqlite3.Error as e:
+            print(f"message_index: no se pudo construir el índice: {str(e)}", file=sys.stderr)
+
+    _in_background(path, run, "message-index-build")
+
+
+def _sync_in_background(path: str):
+    def run():
+        try:
+            conn = open_database(path)
+            try:
+                sync(conn)
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"message_index: no se pudo actualizar el índice: {str(e)}", file=sys.stderr)
+
+    _in_background(path, run, "message-index-sync")
+
+
+def connect(path: str, **kwargs) -> sqlite3.Connection:
+    """Abre messages.db para el servidor con el índice al día.
+
+    Si el índice está listo, las consultas usan ``messages_fts`` y
+    ``chats_fts``; los cambios pendientes se aplican en un hilo aparte, así
+    que un mensaje recibido hace unos milisegundos puede no aparecer todavía.
+    Si no, o si la base de datos está bloqueada, esos nombres apuntan a vistas
+    temporales sobre las tablas originales: los resultados son los mismos,
+    sin índice.
+    """
+    conn = open_database(path, **kwargs)
+    try:
+        if is_ready(conn):
+            if has_pending(conn):
+                _sync_in_background(path)
+            return conn
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'messages'").fetchone():
+            _build_in_background(path)
+    except sqlite3.Error:
+        pass
+    try:
+        conn.executescript(FALLBACK_VIEWS)
+    except sqlite3.Error:
+        pass
+    return conn
+
+
+def stats(path: str) -> Dict[str, int]:
+    """Mensajes, mensajes indexados y cambios pendientes del índice."""
+    conn = open_database(path)
+    try:
+        result = {"messages": conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]}
+        if is_ready(conn):
+            result["indexed"] = conn.execute("SELECT COUNT(*) FROM messages_fts").fetchone()[0]
+            result["pending"] = conn.execute("SELECT COUNT(*) FROM message_index_queue").fetchone()[0]
+        return result
+    finally:
+        conn.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Construye el índice de búsqueda de los mensajes de WhatsApp")
+    parser.add_argument('database', help="Ruta de whatsapp-bridge/store/messages.db")
+    parser.add_argument('--rebuild', action='store_true', help="Borra el índice y lo construye de nuevo")
+    args = parser.parse_args()
+
+    def progress(done: int, total: int):
+        print(f"\rIndexados {done}/{total} mensajes", end="", flush=True)
+
+    if not build(args.database, args.rebuild, progress):
+        print("Este SQLite no tiene FTS5 con el tokenizador trigram (requiere SQLite 3.34 o posterior)")
+        return 1
+    print(f"\nÍndice listo: {stats(args.database)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
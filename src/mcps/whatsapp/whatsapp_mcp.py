@@ -6,49 +6,39 @@
 import sys
 import asyncio
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 import json
+import hashlib
+import shutil
 
+from ...config.config_service import ConfigService
 from ...core.base_mcp import BaseMCP
+from ...core.mcp_client import MCPStdioClient, probe_server
+from ...core.pipeline import CPU, IO, NETWORK, UNCHANGED, SetupContext, Stage
+from ...core.tracing import record_write
+from . import message_index
+
+# Dependencias del servidor Python de WhatsApp
+SERVER_REQUIREMENTS = ["httpx>=0.28.1", "mcp[cli]>=1.6.0", "requests>=2.32.3"]
 
 class WhatsAppMCP(BaseMCP):
     """MCP para interactuar con WhatsApp."""
 
-    def __init__(self):
+    def __init__(self, settings: Optional[ConfigService] = None):
         """Inicializa el MCP de WhatsApp."""
-        super().__init__("whatsapp")
-        self._client = None
-        self._server_process: Optional[subprocess.Popen] = None
+        super().__init__("whatsapp", settings)
+        self._client: Optional[MCPStdioClient] = None
         self._bridge_process: Optional[subprocess.Popen] = None
-        self._load_properties()
-
-    def _load_properties(self):
-        """Carga las propiedades desde default.properties"""
-        try:
-            # Obtener la ruta al directorio config
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            project_root = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
-            properties_path = os.path.join(project_root, 'config', 'default.properties')
-            
-            self.properties = {}
-            if os.path.exists(properties_path):
-                with open(properties_path, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        line = line.strip()
-                        if line and not line.startswith('#'):
-                            try:
-                                key, value = line.split('=', 1)
-                                self.properties[key.strip()] = value.strip()
-                            except ValueError:
-                                continue
-        except Exception as e:
-            print(f"Error cargando propiedades: {e}")
-            self.properties = {}
 
     def _get_uv_path(self) -> str:
         """Obtiene la ruta de uv.exe desde las propiedades"""
         return self.properties.get('UV_PATH', '')
 
+    def _get_server_path(self) -> Path:
+        """Ruta del servidor Python de WhatsApp dentro de REPOSITORIES_BASE_PATH."""
+        base_path = self.properties.get('REPOSITORIES_BASE_PATH', '')
+        return Path(base_path) / "whatsapp-mcp" / "whatsapp-mcp-server"
+
     def get_config(self) -> Dict[str, Any]:
         """Obtiene la configuración específica de WhatsApp para Claude Desktop.
 
@@ -88,56 +78,60 @@ def get_config(self) -> Dict[str, Any]:
             ]
         }
 
-    async def setup(self, path: str, env_vars: Dict[str, str]) -> bool:
-        """Configura el entorno de WhatsApp MCP.
+    def get_stages(self, context: SetupContext) -> List[Stage]:
+        """Declara las etapas de configuración del entorno de WhatsApp MCP.
 
         Args:
-            path: Ruta al directorio del MCP.
-            env_vars: Variables de entorno para el MCP.
+            context: Contexto de configuración con la ruta al directorio del MCP
+                y sus variables de entorno.
 
         Returns:
-            bool: True si la configuración fue exitosa, False en caso contrario.
+            List[Stage]: Etapas de configuración con sus dependencias.
         """
-        try:
-            print("\nConfigurando WhatsApp MCP...")
-            
+        def server_path() -> Path:
+            return Path(context.path) / "whatsapp-mcp-server"
+
+        def venv_path() -> Path:
+            return server_path() / ".venv"
 
+        async def check_uv() -> bool:
+            print("\nConfigurando WhatsApp MCP...")
 
-            # 2. Verificar ruta de uv.exe
+            # 1. Verificar ruta de uv.exe
             uv_path = self._get_uv_path()
             if not uv_path or not os.path.exists(uv_path):
                 print("Error: No se encontró la ruta de uv.exe en default.properties o el archivo no existe")
                 return False
+            return UNCHANGED
 
-            # 1. Configurar el servidor
-            server_path = Path(path) / "whatsapp-mcp-server"
-            print(f"\nConfigurando servidor en: {server_path}")
-            
+        async def create_venv() -> bool:
             # 2. Crear entorno virtual
+            print(f"\nConfigurando servidor en: {server_path()}")
             print("Creando entorno virtual...")
-            venv_path = server_path / ".venv"
-            subprocess.run([sys.executable, "-m", "venv", str(venv_path)], check=True)
+            if not await self.run_command([sys.executable, "-m", "venv", str(venv_path())]):
+                return False
             print("Entorno virtual creado exitosamente")
+            return True
 
-            # 3. Activar entorno virtual y ejecutar comandos
+        async def install() -> bool:
+            # 3. Instalar dependencias en el entorno virtual
             if sys.platform == "win32":
-                activate_script = venv_path / "Scripts" / "activate.bat"
-                pip_cmd = [str(venv_path / "Scripts" / "python.exe"), "-m", "pip"]
+                pip_cmd = [str(venv_path() / "Scripts" / "python.exe"), "-m", "pip"]
             else:
-                activate_script = venv_path / "bin" / "activate"
-                pip_cmd = [str(venv_path / "bin" / "python"), "-m", "pip"]
+                pip_cmd = [str(venv_path() / "bin" / "python"), "-m", "pip"]
 
-            # 4. Instalar dependencias
             print("\nInstalando dependencias...")
-            subprocess.run(
-                pip_cmd + ["install", "httpx>=0.28.1", "mcp[cli]>=1.6.0", "requests>=2.32.3"],
-                check=True
-            )
+            if not await self.run_command(
+                pip_cmd + ["install"] + SERVER_REQUIREMENTS
+            ):
+                return False
             print("Dependencias instaladas exitosamente")
+            return True
 
-            # 7. Mostrar instrucciones de inicio de sesión
+        async def show_instructions() -> bool:
+            # 4. Mostrar instrucciones de inicio de sesión
             print("\n⚠️ IMPORTANTE: Para que WhatsApp funcione correctamente, necesitas configurar el servicio del bridge.")
-            print("1. Debes ubicarte en la ruta donde tienes tu servidor de whatsapp'...whatsapp-mcp\whatsapp-bridge'")
+            print("1. Debes ubicarte en la ruta donde tienes tu servidor de whatsapp'...whatsapp-mcp\\whatsapp-bridge'")
             print("   Debes abrir una terminal en esa ruta y ejecuar el comando 'go run main.go'")
             print("   Al ejecutar el comando, te saldra un QR en tu terminal, debes escanearlo con tu whatsapp para iniciar sesion")
             print("   Luego de escanearlo, deberas esperar unos minutos para que se sincronice el whatsapp")
@@ -156,18 +150,70 @@ async def setup(self, path: str, env_vars: Dict[str, str]) -> bool:
             print("   - Ejecuta: nssm remove whatsapp-bridge confirm")
             print("   - Luego ejecuta: taskkill /F /IM python.exe")
             print("   - Cierra el CMD")
+            return True
+
+        async def search_index() -> bool:
+            # 5. Índices de búsqueda sobre los mensajes del bridge
+            server_file = server_path() / "whatsapp.py"
+            if not server_file.exists():
+                print(f"No se encontró {server_file}; las búsquedas de WhatsApp no usarán índice")
+                return True
+            shutil.copy2(message_index.__file__, server_path() / "message_index.py")
+            record_write(str(server_path() / "message_index.py"))
+
+            source = server_file.read_text(encoding='utf-8')
+            try:
+                patched, applied = message_index.patch_server_source(source)
+            except ValueError as e:
+                print(f"No se modificó whatsapp.py ({str(e)}); las búsquedas de WhatsApp no usarán índice")
+                return True
+            if applied:
+                tmp_file = server_file.with_name(f".{server_file.name}.tmp")
+                tmp_file.write_text(patched, encoding='utf-8')
+                os.replace(tmp_file, server_file)
+                record_write(str(server_file))
+                print(f"whatsapp.py actualizado para buscar con el índice ({applied} cambios)")
+
+            db_path = Path(context.path) / "whatsapp-bridge" / "store" / "messages.db"
+            if not db_path.exists():
+                print("El índice de mensajes se construirá cuando el servidor abra la base de datos del bridge")
+                return True
+            print("\nConstruyendo el índice de búsqueda de mensajes...")
+            if not await asyncio.to_thread(message_index.build, str(db_path)):
+                print("El SQLite de este Python no tiene FTS5 con trigram; el índice lo construirá el servidor")
+                return True
+            print(f"Índice de mensajes listo: {message_index.stats(str(db_path))}")
+            return True
 
-            # 8. Verificar que el servidor funciona
+        async def verify() -> bool:
+            # 6. Verificar que el servidor funciona
             print("\nVerificando que el servidor funciona...")
-            if not await self.verify_server(server_path):
+            if not await self.verify_server(server_path()):
                 print("Error: El servidor no pudo iniciar correctamente")
                 return False
-
             return True
 
-        except Exception as e:
-            print(f"Error al configurar WhatsApp MCP: {str(e)}")
-            return False
+        async def index_fingerprint() -> Optional[str]:
+            # Se repite si cambia el servidor o message_index.py; construir el índice es incremental
+            commit = await self.commit_fingerprint(context, "whatsapp-mcp-server/whatsapp.py")()
+            if commit is None:
+                return None
+            with open(message_index.__file__, 'rb') as f:
+                return f"{commit}:{hashlib.sha256(f.read()).hexdigest()}"
+
+        def venv_fingerprint(value: str):
+            async def fingerprint() -> Optional[str]:
+                return value if venv_path().exists() else None
+            return fingerprint
+
+        return [
+            Stage('uv', check_uv, IO),
+            Stage('venv', create_venv, CPU, ['uv'], venv_fingerprint(sys.version)),
+            Stage('install', install, NETWORK, ['venv'], venv_fingerprint(" ".join(SERVER_REQUIREMENTS))),
+            Stage('instructions', show_instructions, IO, ['install'], self.constant_fingerprint('instructions')),
+            Stage('index', search_index, IO, ['install'], index_fingerprint),
+            Stage('verify', verify, CPU, ['index'], self.constant_fingerprint('verify')),
+        ]
 
     def _is_installed(self, path: str) -> bool:
         """Verifica si WhatsApp MCP ya está instalado.
@@ -243,8 +289,19 @@ def _is_installed(self, path: str) -> bool:
             print(f"Error al verificar la instalación: {str(e)}")
             return False
 
+    def get_launch_command(self, path: str) -> Tuple[str, List[str], str]:
+        """Lanza el servidor con uv desde el directorio indicado.
+
+        Args:
+            path: Ruta al directorio del servidor.
+
+        Returns:
+            Tuple[str, List[str], str]: Comando, argumentos y directorio de trabajo.
+        """
+        return self._get_uv_path(), ["--directory", str(path), "run", "main.py"], str(path)
+
     async def verify_server(self, path: Path) -> bool:
-        """Verifica que el servidor funciona correctamente.
+        """Verifica que el servidor responde al handshake MCP.
 
         Args:
             path: Ruta al directorio del servidor.
@@ -252,56 +309,14 @@ async def verify_server(self, path: Path) -> bool:
         Returns:
             bool: True si el servidor funciona correctamente, False en caso contrario.
         """
-        try:
-            print("\nIntentando iniciar el servidor...")
-            
-            uv_path = self._get_uv_path()
-            if not uv_path or not os.path.exists(uv_path):
-                print("Error: No se encontró la ruta de uv.exe en default.properties o el archivo no existe")
-                return False
-
-            # Iniciar el servidor
-            process = subprocess.Popen(
-                [uv_path, "--directory", str(path), "run", "main.py"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            
-            # Esperar un momento para ver si el servidor inicia
-            await asyncio.sleep(2)
-            
-            # Verificar si el proceso sigue corriendo
-            if process.poll() is None:
-                print("Servidor iniciado correctamente!")
-                print("Consejo: Para ver la salida completa del servidor, ejecuta 'uv run main.py' en el CMD")
-                
-                # Intentar terminar el proceso de manera segura
-                try:
-                    process.terminate()
-                    await asyncio.sleep(1)
-                    if process.poll() is None:
-                        process.kill()
-                    await asyncio.sleep(1)
-                except Exception:
-                    pass
-                    
-                return True
-            else:
-                # Si el proceso terminó, leer la salida de error
-                _, stderr = process.communicate()
-                print("Error: El servidor no pudo iniciar correctamente")
-                if stderr:
-                    print("\nErrores encontrados:")
-                    print(stderr.strip())
-                return False
-            
-        except Exception as e:
-            print(f"Error al verificar el servidor: {str(e)}")
+        uv_path = self._get_uv_path()
+        if not uv_path or not os.path.exists(uv_path):
+            print("Error: No se encontró la ruta de uv.exe en default.properties o el archivo no existe")
             return False
+        return await super().verify_server(str(path))
 
     async def start(self) -> bool:
-        """Inicia el servidor de WhatsApp MCP.
+        """Inicia el servidor de WhatsApp MCP y espera a que responda al handshake.
 
         Returns:
             bool: True si el servidor se inició correctamente, False en caso contrario.
@@ -312,14 +327,19 @@ async def start(self) -> bool:
                 print("Error: No se encontró la ruta de uv.exe en default.properties o el archivo no existe")
                 return False
 
+            if self._client and self._client.alive:
+                return True
+
             # Iniciar el servidor
-            server_path = Path("whatsapp-mcp") / "whatsapp-mcp-server"
-            self._server_process = subprocess.Popen(
-                [uv_path, "--directory", str(server_path), "run", "main.py"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
+            command, args, cwd = self.get_launch_command(str(self._get_server_path()))
+            self._client = MCPStdioClient(command, args, cwd=cwd, name=self.name)
+            if await probe_server(self._client, self.startup_timeout, self.health_check_interval) is None:
+                print("Error: El servidor no pudo iniciar correctamente")
+                if self._client.stderr_tail:
+                    print(self._client.stderr_tail)
+                await self._client.close(grace=0.5)
+                self._client = None
+                return False
 
             return True
 
@@ -329,10 +349,10 @@ async def start(self) -> bool:
 
     async def stop(self) -> None:
         """Detiene el servidor de WhatsApp MCP."""
-        if self._server_process:
-            self._server_process.terminate()
-            self._server_process = None
+        if self._client:
+            await self._client.close()
+            self._client = None
 
         if self._bridge_process:
             self._bridge_process.terminate()
-            self._bridge_process = None
\ No newline at end of file
+            self._bridge_process = None
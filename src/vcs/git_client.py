@@ -0,0 +1,99 @@
+"""
+Clonación rápida y actualización en sitio de los repositorios de MCPs.
+
+El aprovisionamiento solo necesita la punta de cada repositorio, así que por
+defecto se clona con ``--depth 1 --filter=blob:none``. Un repositorio puede
+fijarse a una rama, tag o commit con el campo ``ref`` de repositories.json, y
+una copia existente se actualiza con ``git fetch`` en lugar de omitirse.
+"""
+import os
+from typing import List, Optional
+
+from ..core.process_runner import capture_output, run_streaming
+
+
+class GitClient:
+    """Operaciones git usadas por el aprovisionamiento."""
+
+    def __init__(self, depth: int = 1, blob_filter: Optional[str] = "blob:none"):
+        self.depth = depth
+        self.blob_filter = blob_filter or None
+
+    def _fetch_options(self, shallow: bool = True) -> List[str]:
+        options = []
+        if shallow and self.depth > 0:
+            options.append(f"--depth={self.depth}")
+        if self.blob_filter:
+            options.append(f"--filter={self.blob_filter}")
+        return options
+
+    async def _git(self, args: List[str], name: str, cwd: Optional[str] = None) -> bool:
+        result = await run_streaming(["git"] + args, cwd=cwd, prefix=name)
+        return result.ok
+
+    async def head(self, path: str, rev: str = "HEAD") -> Optional[str]:
+        """Commit al que apunta ``rev`` en la copia local."""
+        return await capture_output(["git", "rev-parse", rev], cwd=path)
+
+    async def _fetch(self, path: str, name: str, ref: str, remote: str = "origin") -> bool:
+        """Descarga ``ref`` de ``remote`` (nombre o URL) en FETCH_HEAD.
+
+        Si el servidor no permite pedir un commit concreto con --depth, se
+        reintenta con el historial completo.
+        """
+        if await self._git(["fetch", *self._fetch_options(), remote, ref], name, cwd=path):
+            return True
+        if self.depth > 0:
+            print(f"[{name}] Reintentando la descarga de {ref} sin --depth...")
+            return await self._git(["fetch", *self._fetch_options(shallow=False), remote, ref], name, cwd=path)
+        return False
+
+    async def clone(self, url: str, path: str, ref: Optional[str] = None, name: str = "git",
+                    origin: Optional[str] = None) -> bool:
+        """Clona ``url`` en ``path``, opcionalmente fijado a una rama, tag o commit.
+
+        Si se indica ``origin`` (por ejemplo, al clonar desde un espejo local),
+        el remoto ``origin`` de la copia apunta a esa URL en lugar de a ``url``.
+        """
+        if not ref:
+            if not await self._git(["clone", *self._fetch_options(), "--single-branch", url, path], name):
+                return False
+            if origin:
+                return await self._git(["remote", "set-url", "origin", origin], name, cwd=path)
+            return True
+
+        # Con ref se inicializa el repositorio y se descarga solo ese commit
+        os.makedirs(path, exist_ok=True)
+        if not await self._git(["init", "-q"], name, cwd=path):
+            return False
+        if not await self._git(["remote", "add", "origin", origin or url], name, cwd=path):
+            return False
+        if not await self._fetch(path, name, ref, remote=url):
+            return False
+        return await self._git(["checkout", "-q", "--detach", "FETCH_HEAD"], name, cwd=path)
+
+    async def update(self, path: str, ref: Optional[str] = None, name: str = "git",
+                     remote: str = "origin") -> Optional[bool]:
+        """Actualiza una copia existente a la punta de ``ref`` (o de la rama por defecto).
+
+        Los archivos versionados que el aprovisionamiento modificó (package.json,
+        index.ts) se descartan, ya que las etapas de configuración los vuelven a
+        parchear; los no versionados (.env, node_modules, build) se conservan.
+
+        Returns:
+            True si el commit cambió, False si ya estaba al día y None si hubo un error.
+        """
+        before = await self.head(path)
+        if not await self._fetch(path, name, ref or "HEAD", remote=remote):
+            return None
+        after = await self.head(path, "FETCH_HEAD")
+        if not after:
+            return None
+        if after == before:
+            print(f"[{name}] El repositorio ya está al día ({after[:12]})")
+            return False
+
+        if not await self._git(["reset", "-q", "--hard", "FETCH_HEAD"], name, cwd=path):
+            return None
+        print(f"[{name}] Repositorio actualizado: {(before or '?')[:12]} -> {after[:12]}")
+        return True
@@ -0,0 +1,97 @@
+"""
+Caché local de espejos bare de los repositorios de MCPs.
+
+Cada repositorio de repositories.json se guarda como ``git clone --mirror`` en
+una carpeta común (por defecto ``REPOSITORIES_BASE_PATH/.mirrors``). Las copias
+de trabajo se clonan y actualizan desde el espejo local, de modo que solo el
+espejo habla con GitHub y, una vez poblado, el aprovisionamiento puede
+repetirse sin conexión.
+"""
+import asyncio
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Optional
+
+from ..core.process_runner import run_streaming
+
+
+class MirrorCache:
+    """Espejos bare de repositorios, indexados por nombre de repositorio."""
+
+    def __init__(self, root: str, offline: bool = False):
+        self.root = root
+        self.offline = offline
+
+    def path_for(self, name: str) -> str:
+        return os.path.join(self.root, f"{name}.git")
+
+    def has(self, name: str) -> bool:
+        return os.path.exists(os.path.join(self.path_for(name), 'HEAD'))
+
+    def uri_for(self, name: str) -> str:
+        """URL file:// del espejo; git solo respeta --depth y --filter con URLs, no con rutas."""
+        return Path(os.path.abspath(self.path_for(name))).as_uri()
+
+    async def _git(self, args, name: str, cwd: Optional[str] = None) -> bool:
+        result = await run_streaming(["git"] + args, cwd=cwd, prefix=f"{name} mirror")
+        return result.ok
+
+    async def create(self, url: str, name: str) -> bool:
+        """Crea el espejo de ``url`` con todo su historial."""
+        os.makedirs(self.root, exist_ok=True)
+        mirror_path = self.path_for(name)
+        tmp_path = f"{mirror_path}.tmp-{os.getpid()}"
+        try:
+            if not await self._git(["clone", "--mirror", "--quiet", url, tmp_path], name):
+                return False
+            # Permitir clones parciales y pedir commits concretos desde el espejo
+            for key in ("uploadpack.allowFilter", "uploadpack.allowAnySHA1InWant"):
+                if not await self._git(["config", key, "true"], name, cwd=tmp_path):
+                    return False
+            os.replace(tmp_path, mirror_path)
+            return True
+        finally:
+            if os.path.exists(tmp_path):
+                shutil.rmtree(tmp_path, ignore_errors=True)
+
+    async def refresh(self, name: str) -> bool:
+        """Descarga las novedades del repositorio original en el espejo."""
+        if self.offline:
+            return self.has(name)
+        return await self._git(["fetch", "--prune", "--quiet", "origin"], name, cwd=self.path_for(name))
+
+    async def ensure(self, url: str, name: str) -> Optional[str]:
+        """Garantiza que el espejo existe y está al día; retorna su URL o None si no está disponible.
+
+        Si el espejo existe pero no se puede actualizar (sin red), se usa tal cual.
+        """
+        if not self.has(name):
+            if self.offline:
+                print(f"[{name}] No hay espejo local y el modo sin conexión está activo (GIT_OFFLINE)")
+                return None
+            print(f"[{name}] Creando espejo local en {self.path_for(name)}")
+            if not await self.create(url, name):
+                print(f"[{name}] Error creando el espejo de {url}")
+                return None
+        elif not self.offline and not await self.refresh(name):
+            print(f"[{name}] No se pudo actualizar el espejo; se usará la copia local existente")
+        return self.uri_for(name)
+
+    async def refresh_all(self, repositories: Dict[str, str], max_parallel: int = 4) -> Dict[str, bool]:
+        """Crea o actualiza en paralelo los espejos de ``repositories`` (nombre -> url)."""
+        semaphore = asyncio.Semaphore(max(1, max_parallel))
+
+        async def refresh_one(name: str, url: str) -> bool:
+            async with semaphore:
+                try:
+                    if self.has(name):
+                        return await self.refresh(name)
+                    return await self.ensure(url, name) is not None
+                except Exception as e:
+                    print(f"[{name}] Error actualizando el espejo: {str(e)}")
+                    return False
+
+        names = list(repositories)
+        results = await asyncio.gather(*(refresh_one(name, repositories[name]) for name in names))
+        return dict(zip(names, results))
@@ -0,0 +1,137 @@
+"""
+Extracción por lotes de LinkedIn contra el sustituto local de Apify
+(``src/bench/apify_stub.py``): normalización, concurrencia limitada, almacén
+por URL canónica y segunda ejecución que solo pide las URLs que faltan.
+"""
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import unittest
+import urllib.request
+
+from src.mcps.linkedin_extract.batch_extractor import (COMPANY, OK, PROFILE, ApifyClient, BatchExtractor,
+                                                       ExtractionStore, normalize_linkedin_url)
+
+APIFY_STUB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          "src", "bench", "apify_stub.py")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class NormalizeLinkedInUrlTest(unittest.TestCase):
+    def test_same_profile_in_different_forms(self):
+        expected = (PROFILE, "https://www.linkedin.com/in/usuario")
+        for url in ("https://www.linkedin.com/in/usuario",
+                    "https://www.linkedin.com/in/usuario/",
+                    "linkedin.com/in/Usuario/?trk=public_profile",
+                    "http://es.linkedin.com/in/USUARIO#experiencia",
+                    "https://www.linkedin.com/in/usuario/details/experience/"):
+            self.assertEqual(normalize_linkedin_url(url), expected, url)
+
+    def test_profile_and_company_are_different(self):
+        self.assertEqual(normalize_linkedin_url("https://www.linkedin.com/company/acme/?originalSubdomain=es"),
+                         (COMPANY, "https://www.linkedin.com/company/acme"))
+        self.assertNotEqual(normalize_linkedin_url("linkedin.com/in/acme"),
+                            normalize_linkedin_url("linkedin.com/company/acme"))
+
+    def test_invalid_urls(self):
+        for url in ("", "https://example.com/in/usuario", "https://www.linkedin.com/feed/",
+                    "https://www.linkedin.com/in/"):
+            self.assertIsNone(normalize_linkedin_url(url), url)
+
+
+class BatchExtractorTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.port = free_port()
+        self.stub = subprocess.Popen([sys.executable, APIFY_STUB, "--port", str(self.port), "--latency", "0.3"],
+                                     stdout=subprocess.PIPE, text=True)
+        # El sustituto escribe una línea cuando ya acepta conexiones
+        self.assertIn("Apify simulado", self.stub.stdout.readline())
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.store = ExtractionStore(os.path.join(self.tmp, "extractions.sqlite"))
+
+    def tearDown(self):
+        self.store.close()
+        self.stub.terminate()
+        self.stub.wait(10)
+        self.stub.stdout.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def stub_stats(self) -> dict:
+        with urllib.request.urlopen(f"{self.base_url}/stats", timeout=10) as response:
+            return json.loads(response.read())
+
+    def extractor(self, **options) -> BatchExtractor:
+        return BatchExtractor(self.store, ApifyClient("token", self.base_url, timeout=30), **options)
+
+    async def test_duplicates_are_fetched_once_and_stored_by_canonical_url(self):
+        urls = ["https://www.linkedin.com/in/ana/",
+                "linkedin.com/in/ANA?trk=abc",
+                "https://es.linkedin.com/in/ana",
+                "https://www.linkedin.com/company/ana/",
+                "https://www.linkedin.com/company/Acme?originalSubdomain=es",
+                "https://example.com/in/ana"]
+        report = await self.extractor().extract(urls)
+
+        self.assertEqual(report.requested, 6)
+        self.assertEqual(report.invalid, ["https://example.com/in/ana"])
+        self.assertEqual(report.duplicates, 2)
+        self.assertEqual(report.fetched, 3)
+        self.assertTrue(report.ok)
+        # Un lote por tipo: perfiles y empresas van a actores distintos
+        self.assertEqual(self.stub_stats()["runs"], 2)
+        self.assertEqual(self.stub_stats()["urls"], 3)
+
+        rows = {row["url"]: row for row in self.store.export()}
+        self.assertEqual(sorted(rows), ["https://www.linkedin.com/company/acme",
+                                        "https://www.linkedin.com/company/ana",
+                                        "https://www.linkedin.com/in/ana"])
+        self.assertEqual(rows["https://www.linkedin.com/in/ana"]["kind"], PROFILE)
+        self.assertEqual(rows["https://www.linkedin.com/company/ana"]["kind"], COMPANY)
+        self.assertTrue(all(row["status"] == OK and row["data"] for row in rows.values()))
+
+    async def test_concurrent_runs_are_bounded(self):
+        urls = [f"https://www.linkedin.com/in/usuario-{index}" for index in range(12)]
+        report = await self.extractor(batch_size=2, max_concurrent_runs=2).extract(urls)
+
+        self.assertEqual(report.runs, 6)
+        self.assertEqual(report.fetched, 12)
+        stats = self.stub_stats()
+        self.assertEqual(stats["runs"], 6)
+        self.assertEqual(stats["max_active"], 2)
+
+    async def test_second_run_fetches_only_missing_urls(self):
+        first = [f"https://www.linkedin.com/in/usuario-{index}" for index in range(4)]
+        await self.extractor().extract(first)
+        self.assertEqual(self.stub_stats()["urls"], 4)
+
+        # Las mismas URLs escritas de otra forma y dos nuevas
+        second = [url.upper() + "/?trk=lista" for url in first] + ["https://www.linkedin.com/in/nuevo-1",
+                                                                  "https://www.linkedin.com/company/nueva"]
+        report = await self.extractor().extract(second)
+        self.assertEqual(report.cached, 4)
+        self.assertEqual(report.fetched, 2)
+        self.assertEqual(self.stub_stats()["urls"], 6)
+
+        report = await self.extractor().extract(second)
+        self.assertEqual(report.cached, 6)
+        self.assertEqual(report.runs, 0)
+        self.assertEqual(self.stub_stats()["urls"], 6)
+
+        report = await self.extractor().extract(first, refresh=True)
+        self.assertEqual(report.fetched, 4)
+        self.assertEqual(self.stub_stats()["urls"], 10)
+        self.assertEqual({row["attempts"] for row in self.store.export(report.urls)}, {2})
+
+
+if __name__ == "__main__":
+    unittest.main()
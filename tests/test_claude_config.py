@@ -0,0 +1,138 @@
+"""
+Fusión con claude_desktop_config.json: se conservan las entradas y claves del
+usuario, solo cambian las entradas de este proyecto, la escritura es atómica y
+un archivo que no se puede leer no se sobrescribe.
+"""
+import json
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+from unittest import mock
+
+from src.core import claude_config
+from src.core.claude_config import read_config, update_config
+
+USER_CONFIG = {
+    "globalShortcut": "Ctrl+Space",
+    "mcpServers": {
+        "filesystem": {"command": "npx", "args": ["-y", "@modelcontextprotocol/server-filesystem", "/home"]},
+        "trello": {"command": "node", "args": ["/antiguo/trello/build/index.js"]},
+        "gmail": {"command": "node", "args": ["/mi/gmail/index.js"]},
+    },
+    "theme": {"mode": "dark"},
+}
+
+
+class ClaudeConfigTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "Claude", "claude_desktop_config.json")
+        os.makedirs(os.path.dirname(self.path))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def write(self, data):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(data if isinstance(data, str) else json.dumps(data))
+
+    def read(self) -> dict:
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def test_user_entries_and_keys_survive(self):
+        self.write(USER_CONFIG)
+        servers = {
+            "trello": {"command": "node", "args": ["/repos/trello/build/index.js"]},
+            "gmail": {"command": "node", "args": ["/repos/gmail/dist/index.js"]},
+            "whatsapp": {"command": "uv", "args": ["run", "main.py"]},
+        }
+        # "trello" la escribió este proyecto; "gmail" y "filesystem" son del usuario
+        changes = update_config(self.path, servers, owned={"trello"})
+
+        self.assertEqual(changes.added, ["whatsapp"])
+        self.assertEqual(changes.updated, ["trello"])
+        self.assertEqual(changes.skipped, ["gmail"])
+        self.assertEqual(changes.removed, [])
+
+        config = self.read()
+        self.assertEqual(config["globalShortcut"], "Ctrl+Space")
+        self.assertEqual(config["theme"], {"mode": "dark"})
+        self.assertEqual(list(config), ["globalShortcut", "mcpServers", "theme"])
+        self.assertEqual(list(config["mcpServers"]), ["filesystem", "trello", "gmail", "whatsapp"])
+        self.assertEqual(config["mcpServers"]["filesystem"], USER_CONFIG["mcpServers"]["filesystem"])
+        self.assertEqual(config["mcpServers"]["gmail"], USER_CONFIG["mcpServers"]["gmail"])
+        self.assertEqual(config["mcpServers"]["trello"], servers["trello"])
+
+    def test_only_owned_entries_are_removed(self):
+        self.write(USER_CONFIG)
+        changes = update_config(self.path, {}, owned={"trello", "brave-search"})
+
+        self.assertEqual(changes.removed, ["trello"])
+        self.assertEqual(list(self.read()["mcpServers"]), ["filesystem", "gmail"])
+
+    def test_file_is_not_rewritten_without_changes(self):
+        servers = {"trello": USER_CONFIG["mcpServers"]["trello"]}
+        self.write(USER_CONFIG)
+        before = os.stat(self.path)
+        with mock.patch.object(claude_config, "atomic_write_json") as write:
+            changes = update_config(self.path, servers, owned={"trello"})
+        self.assertFalse(changes)
+        write.assert_not_called()
+        self.assertEqual(os.stat(self.path).st_ino, before.st_ino)
+
+    def test_missing_file_is_created(self):
+        os.rmdir(os.path.dirname(self.path))
+        changes = update_config(self.path, {"trello": {"command": "node"}}, owned=set())
+        self.assertEqual(changes.added, ["trello"])
+        self.assertEqual(self.read(), {"mcpServers": {"trello": {"command": "node"}}})
+
+    def test_write_is_atomic(self):
+        self.write(USER_CONFIG)
+        os.chmod(self.path, 0o600)
+        renames = []
+        real_replace = os.replace
+
+        def replace(src, dst):
+            renames.append((src, dst))
+            # Al renombrar, el temporal ya está completo y el destino aún tiene el contenido anterior
+            with open(src, 'r', encoding='utf-8') as f:
+                self.assertIn("whatsapp", json.load(f)["mcpServers"])
+            self.assertEqual(self.read(), USER_CONFIG)
+            real_replace(src, dst)
+
+        with mock.patch.object(claude_config.os, "replace", side_effect=replace):
+            update_config(self.path, {"whatsapp": {"command": "uv"}}, owned=set())
+
+        self.assertEqual(len(renames), 1)
+        tmp_path, target = renames[0]
+        self.assertEqual(target, self.path)
+        self.assertEqual(os.path.dirname(tmp_path), os.path.dirname(self.path))
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["claude_desktop_config.json"])
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+
+    def test_failed_write_keeps_previous_file(self):
+        self.write(USER_CONFIG)
+        with mock.patch.object(claude_config.os, "replace", side_effect=OSError("disco lleno")):
+            with self.assertRaises(OSError):
+                update_config(self.path, {"whatsapp": {"command": "uv"}}, owned=set())
+        self.assertEqual(self.read(), USER_CONFIG)
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["claude_desktop_config.json"])
+
+    def test_malformed_file_is_not_overwritten(self):
+        for content in ('{"mcpServers": {"trello": ', '["no", "es", "un", "objeto"]', '{"mcpServers": []}'):
+            self.write(content)
+            with self.assertRaises(ValueError):
+                update_config(self.path, {"trello": {"command": "node"}}, owned={"trello"})
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.assertEqual(f.read(), content)
+
+    def test_empty_file_is_treated_as_empty_config(self):
+        self.write("  \n")
+        self.assertEqual(read_config(self.path), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+Supervisor de la pasarela: los servidores persistentes se lanzan al arrancar,
+las llamadas usan esos mismos procesos y un proceso caído se relanza.
+"""
+import asyncio
+import os
+import sys
+import unittest
+
+from src.gateway.server import StdioGateway
+
+STUB_SERVER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "src", "bench", "stub_server.py")
+KEEP_WARM = {"ping_interval": 0.1, "ping_timeout": 2, "failure_threshold": 2,
+             "backoff_base": 0.05, "backoff_max": 0.2, "status_interval": 60}
+
+
+def stub(**extra):
+    return dict({"command": sys.executable, "args": [STUB_SERVER, "--tools", "echo"]}, **extra)
+
+
+async def wait_for(condition, timeout: float = 10):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("la condición no se cumplió a tiempo")
+        await asyncio.sleep(0.02)
+
+
+class GatewaySupervisorTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.gateway = StdioGateway({"persistent": stub(), "temporary": stub(idle_ttl=300)},
+                                    keep_warm=KEEP_WARM)
+
+    async def asyncTearDown(self):
+        if self.gateway.supervisor is not None:
+            await self.gateway.supervisor.stop()
+        await self.gateway.close()
+
+    async def test_persistent_servers_start_warm_and_serve_calls(self):
+        self.gateway.start_supervisor()
+        persistent = self.gateway.backends["persistent"]
+        await wait_for(lambda: persistent.running)
+        self.assertFalse(self.gateway.backends["temporary"].running)
+        self.assertEqual(list(self.gateway.supervisor.servers), ["persistent"])
+
+        pid = persistent.client.pid
+        result = await self.gateway.call_tool({"name": "persistent__echo", "arguments": {"x": 1}})
+        self.assertFalse(result.get("isError"))
+        self.assertEqual(persistent.client.pid, pid)
+        self.assertEqual(persistent.starts, 1)
+
+        server = self.gateway.supervisor.servers["persistent"]
+        await wait_for(lambda: server.stats.latencies)
+
+    async def test_crashed_server_is_restarted(self):
+        self.gateway.start_supervisor()
+        persistent = self.gateway.backends["persistent"]
+        await wait_for(lambda: persistent.running)
+        first_pid = persistent.client.pid
+
+        persistent.client.process.kill()
+        server = self.gateway.supervisor.servers["persistent"]
+        await wait_for(lambda: persistent.running and persistent.client.pid != first_pid)
+        self.assertEqual(server.stats.restarts, 1)
+        self.assertIn("terminó", server.stats.last_error)
+
+        result = await self.gateway.call_tool({"name": "persistent__echo", "arguments": {}})
+        self.assertFalse(result.get("isError"))
+        self.assertEqual(persistent.starts, 2)
+
+    async def test_without_keep_warm_nothing_starts(self):
+        gateway = StdioGateway({"persistent": stub()})
+        gateway.start_supervisor()
+        self.assertIsNone(gateway.supervisor)
+        self.assertFalse(gateway.backends["persistent"].running)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+"""
+Intermediario de tokens de Google (``scripts/google_token_broker.js``) contra el
+sustituto local del servidor de tokens (``src/bench/google_token_stub.py``):
+un solo canje para clientes simultáneos, renovación antes de que caduque y
+socket privado del usuario.
+"""
+import asyncio
+import json
+import os
+import shutil
+import socket
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BROKER = os.path.join(ROOT, "scripts", "google_token_broker.js")
+TOKEN_STUB = os.path.join(ROOT, "src", "bench", "google_token_stub.py")
+# Los tokens del sustituto valen 4 s y se renuevan 2 s antes de caducar
+EXPIRES_IN = 4
+REFRESH_MARGIN = 2
+REQUEST = {"client_id": "cliente", "client_secret": "secreto", "refresh_token": "1//refresh"}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def check_private_socket(path: str) -> subprocess.CompletedProcess:
+    code = "require(process.argv[1]).checkPrivateSocket(process.argv[2])"
+    return subprocess.run(["node", "-e", code, BROKER, path], capture_output=True, text=True, timeout=30)
+
+
+@unittest.skipUnless(shutil.which("node"), "node no está instalado")
+@unittest.skipIf(sys.platform == "win32", "en Windows el intermediario usa una tubería con nombre")
+class GoogleTokenBrokerTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        port = free_port()
+        self.stub_url = f"http://127.0.0.1:{port}"
+        self.stub = subprocess.Popen([sys.executable, TOKEN_STUB, "--port", str(port), "--latency", "0.3",
+                                      "--expires-in", str(EXPIRES_IN)], stdout=subprocess.PIPE, text=True)
+        self.assertIn("simulado", self.stub.stdout.readline())
+
+        # Un directorio ya existente con permisos abiertos: el intermediario debe cerrarlo
+        self.broker_dir = os.path.join(self.tmp, "mcp-google-token-broker")
+        os.makedirs(self.broker_dir)
+        os.chmod(self.broker_dir, 0o755)
+        self.socket_path = os.path.join(self.broker_dir, "broker.sock")
+        env = dict(os.environ, XDG_RUNTIME_DIR=self.tmp, GOOGLE_TOKEN_URI=f"{self.stub_url}/token",
+                   GOOGLE_TOKEN_REFRESH_MARGIN=str(REFRESH_MARGIN), GOOGLE_TOKEN_BROKER_IDLE_TTL="0")
+        env.pop("GOOGLE_TOKEN_BROKER_SOCKET", None)
+        self.broker = subprocess.Popen(["node", BROKER], env=env)
+        deadline = time.monotonic() + 15
+        while not os.path.exists(self.socket_path):
+            if self.broker.poll() is not None or time.monotonic() > deadline:
+                self.fail("el intermediario no creó su socket")
+            time.sleep(0.05)
+
+    def tearDown(self):
+        for process in (self.broker, self.stub):
+            process.terminate()
+            process.wait(10)
+        self.stub.stdout.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    async def ask(self, request: dict) -> dict:
+        reader, writer = await asyncio.open_unix_connection(self.socket_path)
+        writer.write((json.dumps(request) + "\n").encode())
+        await writer.drain()
+        reply = await asyncio.wait_for(reader.readline(), 15)
+        writer.close()
+        return json.loads(reply)
+
+    def stub_exchanges(self) -> int:
+        with urllib.request.urlopen(f"{self.stub_url}/stats", timeout=10) as response:
+            return json.loads(response.read())["exchanges"]
+
+    async def test_concurrent_clients_share_one_exchange(self):
+        first, second = await asyncio.gather(self.ask(REQUEST), self.ask(REQUEST))
+        self.assertNotIn("error", first)
+        self.assertEqual(first["access_token"], second["access_token"])
+        self.assertEqual(self.stub_exchanges(), 1)
+
+        # Un tercer cliente recibe el token guardado sin otro canje
+        third = await self.ask(REQUEST)
+        self.assertEqual(third["access_token"], first["access_token"])
+        self.assertEqual((await self.ask({"op": "stats"}))["exchanges"], 1)
+        self.assertEqual(self.stub_exchanges(), 1)
+
+    async def test_token_is_refreshed_before_it_expires(self):
+        start = time.monotonic()
+        first = await self.ask(REQUEST)
+        while self.stub_exchanges() < 2:
+            self.assertLess(time.monotonic() - start, EXPIRES_IN, "el token caducó sin renovarse")
+            await asyncio.sleep(0.05)
+
+        # La renovación la hizo el intermediario por su cuenta; el cliente recibe el nuevo sin esperar otro canje
+        renewed = await self.ask(REQUEST)
+        self.assertNotEqual(renewed["access_token"], first["access_token"])
+        self.assertGreater(renewed["expiry_date"], first["expiry_date"])
+        self.assertEqual(self.stub_exchanges(), 2)
+
+    async def test_stale_token_forces_a_new_exchange(self):
+        first = await self.ask(REQUEST)
+        renewed = await self.ask(dict(REQUEST, stale=first["access_token"]))
+        self.assertNotEqual(renewed["access_token"], first["access_token"])
+        self.assertEqual(self.stub_exchanges(), 2)
+
+    def test_socket_is_private(self):
+        self.assertEqual(stat.S_IMODE(os.stat(self.broker_dir).st_mode), 0o700)
+        info = os.lstat(self.socket_path)
+        self.assertTrue(stat.S_ISSOCK(info.st_mode))
+        self.assertEqual(info.st_uid, os.getuid())
+        self.assertEqual(stat.S_IMODE(info.st_mode) & 0o077, 0)
+        self.assertEqual(check_private_socket(self.socket_path).returncode, 0)
+
+    def test_open_socket_or_directory_is_refused(self):
+        os.chmod(self.socket_path, 0o666)
+        result = check_private_socket(self.socket_path)
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn("no es un socket privado", result.stderr)
+        os.chmod(self.socket_path, 0o600)
+
+        os.chmod(self.broker_dir, 0o755)
+        result = check_private_socket(self.socket_path)
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn("no es privado", result.stderr)
+        os.chmod(self.broker_dir, 0o700)
+
+
+if __name__ == "__main__":
+    unittest.main()
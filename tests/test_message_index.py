@@ -0,0 +1,237 @@
+"""
+Índice de búsqueda de WhatsApp: el parche de whatsapp.py se aplica entero o no
+se aplica, repetirlo no cambia nada, y los disparadores con la cola mantienen
+las tablas FTS5 iguales a las del bridge tras altas, cambios y bajas.
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from src.core.pipeline import SetupContext
+from src.mcps.whatsapp import message_index
+from src.mcps.whatsapp.whatsapp_mcp import WhatsAppMCP
+
+BRIDGE_SCHEMA = """
+CREATE TABLE chats (jid TEXT PRIMARY KEY, name TEXT, last_message_time TIMESTAMP);
+CREATE TABLE messages (id TEXT, chat_jid TEXT, sender TEXT, content TEXT, timestamp TIMESTAMP,
+                       PRIMARY KEY (id, chat_jid));
+"""
+
+# Fragmento de whatsapp.py con los puntos de anclaje de SERVER_PATCHES
+SERVER_SOURCE = '''import sqlite3
+from typing import List
+
+MESSAGES_DB_PATH = "messages.db"
+
+
+def list_messages(query: str) -> List[str]:
+    conn = sqlite3.connect(MESSAGES_DB_PATH)
+    try:
+        cursor = conn.execute(
+            "SELECT messages.id FROM messages WHERE LOWER(messages.content) LIKE LOWER(?) ORDER BY messages.id",
+            (f"%{query}%",))
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def list_chats(query: str) -> List[str]:
+    conn = sqlite3.connect(MESSAGES_DB_PATH)
+    try:
+        cursor = conn.execute(
+            "SELECT chats.jid FROM chats WHERE (LOWER(chats.name) LIKE LOWER(?) OR chats.jid LIKE ?) "
+            "ORDER BY chats.jid", (f"%{query}%", f"%{query}%"))
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def search_contacts(query: str) -> List[str]:
+    conn = sqlite3.connect(MESSAGES_DB_PATH)
+    try:
+        cursor = conn.execute(
+            "SELECT jid FROM chats WHERE (LOWER(name) LIKE LOWER(?) OR LOWER(jid) LIKE LOWER(?)) ORDER BY jid",
+            (f"%{query}%", f"%{query}%"))
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        conn.close()
+'''
+
+
+def load_server(source: str, db_path: str) -> dict:
+    """Ejecuta el código del servidor contra ``db_path`` y retorna sus funciones."""
+    namespace = {"__name__": "whatsapp"}
+    with mock.patch.dict(sys.modules, {"message_index": message_index}):
+        exec(compile(source, "whatsapp.py", "exec"), namespace)
+    namespace["MESSAGES_DB_PATH"] = db_path
+    return namespace
+
+
+class PatchServerSourceTest(unittest.TestCase):
+    def test_all_patches_are_applied(self):
+        patched, applied = message_index.patch_server_source(SERVER_SOURCE)
+        self.assertEqual(applied, len(message_index.SERVER_PATCHES))
+        for old, new in message_index.SERVER_PATCHES:
+            self.assertIn(new, patched)
+        self.assertNotIn("sqlite3.connect(MESSAGES_DB_PATH)", patched)
+
+    def test_reapplying_is_a_no_op(self):
+        patched, _ = message_index.patch_server_source(SERVER_SOURCE)
+        again, applied = message_index.patch_server_source(patched)
+        self.assertEqual(applied, 0)
+        self.assertEqual(again, patched)
+
+    def test_any_missing_anchor_patches_nothing(self):
+        for old, _ in message_index.SERVER_PATCHES:
+            # El mismo código escrito de otra forma ya no coincide con el punto de anclaje
+            variant = old.replace("(", "( ", 1) if "(" in old else old.rstrip("\n") + " as db\n"
+            source = SERVER_SOURCE.replace(old, variant)
+            self.assertNotIn(old, source)
+            with self.assertRaisesRegex(ValueError, "no se reconoce"):
+                message_index.patch_server_source(source)
+
+    def test_result_must_compile(self):
+        source = SERVER_SOURCE + "\nbroken = 'sqlite3.connect(MESSAGES_DB_PATH)\n"
+        with self.assertRaisesRegex(ValueError, "no compila"):
+            message_index.patch_server_source(source)
+
+
+class SearchIndexStageTest(unittest.IsolatedAsyncioTestCase):
+    """La etapa ``index`` de WhatsAppMCP sobre una copia del servidor en disco."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.server_dir = Path(self.tmp, "whatsapp-mcp-server")
+        self.server_dir.mkdir()
+        self.server_file = self.server_dir / "whatsapp.py"
+        stages = WhatsAppMCP().get_stages(SetupContext(self.tmp, {}))
+        self.index_stage = next(stage for stage in stages if stage.name == "index")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    async def test_missing_anchor_leaves_file_byte_identical(self):
+        old = message_index.SERVER_PATCHES[-1][0]
+        source = SERVER_SOURCE.replace(old, old.replace("LOWER(jid)", "jid")).encode()
+        self.server_file.write_bytes(source)
+
+        self.assertTrue(await self.index_stage.action())
+        self.assertEqual(self.server_file.read_bytes(), source)
+        self.assertEqual(sorted(os.listdir(self.server_dir)), ["message_index.py", "whatsapp.py"])
+
+    async def test_second_run_does_not_rewrite(self):
+        self.server_file.write_text(SERVER_SOURCE, encoding='utf-8')
+        self.assertTrue(await self.index_stage.action())
+        patched = self.server_file.read_bytes()
+        self.assertIn(b"message_index.connect(MESSAGES_DB_PATH)", patched)
+
+        inode = self.server_file.stat().st_ino
+        self.assertTrue(await self.index_stage.action())
+        self.assertEqual(self.server_file.read_bytes(), patched)
+        self.assertEqual(self.server_file.stat().st_ino, inode)
+
+
+class MessageIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "messages.db")
+        self.bridge = sqlite3.connect(self.path, isolation_level=None)
+        self.bridge.executescript(BRIDGE_SCHEMA)
+        if not message_index.supports_trigram(self.bridge):
+            self.bridge.close()
+            self.skipTest("este SQLite no tiene FTS5 con trigram")
+        self.save_chat("34600000001@s.whatsapp.net", "Ana García")
+        self.save_chat("34600000002@s.whatsapp.net", "Equipo Proyecto")
+        self.save_message("m1", "34600000001@s.whatsapp.net", "¿Quedamos mañana para la reunión?")
+        self.save_message("m2", "34600000002@s.whatsapp.net", "El presupuesto está en el Drive")
+        self.save_message("m3", "34600000002@s.whatsapp.net", "")
+        self.original = load_server(SERVER_SOURCE, self.path)
+        self.patched = load_server(message_index.patch_server_source(SERVER_SOURCE)[0], self.path)
+
+    def tearDown(self):
+        self.bridge.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def save_chat(self, jid: str, name: str):
+        # Como el bridge: INSERT OR REPLACE con cada mensaje
+        self.bridge.execute("INSERT OR REPLACE INTO chats (jid, name, last_message_time) VALUES (?, ?, '2025-01-01')",
+                            (jid, name))
+
+    def save_message(self, message_id: str, chat_jid: str, content: str):
+        self.bridge.execute("INSERT OR REPLACE INTO messages (id, chat_jid, sender, content, timestamp) "
+                            "VALUES (?, ?, 'yo', ?, '2025-01-01')", (message_id, chat_jid, content))
+
+    def assertSameResults(self, *queries: str):
+        """Las funciones modificadas devuelven lo mismo que las originales."""
+        for query in queries:
+            for function in ("list_messages", "list_chats", "search_contacts"):
+                self.assertEqual(self.patched[function](query), self.original[function](query),
+                                 f"{function}({query!r})")
+
+    def sync(self):
+        conn = message_index.open_database(self.path)
+        try:
+            return message_index.sync(conn)
+        finally:
+            conn.close()
+
+    def test_queue_drain_indexes_inserts_updates_and_deletes(self):
+        self.assertTrue(message_index.build(self.path))
+        self.assertEqual(message_index.stats(self.path), {"messages": 3, "indexed": 2, "pending": 0})
+        self.assertEqual(self.patched["list_messages"]("QUEDAMOS"), ["m1"])
+        self.assertSameResults("reunión", "presupuesto", "ana", "34600000002", "xyz")
+
+        self.save_message("m4", "34600000001@s.whatsapp.net", "Te envío el presupuesto nuevo")
+        # El bridge reescribe el mensaje con INSERT OR REPLACE y también puede editarlo con UPDATE
+        self.save_message("m1", "34600000001@s.whatsapp.net", "Mejor pasado mañana")
+        self.bridge.execute("UPDATE messages SET content = 'Drive compartido' WHERE id = 'm2'")
+        self.bridge.execute("DELETE FROM messages WHERE id = 'm3'")
+        self.save_chat("34600000002@s.whatsapp.net", "Equipo Lanzamiento")
+        self.save_chat("34600000003@s.whatsapp.net", "Carlos")
+        self.bridge.execute("DELETE FROM chats WHERE jid = '34600000001@s.whatsapp.net'")
+
+        conn = message_index.open_database(self.path)
+        self.assertTrue(message_index.has_pending(conn))
+        conn.close()
+        self.assertGreater(self.sync(), 0)
+        self.assertEqual(self.sync(), 0)
+        self.assertEqual(message_index.stats(self.path), {"messages": 3, "indexed": 3, "pending": 0})
+
+        self.assertEqual(self.patched["list_messages"]("presupuesto"), ["m4"])
+        self.assertEqual(self.patched["list_messages"]("reunión"), [])
+        self.assertEqual(self.patched["list_chats"]("lanzamiento"), ["34600000002@s.whatsapp.net"])
+        self.assertSameResults("presupuesto", "reunión", "mañana", "drive", "equipo", "lanzamiento",
+                               "carlos", "ana", "34600000001", "whatsapp")
+
+    def test_unchanged_chat_rewrites_are_not_queued(self):
+        self.assertTrue(message_index.build(self.path))
+        for _ in range(3):
+            self.save_chat("34600000001@s.whatsapp.net", "Ana García")
+        conn = message_index.open_database(self.path)
+        self.assertFalse(message_index.has_pending(conn))
+        conn.close()
+
+    def test_connect_without_index_searches_the_tables(self):
+        # Antes de construir el índice, connect lo construye en segundo plano y busca sin él
+        self.assertSameResults("reunión", "ana")
+        thread = message_index._building.get(self.path)
+        if thread is not None:
+            thread.join(30)
+        conn = message_index.open_database(self.path)
+        self.assertTrue(message_index.is_ready(conn))
+        conn.close()
+
+        self.save_message("m5", "34600000001@s.whatsapp.net", "Nueva reunión confirmada")
+        # Con el índice listo, connect aplica la cola en segundo plano
+        self.patched["list_messages"]("reunión")
+        message_index._building[self.path].join(30)
+        self.assertEqual(self.patched["list_messages"]("reunión"), ["m1", "m5"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+Ida y vuelta con repositorios file://: espejo, clon parcial desde el espejo y
+actualización sin conexión una vez que el repositorio original ya no existe.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.vcs.git_client import GitClient
+from src.vcs.mirror_cache import MirrorCache
+
+
+def git(*args, cwd=None) -> str:
+    return subprocess.run(["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+                          cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+@unittest.skipUnless(shutil.which("git"), "git no está instalado")
+class MirrorRoundTripTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.upstream = os.path.join(self.tmp, "upstream")
+        git("init", "-q", self.upstream)
+        self.commit("index.ts", "v1")
+        self.upstream_url = Path(self.upstream).as_uri()
+        self.mirrors_root = os.path.join(self.tmp, "mirrors")
+        self.work = os.path.join(self.tmp, "work")
+        self.git = GitClient(depth=1, blob_filter="blob:none")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def commit(self, filename: str, content: str):
+        Path(self.upstream, filename).write_text(content)
+        git("add", ".", cwd=self.upstream)
+        git("commit", "-q", "-m", content, cwd=self.upstream)
+
+    async def test_clone_from_mirror_and_update_offline(self):
+        mirror_uri = await MirrorCache(self.mirrors_root).ensure(self.upstream_url, "upstream")
+        self.assertIsNotNone(mirror_uri)
+        self.assertTrue(await self.git.clone(mirror_uri, self.work, name="upstream", origin=self.upstream_url))
+
+        # La copia es superficial y parcial aunque el espejo tenga todo el historial
+        self.assertEqual(git("rev-parse", "--is-shallow-repository", cwd=self.work), "true")
+        self.assertEqual(git("config", "remote.origin.partialclonefilter", cwd=self.work), "blob:none")
+        self.assertEqual(git("remote", "get-url", "origin", cwd=self.work), self.upstream_url)
+        self.assertEqual(Path(self.work, "index.ts").read_text(), "v1")
+
+        self.commit("index.ts", "v2")
+        self.assertTrue(await MirrorCache(self.mirrors_root).refresh("upstream"))
+        shutil.rmtree(self.upstream)
+
+        offline = MirrorCache(self.mirrors_root, offline=True)
+        mirror_uri = await offline.ensure(self.upstream_url, "upstream")
+        self.assertIsNotNone(mirror_uri)
+        self.assertTrue(await self.git.update(self.work, name="upstream", remote=mirror_uri))
+        self.assertEqual(Path(self.work, "index.ts").read_text(), "v2")
+
+    async def test_pinned_ref_from_mirror(self):
+        first = git("rev-parse", "HEAD", cwd=self.upstream)
+        self.commit("index.ts", "v2")
+        mirror_uri = await MirrorCache(self.mirrors_root).ensure(self.upstream_url, "upstream")
+        self.assertTrue(await self.git.clone(mirror_uri, self.work, ref=first, name="upstream",
+                                             origin=self.upstream_url))
+        self.assertEqual(Path(self.work, "index.ts").read_text(), "v1")
+        self.assertEqual(git("remote", "get-url", "origin", cwd=self.work), self.upstream_url)
+
+
+if __name__ == "__main__":
+    unittest.main()
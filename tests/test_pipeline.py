@@ -0,0 +1,121 @@
+"""
+Planificador de etapas: validación del grafo, etapas omitidas tras un fallo y
+acciones que terminan sin cambiar nada.
+"""
+import unittest
+
+from src.core.pipeline import (CPU, IO, NETWORK, STAGE_FAILED, STAGE_OK, STAGE_SKIPPED, STAGE_UNCHANGED, UNCHANGED,
+                               PipelineScheduler, Stage, format_report)
+
+
+class Recorder:
+    """Acciones de prueba que anotan el orden en que se ejecutan."""
+
+    def __init__(self):
+        self.calls = []
+
+    def action(self, name: str, outcome=True):
+        async def run():
+            self.calls.append(name)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        return run
+
+
+class AddJobTest(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = PipelineScheduler()
+        self.recorder = Recorder()
+
+    def stage(self, name: str, *depends_on: str, kind: str = IO) -> Stage:
+        return Stage(name, self.recorder.action(name), kind, list(depends_on))
+
+    def test_cycle_is_rejected(self):
+        with self.assertRaisesRegex(ValueError, "cíclicas"):
+            self.scheduler.add_job("mcp", [self.stage("clone"), self.stage("install", "build", "clone"),
+                                           self.stage("build", "install")])
+
+    def test_unknown_dependency_is_rejected(self):
+        with self.assertRaisesRegex(ValueError, "'compile', que no existe"):
+            self.scheduler.add_job("mcp", [self.stage("clone"), self.stage("build", "compile")])
+
+    def test_duplicates_and_unknown_kinds_are_rejected(self):
+        with self.assertRaisesRegex(ValueError, "duplicadas"):
+            self.scheduler.add_job("mcp", [self.stage("clone"), self.stage("clone")])
+        with self.assertRaisesRegex(ValueError, "desconocido"):
+            self.scheduler.add_job("mcp", [self.stage("clone", kind="gpu")])
+        self.scheduler.add_job("mcp", [self.stage("clone")])
+        with self.assertRaisesRegex(ValueError, "ya está registrado"):
+            self.scheduler.add_job("mcp", [self.stage("clone")])
+
+
+class RunTest(unittest.IsolatedAsyncioTestCase):
+    async def test_stages_run_in_dependency_order(self):
+        recorder, scheduler = Recorder(), PipelineScheduler()
+        scheduler.add_job("mcp", [
+            Stage("verify", recorder.action("verify"), IO, ["build", "env"]),
+            Stage("build", recorder.action("build"), CPU, ["install"]),
+            Stage("install", recorder.action("install"), NETWORK, ["clone"]),
+            Stage("env", recorder.action("env"), IO, ["clone"]),
+            Stage("clone", recorder.action("clone"), NETWORK),
+        ])
+        result = (await scheduler.run())["mcp"]
+
+        self.assertTrue(result.ok)
+        # Los resultados conservan el orden de declaración
+        self.assertEqual([stage.name for stage in result.stages], ["verify", "build", "install", "env", "clone"])
+        calls = recorder.calls
+        self.assertEqual(calls[0], "clone")
+        self.assertEqual(calls[-1], "verify")
+        self.assertLess(calls.index("install"), calls.index("build"))
+
+    async def test_failed_stage_skips_its_dependents(self):
+        recorder, scheduler = Recorder(), PipelineScheduler()
+        scheduler.add_job("roto", [
+            Stage("clone", recorder.action("clone")),
+            Stage("install", recorder.action("install", RuntimeError("npm falló")), NETWORK, ["clone"]),
+            Stage("build", recorder.action("build"), CPU, ["install"]),
+            Stage("verify", recorder.action("verify"), IO, ["build"]),
+            Stage("env", recorder.action("env"), IO, ["clone"]),
+        ])
+        scheduler.add_job("sano", [Stage("clone", recorder.action("sano/clone"))])
+        results = await scheduler.run()
+
+        job = results["roto"]
+        self.assertFalse(job.ok)
+        self.assertEqual(job.status("install"), STAGE_FAILED)
+        self.assertEqual(job.status("build"), STAGE_SKIPPED)
+        self.assertEqual(job.status("verify"), STAGE_SKIPPED)
+        # Las ramas que no dependen de la etapa fallida sí se ejecutan, y también los demás trabajos
+        self.assertEqual(job.status("env"), STAGE_OK)
+        self.assertNotIn("build", recorder.calls)
+        self.assertTrue(results["sano"].ok)
+
+        report = format_report(results)
+        self.assertIn("omitida", report)
+        self.assertIn("failed", report)
+
+    async def test_unchanged_outcome_is_success_without_work(self):
+        recorder, scheduler = Recorder(), PipelineScheduler()
+        scheduler.add_job("mcp", [
+            Stage("update", recorder.action("update", UNCHANGED), NETWORK),
+            Stage("build", recorder.action("build"), CPU, ["update"]),
+        ])
+        job = (await scheduler.run())["mcp"]
+
+        self.assertTrue(job.ok)
+        self.assertEqual(job.status("update"), STAGE_UNCHANGED)
+        self.assertEqual(job.status("build"), STAGE_OK)
+        self.assertIn("sin cambios", format_report({"mcp": job}))
+
+    async def test_false_outcome_fails(self):
+        scheduler = PipelineScheduler()
+        scheduler.add_job("mcp", [Stage("verify", Recorder().action("verify", False))])
+        job = (await scheduler.run())["mcp"]
+        self.assertFalse(job.ok)
+        self.assertEqual(job.status("verify"), STAGE_FAILED)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+"""
+Plazos de ``run_streaming``: el timeout cubre la salida y el final del proceso.
+"""
+import asyncio
+import sys
+import time
+import unittest
+
+from src.core.process_runner import run_streaming
+
+
+class RunStreamingTimeoutTest(unittest.IsolatedAsyncioTestCase):
+    async def test_output_is_captured(self):
+        result = await run_streaming([sys.executable, "-c", "print('hola')"], capture=True, echo=False, timeout=10)
+        self.assertTrue(result.ok)
+        self.assertEqual(result.stdout, "hola")
+
+    async def test_timeout_while_reading_output(self):
+        start = time.monotonic()
+        with self.assertRaises(asyncio.TimeoutError):
+            await run_streaming([sys.executable, "-c", "import time; print('x', flush=True); time.sleep(30)"],
+                                echo=False, timeout=1)
+        self.assertLess(time.monotonic() - start, 10)
+
+    @unittest.skipIf(sys.platform == "win32", "usa os.close sobre los descriptores de la salida")
+    async def test_timeout_after_closing_output(self):
+        # El proceso cierra stdout y stderr y sigue en marcha: los lectores terminan antes que él
+        code = "import os, time; os.close(1); os.close(2); time.sleep(30)"
+        start = time.monotonic()
+        with self.assertRaises(asyncio.TimeoutError):
+            await run_streaming([sys.executable, "-c", code], echo=False, timeout=1)
+        self.assertLess(time.monotonic() - start, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
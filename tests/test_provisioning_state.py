@@ -0,0 +1,157 @@
+"""
+Aprovisionamiento incremental: una etapa con huella solo se repite si su huella
+cambia o si una dependencia hizo trabajo, y el manifiesto .mcp-state.json
+sobrevive a una ida y vuelta por disco.
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from src.core.pipeline import STAGE_FAILED, STAGE_OK, STAGE_UNCHANGED, UNCHANGED, PipelineScheduler, Stage
+from src.core.provisioning_state import STATE_VERSION, ProvisioningState, hash_env, hash_tree
+
+
+class Inputs:
+    """Entradas de prueba: huellas modificables y ejecuciones contadas por etapa."""
+
+    def __init__(self):
+        self.fingerprints = {"install": "package-v1", "build": "src-v1"}
+        self.outcomes = {}
+        self.runs = []
+
+    def stage(self, name: str, *depends_on: str) -> Stage:
+        async def action():
+            self.runs.append(name)
+            return self.outcomes.get(name, True)
+
+        async def fingerprint():
+            return self.fingerprints.get(name)
+
+        return Stage(name, action, depends_on=list(depends_on), fingerprint=fingerprint)
+
+
+class IncrementalRunTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, ".mcp-state.json")
+        self.inputs = Inputs()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    async def provision(self) -> dict:
+        """Una ejecución completa, como setup.py: carga el estado, ejecuta y lo guarda."""
+        self.inputs.runs = []
+        state = ProvisioningState(self.path)
+        scheduler = PipelineScheduler(state=state)
+        scheduler.add_job("trello", [self.inputs.stage("update"), self.inputs.stage("install", "update"),
+                                     self.inputs.stage("build", "install")])
+        job = (await scheduler.run())["trello"]
+        state.save()
+        return {stage.name: stage.status for stage in job.stages}
+
+    async def test_stage_reruns_only_when_its_fingerprint_changes(self):
+        self.inputs.outcomes["update"] = UNCHANGED
+        await self.provision()
+        self.assertEqual(self.inputs.runs, ["update", "install", "build"])
+
+        statuses = await self.provision()
+        self.assertEqual(self.inputs.runs, ["update"])
+        self.assertEqual(statuses, {"update": STAGE_UNCHANGED, "install": STAGE_UNCHANGED,
+                                    "build": STAGE_UNCHANGED})
+
+        self.inputs.fingerprints["build"] = "src-v2"
+        statuses = await self.provision()
+        self.assertEqual(self.inputs.runs, ["update", "build"])
+        self.assertEqual(statuses["build"], STAGE_OK)
+
+    async def test_unchanged_dependency_does_not_count_as_work(self):
+        self.inputs.outcomes["update"] = UNCHANGED
+        await self.provision()
+
+        # Una dependencia que sí hizo trabajo obliga a repetir sus dependientes
+        self.inputs.outcomes["update"] = True
+        await self.provision()
+        self.assertEqual(self.inputs.runs, ["update", "install", "build"])
+
+        # Si vuelve a terminar sin cambios, sus dependientes se omiten: sus huellas siguen vigentes
+        self.inputs.outcomes["update"] = UNCHANGED
+        await self.provision()
+        self.assertEqual(self.inputs.runs, ["update"])
+
+    async def test_failed_stage_is_retried(self):
+        self.inputs.outcomes["build"] = False
+        statuses = await self.provision()
+        self.assertEqual(statuses["build"], STAGE_FAILED)
+        record = ProvisioningState(self.path).data["mcps"]["trello"]["stages"]["build"]
+        self.assertEqual(record, {"fingerprint": None, "ok": False})
+
+        self.inputs.outcomes.update(update=UNCHANGED, build=True)
+        statuses = await self.provision()
+        self.assertEqual(self.inputs.runs, ["update", "build"])
+        self.assertEqual(statuses["build"], STAGE_OK)
+
+    async def test_missing_fingerprint_always_runs(self):
+        self.inputs.outcomes["update"] = UNCHANGED
+        await self.provision()
+        # Sin huella (por ejemplo, faltan los artefactos) la etapa se ejecuta
+        del self.inputs.fingerprints["build"]
+        await self.provision()
+        self.assertEqual(self.inputs.runs, ["update", "build"])
+
+
+class ProvisioningStateTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "nested", ".mcp-state.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_round_trip(self):
+        state = ProvisioningState(self.path)
+        state.record_stage("trello", "build", "abc", True)
+        state.update_mcp("trello", commit="1234567", env_hash=hash_env({"TRELLO_API_KEY": "x"}), verified=True)
+        state.set_claude_servers("/claude/config.json", ["trello", "gmail"])
+        state.save()
+        self.assertFalse(os.path.exists(f"{self.path}.tmp"))
+
+        loaded = ProvisioningState(self.path)
+        self.assertEqual(loaded.data, state.data)
+        self.assertEqual(loaded.data["version"], STATE_VERSION)
+        self.assertTrue(loaded.is_current("trello", "build", "abc"))
+        self.assertFalse(loaded.is_current("trello", "build", "def"))
+        self.assertFalse(loaded.is_current("gmail", "build", "abc"))
+        self.assertEqual(loaded.mcp("trello")["commit"], "1234567")
+        self.assertEqual(loaded.claude_servers("/claude/config.json"), {"gmail", "trello"})
+
+        loaded.forget("trello")
+        self.assertFalse(loaded.is_current("trello", "build", "abc"))
+
+    def test_damaged_or_old_manifest_starts_from_scratch(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write("{no es json")
+        self.assertEqual(ProvisioningState(self.path).data, {"version": STATE_VERSION, "mcps": {}})
+
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({"version": STATE_VERSION + 1, "mcps": {"trello": {}}}, f)
+        self.assertEqual(ProvisioningState(self.path).data["mcps"], {})
+
+    def test_hash_tree(self):
+        tree = os.path.join(self.tmp, "build")
+        self.assertIsNone(hash_tree(tree))
+        os.makedirs(os.path.join(tree, "lib"))
+        with open(os.path.join(tree, "lib", "index.js"), 'w') as f:
+            f.write("v1")
+        first = hash_tree(tree)
+        self.assertEqual(hash_tree(tree), first)
+        with open(os.path.join(tree, "lib", "index.js"), 'w') as f:
+            f.write("v2")
+        self.assertNotEqual(hash_tree(tree), first)
+
+
+if __name__ == "__main__":
+    unittest.main()
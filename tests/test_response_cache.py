@@ -0,0 +1,135 @@
+"""
+Caché de respuestas de la pasarela: caducidad, expulsión LRU en memoria y en
+SQLite, y herramientas sin política de caché que siempre llegan al servidor.
+"""
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from src.gateway.cache import ResponseCache, cache_ttl
+from src.gateway.server import StdioGateway
+
+STUB_SERVER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "src", "bench", "stub_server.py")
+
+
+def result(text: str) -> dict:
+    return {"content": [{"type": "text", "text": text}], "isError": False}
+
+
+class ResponseCacheTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "responses.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    async def test_entries_expire_in_memory_and_on_disk(self):
+        cache = ResponseCache(self.path)
+        await cache.put("clave", "brave", "search", 0.1, result("a"))
+        self.assertEqual(await cache.get("clave", "brave", "search"), result("a"))
+        await asyncio.sleep(0.2)
+        self.assertIsNone(await cache.get("clave", "brave", "search"))
+        cache.close()
+
+        # Tampoco se sirve tras reabrir: la fila caducada ya no está en SQLite
+        cache = ResponseCache(self.path)
+        self.assertIsNone(await cache.get("clave", "brave", "search"))
+        cache.close()
+
+    async def test_responses_survive_a_restart(self):
+        cache = ResponseCache(self.path)
+        await cache.put("clave", "brave", "search", 60, result("a"))
+        cache.close()
+
+        cache = ResponseCache(self.path)
+        self.assertEqual(await cache.get("clave", "brave", "search"), result("a"))
+        self.assertEqual(cache.stats()["brave__search"]["disk_hits"], 1)
+        cache.close()
+
+    async def test_memory_lru_evicts_least_recently_used(self):
+        cache = ResponseCache(None, memory_entries=2)
+        await cache.put("a", "s", "t", 60, result("a"))
+        await cache.put("b", "s", "t", 60, result("b"))
+        # Leer "a" la convierte en la más reciente, así que sale "b"
+        await cache.get("a", "s", "t")
+        await cache.put("c", "s", "t", 60, result("c"))
+
+        self.assertEqual(await cache.get("a", "s", "t"), result("a"))
+        self.assertIsNone(await cache.get("b", "s", "t"))
+        self.assertEqual(await cache.get("c", "s", "t"), result("c"))
+
+    async def test_disk_lru_keeps_at_most_disk_entries(self):
+        cache = ResponseCache(self.path, memory_entries=0, disk_entries=2)
+        await cache.put("a", "s", "t", 60, result("a"))
+        await asyncio.sleep(0.01)
+        await cache.put("b", "s", "t", 60, result("b"))
+        await asyncio.sleep(0.01)
+        await cache.get("a", "s", "t")
+        await asyncio.sleep(0.01)
+        await cache.put("c", "s", "t", 60, result("c"))
+
+        self.assertEqual(await cache.get("a", "s", "t"), result("a"))
+        self.assertIsNone(await cache.get("b", "s", "t"))
+        self.assertEqual(await cache.get("c", "s", "t"), result("c"))
+        cache.close()
+
+
+class CacheTtlTest(unittest.TestCase):
+    def test_policies(self):
+        policy = {"get_cards": 300}
+        self.assertEqual(cache_ttl(policy, "get_cards"), 300)
+        self.assertEqual(cache_ttl(policy, "add_card"), 0)
+        self.assertEqual(cache_ttl({"*": 60}, "add_card"), 60)
+        self.assertEqual(cache_ttl(None, "get_cards"), 0)
+        self.assertEqual(cache_ttl({"get_cards": "no"}, "get_cards"), 0)
+
+
+class GatewayCacheTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.cache = ResponseCache(None)
+        self.gateway = StdioGateway({"trello": {
+            "command": sys.executable, "args": [STUB_SERVER, "--tools", "get_cards,add_card"],
+            "cache": {"get_cards": 60}}}, cache=self.cache)
+        backend = self.gateway.backends["trello"]
+        self.requests = []
+        forward = backend.request
+
+        async def counting_request(method, params=None):
+            self.requests.append((method, (params or {}).get("name")))
+            return await forward(method, params)
+
+        backend.request = counting_request
+
+    async def asyncTearDown(self):
+        await self.gateway.close()
+
+    async def call(self, tool: str, **params) -> dict:
+        return await self.gateway.call_tool(dict({"name": f"trello__{tool}", "arguments": {"board": 1}}, **params))
+
+    async def test_idempotent_tool_is_served_from_cache(self):
+        first = await self.call("get_cards")
+        self.assertEqual(await self.call("get_cards"), first)
+        self.assertEqual(self.requests, [("tools/call", "get_cards")])
+
+        await self.call("get_cards", _meta={"mcp-gateway/cache": "bypass"})
+        self.assertEqual(len(self.requests), 2)
+        self.assertEqual(self.cache.stats()["trello__get_cards"]["bypassed"], 1)
+
+    async def test_tool_without_policy_is_never_cached(self):
+        for _ in range(3):
+            await self.call("add_card")
+        self.assertEqual(self.requests, [("tools/call", "add_card")] * 3)
+        self.assertNotIn("trello__add_card", self.cache.stats())
+
+        # Tampoco se agrupan dos llamadas simultáneas
+        await asyncio.gather(self.call("add_card"), self.call("add_card"))
+        self.assertEqual(len(self.requests), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
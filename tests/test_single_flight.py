@@ -0,0 +1,102 @@
+"""
+Agrupación de llamadas idénticas en curso: una sola ejecución por clave, el
+mismo resultado o error para todos y una clave libre en cuanto termina.
+"""
+import asyncio
+import unittest
+
+from src.gateway.single_flight import SingleFlight, can_coalesce
+
+
+class Call:
+    """Llamada de prueba que cuenta sus ejecuciones y termina cuando se le indica."""
+
+    def __init__(self, result="ok"):
+        self.result = result
+        self.executions = 0
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.executions += 1
+        self.started.set()
+        await self.release.wait()
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+class SingleFlightTest(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_identical_calls_run_once(self):
+        flight, call = SingleFlight(), Call({"content": []})
+        waiters = [asyncio.ensure_future(flight.run("clave", "trello", "get_cards", call)) for _ in range(5)]
+        await call.started.wait()
+        self.assertEqual(flight.in_flight, 1)
+        call.release.set()
+
+        results = await asyncio.gather(*waiters)
+        self.assertEqual(call.executions, 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(flight.in_flight, 0)
+        self.assertEqual(flight.stats(), {"trello__get_cards": {"executions": 1, "shared": 4}})
+
+    async def test_different_keys_run_separately(self):
+        flight, first, second = SingleFlight(), Call("a"), Call("b")
+        first.release.set()
+        second.release.set()
+        self.assertEqual(await asyncio.gather(flight.run("a", "s", "t", first), flight.run("b", "s", "t", second)),
+                         ["a", "b"])
+        self.assertEqual((first.executions, second.executions), (1, 1))
+
+    async def test_exception_reaches_every_waiter_and_clears_the_key(self):
+        flight, call = SingleFlight(), Call(ConnectionError("servidor caído"))
+        waiters = [asyncio.ensure_future(flight.run("clave", "s", "t", call)) for _ in range(3)]
+        await call.started.wait()
+        call.release.set()
+
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        self.assertEqual(call.executions, 1)
+        self.assertTrue(all(isinstance(result, ConnectionError) for result in results))
+        self.assertEqual(flight.in_flight, 0)
+
+        # La siguiente llamada con la misma clave vuelve a ejecutarse
+        retry = Call("recuperado")
+        retry.release.set()
+        self.assertEqual(await flight.run("clave", "s", "t", retry), "recuperado")
+        self.assertEqual(retry.executions, 1)
+
+    async def test_cancelled_leader_does_not_strand_followers(self):
+        flight, call = SingleFlight(), Call("resultado")
+        leader = asyncio.ensure_future(flight.run("clave", "s", "t", call))
+        await call.started.wait()
+        followers = [asyncio.ensure_future(flight.run("clave", "s", "t", call)) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await leader
+        call.release.set()
+        self.assertEqual(await asyncio.wait_for(asyncio.gather(*followers), 5), ["resultado", "resultado"])
+        self.assertEqual(call.executions, 1)
+        self.assertEqual(flight.in_flight, 0)
+
+    async def test_all_waiters_cancelled_clears_the_key(self):
+        flight, call = SingleFlight(), Call("resultado")
+        waiter = asyncio.ensure_future(flight.run("clave", "s", "t", call))
+        await call.started.wait()
+        waiter.cancel()
+        call.release.set()
+        await asyncio.sleep(0.05)
+        self.assertEqual(flight.in_flight, 0)
+
+
+class CanCoalesceTest(unittest.TestCase):
+    def test_policies(self):
+        self.assertTrue(can_coalesce("*", "get_cards"))
+        self.assertTrue(can_coalesce(["get_cards"], "get_cards"))
+        self.assertFalse(can_coalesce(["get_cards"], "add_card"))
+        self.assertFalse(can_coalesce(None, "get_cards"))
+
+
+if __name__ == "__main__":
+    unittest.main()